@@ -1,5 +1,6 @@
 import sqlite3
 import os
+import threading
 from pathlib import Path
 
 # Define paths relative to this file
@@ -7,6 +8,64 @@ CURRENT_DIR = Path(__file__).parent
 DB_PATH = CURRENT_DIR.parent.parent / "data" / "deepgloss.db"
 SCHEMA_PATH = CURRENT_DIR / "schema.sql"
 
+# Write bookkeeping of every DBManager of this process (pages create a new DBManager per
+# rerun, so it lives at module level). Each write takes the next counter value and records
+# it for the term / sentence ids it touched, or globally when its scope is unknown, so
+# read-side caches such as the study dialog's term views only go stale for their own rows.
+# Writes of other processes (the batch CLIs) are noticed through PRAGMA data_version and
+# count as global writes.
+_write_lock = threading.Lock()
+_write_counter = 0
+_global_write = 0
+_term_writes = {}       # term id -> counter value of its last write
+_sentence_writes = {}   # sentence id -> counter value of its last write
+_version_conn = None    # only used for PRAGMA data_version
+_seen_data_version = None
+
+# Ids per IN (...) query, below SQLite's bound parameter limit
+_ID_CHUNK = 500
+
+
+def _data_version():
+    global _version_conn
+    if _version_conn is None:
+        _version_conn = sqlite3.connect(str(DB_PATH), check_same_thread=False, timeout=30.0)
+    return _version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def _sync_external_writes():
+    """Counts a commit made by another process (data_version moved without a write of ours) as a global write."""
+    global _write_counter, _global_write, _seen_data_version
+    try:
+        version = _data_version()
+    except sqlite3.Error as e:
+        print(f"Database version check failed: {e}")
+        version = None
+    if version is None or version != _seen_data_version:
+        _write_counter += 1
+        _global_write = _write_counter
+    _seen_data_version = version
+
+
+def write_counter():
+    """Counter value of the latest write; a cache built after reading it is current up to there."""
+    with _write_lock:
+        _sync_external_writes()
+        return _write_counter
+
+
+def last_write(term_id, sentence_ids=()):
+    """Counter value of the latest write (of any process) that may affect this term and these sentences."""
+    with _write_lock:
+        _sync_external_writes()
+        return max([_global_write, _term_writes.get(term_id, 0)] +
+                   [_sentence_writes.get(sid, 0) for sid in sentence_ids])
+
+
+# SQL expressions behind the sort keys of the vocabulary pages
+TERM_SORT_COLUMNS = {'word': "LOWER(word)", 'freq': "frequency", 'level': "star_level"}
+EDITABLE_TERM_COLUMNS = ("word", "definition", "star_level", "is_active")
+
 
 class DBManager:
     def __init__(self):
@@ -27,6 +86,45 @@ class DBManager:
         # Initialize schema
         self._execute_schema_script()
 
+    def _written(self, term_ids=None, sentence_ids=None):
+        """Records a write of these rows; without ids everything counts as written."""
+        global _write_counter, _global_write, _seen_data_version
+        with _write_lock:
+            _write_counter += 1
+            if term_ids is None and sentence_ids is None:
+                _global_write = _write_counter
+            for term_id in term_ids or ():
+                _term_writes[term_id] = _write_counter
+            for sentence_id in sentence_ids or ():
+                _sentence_writes[sentence_id] = _write_counter
+            # Our own commit moved data_version; only later moves come from other processes
+            try:
+                _seen_data_version = _data_version()
+            except sqlite3.Error:
+                _seen_data_version = None
+
+    def _audio_saved(self, paths):
+        """Lets the audio cache count new references, so its eviction needs no DB scan."""
+        paths = [p for p in paths if p]
+        if not paths:
+            return
+        try:
+            from app.services.audio_cache import get_audio_cache  # audio_cache imports this module
+            get_audio_cache().add_refs(paths)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Audio cache reference update failed: {e}")
+
+    def _match_term_ids(self, match_ids):
+        """Term ids of the given matches."""
+        match_ids = list(match_ids)
+        term_ids = set()
+        for i in range(0, len(match_ids), _ID_CHUNK):
+            chunk = match_ids[i:i + _ID_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(f"SELECT term_id FROM matches WHERE id IN ({placeholders})", chunk)
+            term_ids.update(r[0] for r in rows)
+        return term_ids
+
     def _execute_schema_script(self):
         """Initializes tables and performs safe schema migrations."""
         if SCHEMA_PATH.exists():
@@ -58,6 +156,10 @@ class DBManager:
         except sqlite3.OperationalError:
             pass
 
+        # Paginated term queries of Manage Vocabulary (filter by domain and level)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_terms_domain_level ON terms(domain_id, star_level)")
+        self.conn.commit()
+
     # ==========================================
     # 1. Domain Operations
     # ==========================================
@@ -66,6 +168,7 @@ class DBManager:
             cursor = self.conn.cursor()
             cursor.execute("INSERT INTO domain (name) VALUES (?)", (name,))
             self.conn.commit()
+            self._written()
             return cursor.lastrowid
         except sqlite3.IntegrityError:
             # If exists, return existing ID
@@ -75,6 +178,13 @@ class DBManager:
     def get_all_domains(self):
         return self.conn.execute("SELECT id, name FROM domain").fetchall()
 
+    def resolve_domain(self, name_or_id):
+        """Id of the domain with this name or id (as given on a command line), or None."""
+        for d in self.get_all_domains():
+            if str(d['id']) == str(name_or_id) or d['name'] == name_or_id:
+                return d['id']
+        return None
+
     # ==========================================
     # 2. Term Operations
     # ==========================================
@@ -94,6 +204,7 @@ class DBManager:
             (domain_id, word, definition, frequency, star_level)
         )
         self.conn.commit()
+        self._written(term_ids=[cursor.lastrowid])
         return cursor.lastrowid
 
     def get_terms_by_domain(self, domain_id, only_active=False):
@@ -102,14 +213,69 @@ class DBManager:
         return self.conn.execute("SELECT * FROM terms WHERE domain_id=?", (domain_id,)).fetchall()
 
     def bulk_update_terms(self, updates_list):
-        cursor = self.conn.cursor()
-        for row in updates_list:
-            cursor.execute("""
+        """
+        Writes edited terms in one transaction.
+        updates_list: dicts with id, word, definition, star_level, is_active (only pass changed rows).
+        """
+        params = [(row['word'], row['definition'], row['star_level'], row['is_active'], row['id'])
+                  for row in updates_list]
+        if not params:
+            return 0
+        with self.conn:
+            self.conn.executemany("""
                 UPDATE terms 
                 SET word = ?, definition = ?, star_level = ?, is_active = ?
                 WHERE id = ?
-            """, (row['word'], row['definition'], row['star_level'], row['is_active'], row['id']))
-        self.conn.commit()
+            """, params)
+        self._written(term_ids=[p[-1] for p in params])
+        return len(params)
+
+    def _term_filter(self, domain_id, star_level=None, search=None):
+        where, params = ["domain_id = ?"], [domain_id]
+        if star_level is not None:
+            where.append("star_level = ?")
+            params.append(star_level)
+        if search:
+            escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where.append("word LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        return " AND ".join(where), params
+
+    def count_terms(self, domain_id, star_level=None, search=None):
+        where, params = self._term_filter(domain_id, star_level, search)
+        return self.conn.execute(f"SELECT COUNT(*) FROM terms WHERE {where}", params).fetchone()[0]
+
+    def get_terms_page(self, domain_id, star_level=None, search=None, sort="level", ascending=False,
+                       limit=500, offset=0):
+        """
+        One page of a domain's terms, filtered by star level / word substring and sorted in SQL,
+        so large vocabularies are never loaded whole. sort: 'word', 'freq' or 'level'.
+        """
+        where, params = self._term_filter(domain_id, star_level, search)
+        order = TERM_SORT_COLUMNS.get(sort, TERM_SORT_COLUMNS['level'])
+        direction = "ASC" if ascending else "DESC"
+        sql = f"SELECT * FROM terms WHERE {where} ORDER BY {order} {direction}, id LIMIT ? OFFSET ?"
+        return self.conn.execute(sql, params + [int(limit), int(offset)]).fetchall()
+
+    def update_term_cells(self, cell_updates):
+        """
+        Writes individually edited cells in one transaction.
+        cell_updates: {term_id: {column: value}} with columns from EDITABLE_TERM_COLUMNS.
+        Returns the number of cells written.
+        """
+        by_column = {}
+        for term_id, cells in cell_updates.items():
+            for column, value in cells.items():
+                if column not in EDITABLE_TERM_COLUMNS:
+                    raise ValueError(f"Column is not editable: {column}")
+                by_column.setdefault(column, []).append((value, int(term_id)))
+        if not by_column:
+            return 0
+        with self.conn:
+            for column, params in by_column.items():
+                self.conn.executemany(f"UPDATE terms SET {column} = ? WHERE id = ?", params)
+        self._written(term_ids=[int(term_id) for term_id in cell_updates])
+        return sum(len(params) for params in by_column.values())
 
     def get_term_by_id(self, term_id):
         return self.conn.execute("SELECT * FROM terms WHERE id=?", (term_id,)).fetchone()
@@ -124,6 +290,8 @@ class DBManager:
         if image_paths is not None:
             self.conn.execute("UPDATE terms SET image_paths=? WHERE id=?", (image_paths, term_id))
         self.conn.commit()
+        self._written(term_ids=[term_id])
+        self._audio_saved([audio_path])
 
     # ==========================================
     # 3. Sentence Operations
@@ -133,6 +301,8 @@ class DBManager:
             cursor = self.conn.cursor()
             cursor.execute("INSERT INTO sentences (domain_id, content_en) VALUES (?, ?)", (domain_id, content))
             self.conn.commit()
+            # A new sentence can become a search hit of any term without linked sentences
+            self._written()
             return cursor.lastrowid
         except sqlite3.IntegrityError:
             # Return existing ID if content is identical
@@ -159,6 +329,169 @@ class DBManager:
             params.append(sentence_id)
             self.conn.execute(query, tuple(params))
             self.conn.commit()
+            self._written(sentence_ids=[sentence_id])
+            self._audio_saved([audio_path])
+
+    # ==========================================
+    # 3.1 Batch Audio Operations
+    # ==========================================
+    def get_items_missing_audio(self, domain_id):
+        """
+        Returns active terms and matched sentences of a domain that have no audio yet.
+        Each row has: kind ('term' | 'sentence'), id, text.
+        """
+        sql = """
+            SELECT 'term' AS kind, id, word AS text FROM terms
+            WHERE domain_id = ? AND is_active = 1
+            AND (audio_hash IS NULL OR audio_hash = '')
+
+            UNION ALL
+
+            SELECT 'sentence' AS kind, s.id, s.content_en AS text FROM sentences s
+            WHERE (s.audio_hash IS NULL OR s.audio_hash = '')
+            AND s.id IN (
+                SELECT m.sentence_id FROM matches m
+                JOIN terms t ON m.term_id = t.id
+                WHERE t.domain_id = ? AND t.is_active = 1
+            )
+        """
+        return self.conn.execute(sql, (domain_id, domain_id)).fetchall()
+
+    def bulk_update_audio_hashes(self, term_updates=None, sentence_updates=None):
+        """
+        Writes audio paths back in one transaction.
+        term_updates / sentence_updates: lists of (audio_path, row_id) tuples.
+        """
+        with self.conn:
+            if term_updates:
+                self.conn.executemany("UPDATE terms SET audio_hash = ? WHERE id = ?", term_updates)
+            if sentence_updates:
+                self.conn.executemany("UPDATE sentences SET audio_hash = ? WHERE id = ?", sentence_updates)
+        self._written(term_ids=[row_id for _, row_id in term_updates or ()],
+                      sentence_ids=[row_id for _, row_id in sentence_updates or ()])
+        self._audio_saved([path for path, _ in list(term_updates or []) + list(sentence_updates or [])])
+
+    def replace_audio_paths(self, path_pairs):
+        """
+        Repoints audio references after cache files were moved or transcoded.
+        path_pairs: list of (old_path, new_path) tuples, matched exactly against audio_hash.
+        Returns the number of updated rows.
+        """
+        params = [(new, old) for old, new in path_pairs]
+        with self.conn:
+            cur_t = self.conn.executemany("UPDATE terms SET audio_hash = ? WHERE audio_hash = ?", params)
+            cur_s = self.conn.executemany("UPDATE sentences SET audio_hash = ? WHERE audio_hash = ?", params)
+        self._written()
+        return cur_t.rowcount + cur_s.rowcount
+
+    def iter_media_paths(self):
+        """Streams every stored audio/image path (as saved: relative or absolute) without loading all rows."""
+        for (path,) in self.conn.execute("SELECT audio_hash FROM terms WHERE audio_hash IS NOT NULL AND audio_hash != ''"):
+            yield path
+        for (path,) in self.conn.execute("SELECT audio_hash FROM sentences WHERE audio_hash IS NOT NULL AND audio_hash != ''"):
+            yield path
+        for (paths,) in self.conn.execute("SELECT image_paths FROM terms WHERE image_paths IS NOT NULL AND image_paths != ''"):
+            for path in paths.split(","):
+                if path.strip():
+                    yield path.strip()
+
+    def get_term_images(self, domain_id=None):
+        """(id, word, image_paths) of all terms, optionally of one domain."""
+        if domain_id is None:
+            return self.conn.execute("SELECT id, word, image_paths FROM terms").fetchall()
+        return self.conn.execute("SELECT id, word, image_paths FROM terms WHERE domain_id = ?", (domain_id,)).fetchall()
+
+    def bulk_update_image_paths(self, updates):
+        """updates: list of (image_paths, term_id) tuples, written in one transaction."""
+        with self.conn:
+            self.conn.executemany("UPDATE terms SET image_paths = ? WHERE id = ?", updates)
+        self._written(term_ids=[term_id for _, term_id in updates])
+
+    def replace_image_paths(self, path_map):
+        """
+        Repoints entries of the comma-separated `terms.image_paths` lists.
+        path_map: {old_path: new_path}. Returns the number of updated terms.
+        """
+        updates = []
+        for row in self.conn.execute("SELECT id, image_paths FROM terms WHERE image_paths IS NOT NULL AND image_paths != ''"):
+            paths = [p.strip() for p in row['image_paths'].split(",")]
+            new_paths = [path_map.get(p, p) for p in paths]
+            if new_paths != paths:
+                updates.append((",".join(new_paths), row['id']))
+        if updates:
+            with self.conn:
+                self.conn.executemany("UPDATE terms SET image_paths = ? WHERE id = ?", updates)
+            self._written(term_ids=[term_id for _, term_id in updates])
+        return len(updates)
+
+    # ==========================================
+    # 3.2 Batch Definition Operations
+    # ==========================================
+    def get_terms_missing_definition(self, domain_id):
+        return self.conn.execute(
+            "SELECT id, word FROM terms WHERE domain_id = ? AND (definition IS NULL OR definition = '')",
+            (domain_id,)
+        ).fetchall()
+
+    def bulk_update_definitions(self, updates):
+        """
+        Writes generated definitions in one transaction.
+        updates: list of (definition, term_id). Rows edited in the meantime are left untouched.
+        """
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE terms SET definition = ? WHERE id = ? AND (definition IS NULL OR definition = '')",
+                updates
+            )
+        self._written(term_ids=[term_id for _, term_id in updates])
+
+    # ==========================================
+    # 3.3 Batch Explanation Operations
+    # ==========================================
+    def get_matches_missing_explanations(self, domain_id=None, limit=None):
+        """
+        Matches of active terms whose sentence has no translation or whose match has no explanation,
+        most important terms first (star level, then frequency).
+        Each row has: match_id, term_id, sentence_id, domain_id, word, content_en, content_cn, cn_explanation.
+        """
+        sql = """
+            SELECT m.id AS match_id, m.term_id, m.sentence_id, t.domain_id, t.word,
+                   s.content_en, s.content_cn, m.cn_explanation
+            FROM matches m
+            JOIN terms t ON m.term_id = t.id
+            JOIN sentences s ON m.sentence_id = s.id
+            WHERE t.is_active = 1
+            AND ((s.content_cn IS NULL OR s.content_cn = '') OR (m.cn_explanation IS NULL OR m.cn_explanation = ''))
+        """
+        params = []
+        if domain_id is not None:
+            sql += " AND t.domain_id = ?"
+            params.append(domain_id)
+        sql += " ORDER BY t.star_level DESC, t.frequency DESC, m.id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return self.conn.execute(sql, params).fetchall()
+
+    def bulk_fill_explanations(self, sentence_updates=None, match_updates=None):
+        """
+        Writes generated translations / explanations in one transaction, only into empty fields
+        (anything a user saved in the meantime wins).
+        sentence_updates: list of (content_cn, sentence_id); match_updates: list of (cn_explanation, match_id).
+        """
+        with self.conn:
+            if sentence_updates:
+                self.conn.executemany(
+                    "UPDATE sentences SET content_cn = ? WHERE id = ? AND (content_cn IS NULL OR content_cn = '')",
+                    sentence_updates
+                )
+            if match_updates:
+                self.conn.executemany(
+                    "UPDATE matches SET cn_explanation = ? WHERE id = ? AND (cn_explanation IS NULL OR cn_explanation = '')",
+                    match_updates
+                )
+        self._written(term_ids=self._match_term_ids(match_id for _, match_id in match_updates or ()),
+                      sentence_ids=[sentence_id for _, sentence_id in sentence_updates or ()])
 
     # ==========================================
     # 4. Search & Matches (Hybrid Logic)
@@ -233,6 +566,7 @@ class DBManager:
                 (term_id, sentence_id, cn_explanation)
             )
         self.conn.commit()
+        self._written(term_ids=[term_id])
 
     def get_matches_for_term(self, term_id):
         # Use s.* to dynamically fetch all existing columns in the sentences table
@@ -243,4 +577,38 @@ class DBManager:
             JOIN sentences s ON m.sentence_id = s.id 
             WHERE m.term_id = ?
         """
-        return self.conn.execute(sql, (term_id,)).fetchall()
\ No newline at end of file
+        return self.conn.execute(sql, (term_id,)).fetchall()
+
+    def get_term_with_matches(self, term_id):
+        """
+        The term row and its linked sentences in one query.
+        Returns (term dict, [sentence dict with the match's cn_explanation, ...]) or (None, []).
+        """
+        sql = """
+            SELECT t.*, s.id AS s_id, s.domain_id AS s_domain_id, s.origin_source AS s_origin_source,
+                   s.content_en AS s_content_en, s.content_cn AS s_content_cn, s.audio_hash AS s_audio_hash,
+                   m.cn_explanation AS s_cn_explanation
+            FROM terms t
+            LEFT JOIN matches m ON m.term_id = t.id
+            LEFT JOIN sentences s ON m.sentence_id = s.id
+            WHERE t.id = ?
+            ORDER BY m.id
+        """
+        rows = self.conn.execute(sql, (term_id,)).fetchall()
+        if not rows:
+            return None, []
+        term = {k: rows[0][k] for k in rows[0].keys() if not k.startswith("s_")}
+        sentences = [
+            {k[2:]: row[k] for k in row.keys() if k.startswith("s_")}
+            for row in rows if row['s_id'] is not None
+        ]
+        return term, sentences
+
+    def get_sentences_by_content(self, contents):
+        """{content_en: sentence row} for the given English texts that exist in the sentences table."""
+        contents = list(dict.fromkeys(contents))
+        if not contents:
+            return {}
+        placeholders = ",".join("?" * len(contents))
+        rows = self.conn.execute(f"SELECT * FROM sentences WHERE content_en IN ({placeholders})", contents).fetchall()
+        return {row['content_en']: row for row in rows}
@@ -0,0 +1,323 @@
+"""
+Offline bulk import of licensed image sets into `terms.image_paths` (no search engine involved).
+
+1. Scan: the folder tree is walked with os.scandir. Files are matched to terms through the
+   manifest CSV (columns `file`, `term`; `file` relative to the folder) or otherwise by name:
+   the file stem with a trailing index removed ("Gradient_Descent-2.jpg" -> "gradient descent"),
+   or the name of the folder the file lives in ("gradient descent/001.png").
+   Files that match no term are never decoded.
+2. Process: matched files are validated, normalized and thumbnailed (image_processing) in a
+   process pool and put into the content-addressed image store.
+3. Apply: the imported thumbnails are written to `terms.image_paths` in one transaction.
+   Existing images stay first unless --replace is given; at most --per-term images are kept.
+
+Progress is recorded in a ledger (data/image_import.db, keyed by path, size and mtime), so an
+interrupted import of a large folder resumes where it stopped and re-runs only process new or
+changed files.
+
+CLI:
+    python -m app.database.import_images_offline_pipeline /path/to/images [--manifest images.csv]
+        [--domain "Stanford_CS336"] [--workers 8] [--per-term 3] [--replace] [--dry-run]
+"""
+import argparse
+import concurrent.futures
+import csv
+import os
+import re
+import sqlite3
+import time
+
+import config
+from app.database.db_manager import DBManager
+from app.services.image_store import get_image_store
+from app.utils.file_helper import to_rel_path
+from app.utils.image_processing import make_renditions
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tif", ".tiff")
+LEDGER_PATH = config.DATA_DIR / "image_import.db"
+
+# "word_2", "word-03", "word (1)" -> "word"
+_INDEX_SUFFIX_RE = re.compile(r"(?:[\s_-]*\(\d+\)|[\s_-]+\d+)$")
+
+
+def normalize_name(name, strip_index=False):
+    name = name.strip()
+    if strip_index:
+        name = _INDEX_SUFFIX_RE.sub("", name)
+    return re.sub(r"[\s_-]+", " ", name).strip().lower()
+
+
+def _process(path):
+    """Runs inside a worker process. Returns (path, renditions or None)."""
+    try:
+        with open(path, 'rb') as in_file:
+            return path, make_renditions(in_file.read())
+    except OSError:
+        return path, None
+
+
+class Ledger:
+    """Which files were already processed, and into which thumbnail."""
+
+    def __init__(self, path=LEDGER_PATH):
+        self.conn = sqlite3.connect(str(path), timeout=30.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS imported_files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                thumb TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def known(self):
+        """{path: (size, mtime, thumb)}; thumb is None for files that were not usable images."""
+        return {p: (size, mtime, thumb) for p, size, mtime, thumb
+                in self.conn.execute("SELECT path, size, mtime, thumb FROM imported_files")}
+
+    def pending(self, matched):
+        """The part of matched ({path: (size, mtime, ...)}) that is new or changed since it was recorded."""
+        known = self.known()
+        return {path: info for path, info in matched.items()
+                if path not in known or known[path][:2] != (info[0], info[1])}
+
+    def record(self, rows):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO imported_files (path, size, mtime, thumb) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+class OfflineImageImport:
+    def __init__(self, db, root, manifest=None, domain_id=None, workers=None, per_term=3,
+                 replace=False, commit_every=500):
+        self.db = db
+        self.root = os.path.abspath(root)
+        self.manifest = manifest
+        self.domain_id = domain_id
+        self.workers = max(1, int(workers or os.cpu_count() or 4))
+        self.per_term = max(1, int(per_term))
+        self.replace = replace
+        self.commit_every = max(1, int(commit_every))
+        self.stats = {"scanned": 0, "matched": 0, "processed": 0, "skipped": 0,
+                      "failed": 0, "terms_updated": 0, "elapsed": 0.0}
+
+    # ------------------------------------------
+    # 1. Scan & match
+    # ------------------------------------------
+    def _manifest_terms(self):
+        """{absolute file path: [normalized term, ...]} from the manifest CSV."""
+        mapping = {}
+        if not self.manifest:
+            return mapping
+        with open(self.manifest, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                file_name = (row.get('file') or '').strip()
+                term = (row.get('term') or '').strip()
+                if file_name and term:
+                    path = file_name if os.path.isabs(file_name) else os.path.join(self.root, file_name)
+                    mapping.setdefault(os.path.normpath(path), []).append(term.lower())
+        return mapping
+
+    def _scan(self):
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError as e:
+                print(f"Image import: cannot read {directory}: {e}")
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTS:
+                        yield entry
+
+    def match(self, term_index):
+        """
+        Returns {path: (size, mtime, [term_id, ...])} for every image file that belongs to a term.
+        term_index: {lowercased word: [term_id, ...]}
+        """
+        by_manifest = self._manifest_terms()
+        matched = {}
+        for entry in self._scan():
+            self.stats["scanned"] += 1
+            path = os.path.normpath(entry.path)
+            if path in by_manifest:
+                names = by_manifest[path]
+            else:
+                stem = os.path.splitext(entry.name)[0]
+                names = [normalize_name(stem), normalize_name(stem, strip_index=True),
+                         normalize_name(os.path.basename(os.path.dirname(path)))]
+            term_ids = []
+            for name in names:
+                for term_id in term_index.get(name, ()):
+                    if term_id not in term_ids:
+                        term_ids.append(term_id)
+                if term_ids:
+                    break
+            if term_ids:
+                st = entry.stat()
+                matched[path] = (st.st_size, st.st_mtime, term_ids)
+        self.stats["matched"] = len(matched)
+        return matched
+
+    # ------------------------------------------
+    # 2. Process
+    # ------------------------------------------
+    def _process_pending(self, pending, ledger, on_progress=None):
+        store = get_image_store()
+        rows = []
+        paths = iter(pending.items())
+        done = 0
+
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+        in_flight = {}
+
+        def submit_next():
+            item = next(paths, None)
+            if item is not None:
+                path, (size, mtime, _terms) = item
+                in_flight[executor.submit(_process, path)] = (size, mtime)
+
+        try:
+            # A bounded window keeps memory flat for folders with hundreds of thousands of files
+            for _ in range(self.workers * 4):
+                submit_next()
+            while in_flight:
+                finished, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    size, mtime = in_flight.pop(future)
+                    try:
+                        path, renditions = future.result()
+                    except Exception as e:
+                        print(f"Image import error: {e}")
+                        self.stats["failed"] += 1
+                        submit_next()
+                        continue
+                    thumb = None
+                    if renditions is None:
+                        self.stats["failed"] += 1
+                    else:
+                        thumb = to_rel_path(str(store.put(renditions)))
+                        self.stats["processed"] += 1
+                    rows.append((path, size, mtime, thumb))
+                    done += 1
+                    submit_next()
+                    if on_progress:
+                        on_progress(done, len(pending))
+
+                if len(rows) >= self.commit_every:
+                    ledger.record(rows)
+                    rows = []
+        finally:
+            if rows:
+                ledger.record(rows)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # ------------------------------------------
+    # 3. Apply
+    # ------------------------------------------
+    def _apply(self, matched, ledger, terms):
+        thumbs = {path: thumb for path, (_size, _mtime, thumb) in ledger.known().items() if thumb}
+        imported = {}
+        for path in sorted(matched):
+            thumb = thumbs.get(path)
+            if thumb:
+                for term_id in matched[path][2]:
+                    imported.setdefault(term_id, [])
+                    if thumb not in imported[term_id]:
+                        imported[term_id].append(thumb)
+
+        updates = []
+        for term_id, new_paths in imported.items():
+            current = [p.strip() for p in (terms[term_id] or "").split(",") if p.strip()]
+            paths = new_paths if self.replace else current + [p for p in new_paths if p not in current]
+            paths = paths[:self.per_term]
+            if paths != current:
+                updates.append((",".join(paths), term_id))
+        if updates:
+            self.db.bulk_update_image_paths(updates)
+        self.stats["terms_updated"] = len(updates)
+
+    def run(self, dry_run=False, on_progress=None):
+        start = time.perf_counter()
+        term_rows = self.db.get_term_images(self.domain_id)
+        terms = {row['id']: row['image_paths'] for row in term_rows}
+        term_index = {}
+        for row in term_rows:
+            for name in {normalize_name(row['word']), row['word'].strip().lower()}:
+                term_index.setdefault(name, []).append(row['id'])
+
+        matched = self.match(term_index)
+        ledger = Ledger()
+        try:
+            pending = ledger.pending(matched)
+            self.stats["skipped"] = len(matched) - len(pending)
+            if dry_run:
+                self.stats["pending"] = len(pending)
+                return self.stats
+
+            if pending:
+                self._process_pending(pending, ledger, on_progress)
+            self._apply(matched, ledger, terms)
+        finally:
+            ledger.close()
+            self.stats["elapsed"] = time.perf_counter() - start
+        return self.stats
+
+
+def format_stats(stats):
+    return (
+        f"{stats['scanned']} files scanned, {stats['matched']} matched to terms, "
+        f"{stats['processed']} imported, {stats['skipped']} already imported, {stats['failed']} failed; "
+        f"{stats['terms_updated']} terms updated in {stats['elapsed']:.1f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attach a local image collection to terms.")
+    parser.add_argument("root", help="Folder with the images")
+    parser.add_argument("--manifest", default=None, help="CSV with `file` and `term` columns")
+    parser.add_argument("--domain", default=None, help="Domain name or id (default: all domains)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Worker processes")
+    parser.add_argument("--per-term", type=int, default=3, help="Max images per term")
+    parser.add_argument("--replace", action="store_true", help="Replace the existing images of matched terms")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be imported")
+    args = parser.parse_args()
+
+    db = DBManager()
+    domain_id = None
+    if args.domain is not None:
+        domain_id = db.resolve_domain(args.domain)
+        if domain_id is None:
+            print(f"Domain not found: {args.domain}")
+            return
+
+    def _print_progress(done, total):
+        print(f"\r[{done}/{total}]", end="", flush=True)
+
+    job = OfflineImageImport(db, args.root, manifest=args.manifest, domain_id=domain_id,
+                             workers=args.workers, per_term=args.per_term, replace=args.replace)
+    try:
+        stats = job.run(dry_run=args.dry_run, on_progress=_print_progress)
+    except KeyboardInterrupt:
+        print("\nInterrupted. Progress was saved; run the same command again to resume.")
+        return
+    print()
+    if args.dry_run:
+        print(f"{stats['scanned']} files scanned, {stats['matched']} matched to terms, "
+              f"{stats['pending']} to process ({stats['skipped']} already imported).")
+    else:
+        print(format_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
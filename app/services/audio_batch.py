@@ -0,0 +1,186 @@
+"""
+Batch pre-synthesis of TTS audio for a whole domain.
+
+Collects every active term and matched sentence without an `audio_hash`,
+synthesizes them across a pool of worker processes (each worker loads its own
+Kokoro pipeline) and writes the paths back to SQLite in bulk.
+
+The job is resumable: results are committed every few items, only rows that
+still lack audio are selected, and already-cached WAVs are returned instantly.
+
+CLI:
+    python -m app.services.audio_batch --domain "Stanford_CS336" --workers 4
+"""
+import argparse
+import concurrent.futures
+import multiprocessing
+import time
+
+import config
+from app.database.db_manager import DBManager
+from app.utils.file_helper import to_rel_path
+
+# Worker-local TTS manager (one Kokoro pipeline per worker process)
+_worker_tts = None
+
+
+def _init_worker():
+    global _worker_tts
+    # One pipeline per process is enough: the process pool is the parallelism
+    config.TTS_POOL_SIZE = 1
+    config.TTS_WARMUP = False
+
+    from app.services.tts_manager import TTSManager
+    _worker_tts = TTSManager()
+
+
+def _synthesize(text):
+    """Runs inside a worker process. Returns (text, abs_path or None, audio_seconds)."""
+    path = _worker_tts.get_audio_path(text)
+    duration = 0.0
+    if path:
+        try:
+            import soundfile as sf
+            duration = sf.info(path).duration
+        except Exception:
+            pass
+    return text, path, duration
+
+
+class AudioBatchJob:
+    def __init__(self, db, domain_id, workers=None, commit_every=20):
+        self.db = db
+        self.domain_id = domain_id
+        self.workers = max(1, int(workers or config.TTS_BATCH_WORKERS))
+        self.commit_every = max(1, int(commit_every))
+
+        self._term_updates = []
+        self._sentence_updates = []
+
+    def _collect(self):
+        """Groups pending rows by text, so identical texts are synthesized only once."""
+        pending = {}
+        for row in self.db.get_items_missing_audio(self.domain_id):
+            text = (row['text'] or "").strip()
+            if text:
+                pending.setdefault(text, []).append((row['kind'], row['id']))
+        return pending
+
+    def _queue_update(self, rows, rel_path):
+        for kind, row_id in rows:
+            if kind == 'term':
+                self._term_updates.append((rel_path, row_id))
+            else:
+                self._sentence_updates.append((rel_path, row_id))
+
+    def _flush(self):
+        if self._term_updates or self._sentence_updates:
+            self.db.bulk_update_audio_hashes(self._term_updates, self._sentence_updates)
+            self._term_updates = []
+            self._sentence_updates = []
+
+    def run(self, on_progress=None):
+        """
+        Synthesizes all pending items. on_progress(done, total) is called after each item.
+        Returns a stats dict (also on interruption, with 'interrupted': True).
+        """
+        pending = self._collect()
+        total = len(pending)
+        stats = {"total": total, "done": 0, "failed": 0, "audio_seconds": 0.0,
+                 "elapsed": 0.0, "items_per_sec": 0.0, "realtime_factor": 0.0, "interrupted": False}
+        if not total:
+            return stats
+
+        start = time.perf_counter()
+        texts = iter(pending.keys())
+        # spawn: forking the Streamlit server would copy its threads and open connections into the workers
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                          mp_context=multiprocessing.get_context("spawn"))
+        in_flight = set()
+
+        try:
+            # Keep a bounded number of tasks in flight so an interrupt stops quickly
+            for text in texts:
+                in_flight.add(executor.submit(_synthesize, text))
+                if len(in_flight) >= self.workers * 2:
+                    break
+
+            since_commit = 0
+            while in_flight:
+                finished, in_flight = concurrent.futures.wait(
+                    in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in finished:
+                    try:
+                        text, path, duration = future.result()
+                    except Exception as e:
+                        print(f"Batch TTS Error: {e}")
+                        stats["failed"] += 1
+                    else:
+                        if path:
+                            self._queue_update(pending[text], to_rel_path(path))
+                            stats["done"] += 1
+                            stats["audio_seconds"] += duration
+                            since_commit += 1
+                        else:
+                            stats["failed"] += 1
+
+                    next_text = next(texts, None)
+                    if next_text is not None:
+                        in_flight.add(executor.submit(_synthesize, next_text))
+
+                    if on_progress:
+                        on_progress(stats["done"] + stats["failed"], total)
+
+                if since_commit >= self.commit_every:
+                    self._flush()
+                    since_commit = 0
+
+        except KeyboardInterrupt:
+            stats["interrupted"] = True
+        finally:
+            # Persist whatever finished; unfinished rows are picked up by the next run
+            self._flush()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        stats["elapsed"] = time.perf_counter() - start
+        if stats["elapsed"] > 0:
+            stats["items_per_sec"] = stats["done"] / stats["elapsed"]
+            stats["realtime_factor"] = stats["audio_seconds"] / stats["elapsed"]
+        return stats
+
+
+def format_stats(stats):
+    return (
+        f"{stats['done']}/{stats['total']} synthesized, {stats['failed']} failed in {stats['elapsed']:.1f}s "
+        f"({stats['items_per_sec']:.2f} items/s, {stats['audio_seconds']:.1f}s of audio, "
+        f"{stats['realtime_factor']:.1f}x realtime)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-synthesize TTS audio for a domain.")
+    parser.add_argument("--domain", required=True, help="Domain name or id")
+    parser.add_argument("--workers", type=int, default=config.TTS_BATCH_WORKERS, help="Worker processes")
+    parser.add_argument("--commit-every", type=int, default=20, help="Items per DB commit")
+    args = parser.parse_args()
+
+    db = DBManager()
+    domain_id = db.resolve_domain(args.domain)
+    if domain_id is None:
+        print(f"Domain not found: {args.domain}")
+        return
+
+    def _print_progress(done, total):
+        print(f"\r[{done}/{total}]", end="", flush=True)
+
+    job = AudioBatchJob(db, domain_id, workers=args.workers, commit_every=args.commit_every)
+    stats = job.run(on_progress=_print_progress)
+    print()
+    if stats["interrupted"]:
+        print("Interrupted. Progress was saved; run the same command again to resume.")
+    print(format_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+Size-bounded manager for AUDIO_CACHE_DIR.
+
+Files are sharded into hashed subdirectories (ab/cd/<hash>.<ext>) and indexed in a
+SQLite manifest (hash, path, size, last access, referencing DB rows) that is kept
+in memory, so cache hits and existence checks never touch the filesystem. Other processes
+(batch jobs, cache_gc) update the manifest as well; the in-memory index is reloaded when
+the manifest's PRAGMA data_version shows a commit from another connection.
+When the byte budget (storage.audio_cache_max_mb) is exceeded, the least recently
+used files are evicted, skipping every file still referenced by `terms` or `sentences`
+and every file used within storage.gc_grace_hours (audio generated for an unsaved card or
+by a batch run that has not committed yet). Reference counts are raised by DBManager when
+it saves audio paths, so eviction needs no scan of the database; a full recount happens on
+rebuild and in the CLI.
+
+CLI:
+    python -m app.services.audio_cache stats | rebuild | shard | evict
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import config
+from app.database.db_manager import DB_PATH
+
+MANIFEST_NAME = "manifest.db"
+
+# Only files named after our own content hash are managed (and therefore evictable)
+_HASH_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# Access times are batched in memory and written back periodically
+_ACCESS_FLUSH_INTERVAL = 30.0
+
+
+def hash_of_path(path):
+    stem = Path(path).name.split(".", 1)[0]
+    return stem if _HASH_RE.match(stem) else None
+
+
+class AudioCacheManager:
+    def __init__(self, cache_dir, max_bytes=0):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.cache_dir / MANIFEST_NAME), check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS audio_files (
+                hash TEXT PRIMARY KEY,
+                rel_path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                ref_count INTEGER DEFAULT 0
+            )
+        """)
+        self._conn.commit()
+
+        # hash -> {"rel_path", "size", "last_access", "ref_count"}
+        self._entries = {}
+        self._total_bytes = 0
+        self._pending_access = {}
+        self._last_flush = time.monotonic()
+        self._data_version = None
+
+        self._load()
+        if not self._entries:
+            # First start (or lost manifest): index whatever is already on disk
+            self.rebuild()
+
+    # ------------------------------------------
+    # Manifest bookkeeping
+    # ------------------------------------------
+    def _load(self):
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        rows = self._conn.execute("SELECT hash, rel_path, size, last_access, ref_count FROM audio_files").fetchall()
+        self._entries = {
+            h: {"rel_path": p, "size": size, "last_access": ts, "ref_count": refs}
+            for h, p, size, ts, refs in rows
+        }
+        # Access times not flushed yet are newer than the manifest's
+        for file_hash, ts in list(self._pending_access.items()):
+            if file_hash in self._entries:
+                self._entries[file_hash]["last_access"] = ts
+            else:
+                del self._pending_access[file_hash]
+        self._total_bytes = sum(e["size"] for e in self._entries.values())
+
+    def _sync(self):
+        """Reloads the index if another process committed to the manifest (own commits don't count)."""
+        if self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+            self._load()
+
+    def _abs(self, rel_path):
+        return self.cache_dir / rel_path
+
+    def _upsert(self, file_hash, abs_path, last_access=None):
+        rel_path = os.path.relpath(abs_path, self.cache_dir).replace("\\", "/")
+        size = os.path.getsize(abs_path)
+        last_access = last_access or time.time()
+
+        old = self._entries.get(file_hash)
+        if old:
+            self._total_bytes -= old["size"]
+        refs = old["ref_count"] if old else 0
+        self._entries[file_hash] = {"rel_path": rel_path, "size": size, "last_access": last_access, "ref_count": refs}
+        self._total_bytes += size
+
+        self._conn.execute(
+            "INSERT OR REPLACE INTO audio_files (hash, rel_path, size, last_access, ref_count) VALUES (?, ?, ?, ?, ?)",
+            (file_hash, rel_path, size, last_access, refs)
+        )
+
+    def _forget(self, file_hash):
+        entry = self._entries.pop(file_hash, None)
+        if entry:
+            self._total_bytes -= entry["size"]
+        self._pending_access.pop(file_hash, None)
+        self._conn.execute("DELETE FROM audio_files WHERE hash = ?", (file_hash,))
+        return entry
+
+    def flush(self):
+        """Writes batched access times to the manifest."""
+        with self._lock:
+            if self._pending_access:
+                self._conn.executemany(
+                    "UPDATE audio_files SET last_access = ? WHERE hash = ?",
+                    [(ts, h) for h, ts in self._pending_access.items()]
+                )
+                self._pending_access = {}
+            self._conn.commit()
+            self._last_flush = time.monotonic()
+
+    def _touch(self, file_hash):
+        now = time.time()
+        self._entries[file_hash]["last_access"] = now
+        self._pending_access[file_hash] = now
+        if time.monotonic() - self._last_flush > _ACCESS_FLUSH_INTERVAL:
+            self.flush()
+
+    # ------------------------------------------
+    # Public API
+    # ------------------------------------------
+    def shard_path(self, file_hash, ext, create=True):
+        """Returns the sharded absolute path for a cache file (directories are created by default)."""
+        shard_dir = self.cache_dir / file_hash[:2] / file_hash[2:4]
+        if create:
+            shard_dir.mkdir(parents=True, exist_ok=True)
+        return shard_dir / f"{file_hash}{ext}"
+
+    def lookup(self, file_hash):
+        """Returns the absolute path of a cached file (in-memory check) and marks it as recently used."""
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(file_hash)
+            if entry is None:
+                return None
+            self._touch(file_hash)
+            return self._abs(entry["rel_path"])
+
+    def register(self, file_hash, abs_path):
+        """Records a newly written cache file, then enforces the byte budget."""
+        with self._lock:
+            self._upsert(file_hash, abs_path)
+            self._conn.commit()
+            if self.max_bytes and self._total_bytes > self.max_bytes:
+                self.evict()
+
+    def exists(self, path):
+        """
+        Existence check for audio paths stored in the DB (relative or absolute).
+        Managed cache files are answered from memory; anything else falls back to the filesystem.
+        """
+        if not path:
+            return False
+        abs_path = Path(path) if os.path.isabs(path) else config.PROJECT_ROOT / path
+        file_hash = hash_of_path(abs_path)
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(file_hash) if file_hash else None
+            if entry is not None and self._abs(entry["rel_path"]) == abs_path:
+                return True
+        return abs_path.exists()
+
+    def forget(self, file_hash):
+        """Drops a hash from the manifest (the file itself is not touched)."""
+        with self._lock:
+            entry = self._forget(file_hash)
+            self._conn.commit()
+            return entry
+
+    def discard(self, path):
+        """
+        Deletes an unsaved cache file unless a DB row still references it
+        (the same text may already be saved for another term or sentence).
+        """
+        if not path:
+            return False
+        abs_path = Path(path) if os.path.isabs(path) else config.PROJECT_ROOT / path
+        file_hash = hash_of_path(abs_path)
+        if file_hash:
+            refs = self._referenced_hashes()
+            if refs is None or file_hash in refs:
+                return False
+
+        with self._lock:
+            if file_hash:
+                self._forget(file_hash)
+                self._conn.commit()
+            try:
+                os.remove(abs_path)
+            except OSError:
+                return False
+        return True
+
+    def _referenced_hashes(self):
+        """Counts DB rows (terms + sentences) referencing each managed hash."""
+        refs = {}
+        try:
+            conn = sqlite3.connect(str(DB_PATH), timeout=30.0)
+            try:
+                rows = conn.execute("""
+                    SELECT audio_hash FROM terms WHERE audio_hash IS NOT NULL AND audio_hash != ''
+                    UNION ALL
+                    SELECT audio_hash FROM sentences WHERE audio_hash IS NOT NULL AND audio_hash != ''
+                """)
+                for (path,) in rows:
+                    file_hash = hash_of_path(path)
+                    if file_hash:
+                        refs[file_hash] = refs.get(file_hash, 0) + 1
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Audio cache: failed to read DB references: {e}")
+            # Without reference information nothing may be evicted
+            return None
+        return refs
+
+    def add_refs(self, paths):
+        """Counts new DB references to these audio paths (called when they are saved)."""
+        with self._lock:
+            self._sync()
+            counted = []
+            for path in paths:
+                file_hash = hash_of_path(path) if path else None
+                entry = self._entries.get(file_hash) if file_hash else None
+                if entry is not None:
+                    entry["ref_count"] += 1
+                    counted.append((entry["ref_count"], file_hash))
+            if counted:
+                self._conn.executemany("UPDATE audio_files SET ref_count = ? WHERE hash = ?", counted)
+                self._conn.commit()
+
+    def refresh_refs(self):
+        """Updates ref_count of every manifest entry from the main database."""
+        refs = self._referenced_hashes()
+        if refs is None:
+            return None
+        with self._lock:
+            for file_hash, entry in self._entries.items():
+                entry["ref_count"] = refs.get(file_hash, 0)
+            self._conn.executemany(
+                "UPDATE audio_files SET ref_count = ? WHERE hash = ?",
+                [(e["ref_count"], h) for h, e in self._entries.items()]
+            )
+            self._conn.commit()
+        return refs
+
+    def evict(self, target_bytes=None):
+        """
+        Deletes least recently used, unreferenced files until the cache fits into target_bytes
+        (default: 90% of the budget). Files used within the grace period are kept.
+        Reference counts are taken as they are (see add_refs / refresh_refs).
+        Returns (files_removed, bytes_freed).
+        """
+        if target_bytes is None:
+            if not self.max_bytes:
+                return 0, 0
+            target_bytes = int(self.max_bytes * 0.9)
+
+        with self._lock:
+            self._sync()
+            if self._total_bytes <= target_bytes:
+                return 0, 0
+
+            candidates = sorted(
+                (e["last_access"], h) for h, e in self._entries.items() if e["ref_count"] == 0
+            )
+            removed, freed = 0, 0
+            now = time.time()
+            for ts, file_hash in candidates:
+                # Never pull a file from under a caller that generated or played it recently
+                if self._total_bytes <= target_bytes or now - ts < config.CACHE_GC_GRACE_SECONDS:
+                    break
+                entry = self._forget(file_hash)
+                try:
+                    os.remove(self._abs(entry["rel_path"]))
+                except OSError:
+                    pass
+                removed += 1
+                freed += entry["size"]
+            self.flush()
+        return removed, freed
+
+    def rebuild(self):
+        """Re-indexes the cache directory from disk (keeps known access times)."""
+        with self._lock:
+            known = {h: e["last_access"] for h, e in self._entries.items()}
+            self._entries = {}
+            self._total_bytes = 0
+            self._conn.execute("DELETE FROM audio_files")
+            for path in self.cache_dir.rglob("*"):
+                file_hash = hash_of_path(path)
+                if file_hash and path.is_file() and not path.name.endswith(".part"):
+                    self._upsert(file_hash, path, last_access=known.get(file_hash, path.stat().st_mtime))
+            self._conn.commit()
+        self.refresh_refs()
+
+    def shard_existing(self, db):
+        """
+        Moves managed files that still live in the flat directory into their shard,
+        repointing DB references. Returns the number of moved files.
+        """
+        moves = []
+        with self._lock:
+            for file_hash, entry in list(self._entries.items()):
+                src = self._abs(entry["rel_path"])
+                if src.parent != self.cache_dir:
+                    continue
+                dst = self.shard_path(file_hash, src.suffix)
+                try:
+                    os.replace(src, dst)
+                except OSError as e:
+                    print(f"Audio cache: failed to move {src}: {e}")
+                    continue
+                self._upsert(file_hash, dst, last_access=entry["last_access"])
+                moves.append((str(src), str(dst)))
+            self._conn.commit()
+
+        if moves:
+            path_pairs = []
+            for src, dst in moves:
+                path_pairs.append((os.path.relpath(src, config.PROJECT_ROOT).replace("\\", "/"),
+                                   os.path.relpath(dst, config.PROJECT_ROOT).replace("\\", "/")))
+                path_pairs.append((src, dst))
+            db.replace_audio_paths(path_pairs)
+        return len(moves)
+
+    def access_times(self):
+        """{absolute path: last access timestamp} of every managed file."""
+        with self._lock:
+            return {str(self._abs(e["rel_path"])): e["last_access"] for e in self._entries.values()}
+
+    def stats(self):
+        with self._lock:
+            referenced = sum(1 for e in self._entries.values() if e["ref_count"] > 0)
+            return {
+                "files": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "referenced_files": referenced,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_audio_cache():
+    """Returns the audio cache manager of this process (created on first use)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AudioCacheManager(config.AUDIO_CACHE_DIR, config.AUDIO_CACHE_MAX_BYTES)
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and maintain the TTS audio cache.")
+    parser.add_argument("command", choices=["stats", "rebuild", "shard", "evict"])
+    args = parser.parse_args()
+
+    cache = get_audio_cache()
+    if args.command == "rebuild":
+        cache.rebuild()
+    elif args.command == "shard":
+        from app.database.db_manager import DBManager
+        print(f"Moved {cache.shard_existing(DBManager())} files into shard directories.")
+    elif args.command == "evict":
+        cache.refresh_refs()
+        removed, freed = cache.evict()
+        print(f"Evicted {removed} files ({freed / 1e6:.1f} MB).")
+
+    cache.refresh_refs()
+    s = cache.stats()
+    budget = f"{s['max_bytes'] / 1e6:.0f} MB" if s["max_bytes"] else "unlimited"
+    print(f"{s['files']} files, {s['bytes'] / 1e6:.1f} MB (budget {budget}), "
+          f"{s['referenced_files']} referenced by the database.")
+    cache.flush()
+
+
+if __name__ == "__main__":
+    main()
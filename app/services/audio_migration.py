@@ -0,0 +1,147 @@
+"""
+Transcodes the existing audio cache to the configured codec (storage.audio_format).
+
+Files are converted in parallel worker processes, the `audio_hash` references in
+`terms` and `sentences` are rewritten in one transaction, and the originals are
+removed afterwards. Re-running the tool only converts what is left.
+
+CLI:
+    python -m app.services.audio_migration --workers 4 [--format opus] [--keep-source] [--dry-run]
+"""
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
+from pathlib import Path
+
+import config
+from app.database.db_manager import DBManager
+from app.services.tts_manager import AUDIO_CODECS
+from app.services.audio_cache import get_audio_cache, hash_of_path
+from app.utils.file_helper import to_rel_path
+
+# Only our own uncompressed TTS output is converted by default
+DEFAULT_SOURCE_EXTS = (".wav",)
+
+
+def _transcode(src, dst, codec_name):
+    """Runs inside a worker process. Returns (src, dst, src_bytes, dst_bytes) or raises."""
+    import soundfile as sf
+
+    codec = AUDIO_CODECS[codec_name]
+    audio, sample_rate = sf.read(src, dtype="float32")
+
+    tmp = f"{dst}.part"
+    sf.write(tmp, audio, sample_rate, format=codec["format"], subtype=codec["subtype"])
+    os.replace(tmp, dst)
+    return src, dst, os.path.getsize(src), os.path.getsize(dst)
+
+
+def find_source_files(cache_dir, target_ext, source_exts=DEFAULT_SOURCE_EXTS):
+    for path in Path(cache_dir).rglob("*"):
+        ext = path.suffix.lower()
+        if path.is_file() and ext in source_exts and ext != target_ext:
+            yield path
+
+
+def migrate_audio_cache(db, codec_name=None, workers=4, keep_source=False, dry_run=False, on_progress=None):
+    """
+    Converts every source file in AUDIO_CACHE_DIR to codec_name and repoints DB references.
+    Returns a stats dict with file counts and byte totals.
+    """
+    codec_name = codec_name or config.AUDIO_FORMAT
+    target_ext = AUDIO_CODECS[codec_name]["ext"]
+    sources = list(find_source_files(config.AUDIO_CACHE_DIR, target_ext))
+
+    stats = {"files": len(sources), "converted": 0, "failed": 0,
+             "bytes_before": 0, "bytes_after": 0, "db_rows": 0}
+    if dry_run or not sources:
+        stats["bytes_before"] = sum(p.stat().st_size for p in sources)
+        return stats
+
+    cache = get_audio_cache()
+
+    def _target_for(path):
+        # Managed cache files land in their shard, anything else next to the source
+        file_hash = hash_of_path(path)
+        return cache.shard_path(file_hash, target_ext) if file_hash else path.with_suffix(target_ext)
+
+    converted = []
+    # spawn: also started from the Streamlit server, whose threads must not be forked
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, int(workers)),
+                                                mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            executor.submit(_transcode, str(p), str(_target_for(p)), codec_name)
+            for p in sources
+        ]
+        for i, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            try:
+                src, dst, src_bytes, dst_bytes = future.result()
+                converted.append((src, dst))
+                stats["converted"] += 1
+                stats["bytes_before"] += src_bytes
+                stats["bytes_after"] += dst_bytes
+            except Exception as e:
+                print(f"Audio migration error: {e}")
+                stats["failed"] += 1
+            if on_progress:
+                on_progress(i, len(futures))
+
+    # References may be stored relative to the project root or as absolute paths
+    path_pairs = []
+    for src, dst in converted:
+        path_pairs.append((to_rel_path(src), to_rel_path(dst)))
+        path_pairs.append((src, dst))
+    stats["db_rows"] = db.replace_audio_paths(path_pairs)
+
+    for _src, dst in converted:
+        file_hash = hash_of_path(dst)
+        if file_hash:
+            cache.register(file_hash, dst)
+
+    if not keep_source:
+        for src, _dst in converted:
+            try:
+                os.remove(src)
+            except OSError:
+                pass
+
+    return stats
+
+
+def format_stats(stats):
+    saved = stats["bytes_before"] - stats["bytes_after"]
+    ratio = stats["bytes_before"] / stats["bytes_after"] if stats["bytes_after"] else 0.0
+    per_play = saved / stats["converted"] if stats["converted"] else 0
+    return (
+        f"{stats['converted']}/{stats['files']} files converted ({stats['failed']} failed), "
+        f"{stats['db_rows']} DB references updated. "
+        f"Disk: {stats['bytes_before'] / 1e6:.1f} MB -> {stats['bytes_after'] / 1e6:.1f} MB "
+        f"(saved {saved / 1e6:.1f} MB, {ratio:.1f}x smaller). "
+        f"Bandwidth saved per playback: {per_play / 1e3:.1f} KB on average."
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcode the TTS audio cache to a compressed codec.")
+    parser.add_argument("--format", choices=sorted(AUDIO_CODECS), default=config.AUDIO_FORMAT,
+                        help="Target codec (defaults to storage.audio_format)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Worker processes")
+    parser.add_argument("--keep-source", action="store_true", help="Keep the original files")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be converted")
+    args = parser.parse_args()
+
+    if args.format == "wav":
+        print("Target format is wav; nothing to compress.")
+        return
+
+    stats = migrate_audio_cache(DBManager(), codec_name=args.format, workers=args.workers,
+                                keep_source=args.keep_source, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"{stats['files']} files ({stats['bytes_before'] / 1e6:.1f} MB) would be converted to {args.format}.")
+    else:
+        print(format_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
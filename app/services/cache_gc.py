@@ -0,0 +1,181 @@
+"""
+Garbage collector for orphan files in AUDIO_CACHE_DIR and IMAGE_CACHE_DIR.
+
+Regenerated images, crashed sessions and overwritten `audio_hash` values leave files that
+no saved term or sentence references. The collector streams every referenced path from
+`terms` and `sentences` into a set, walks both cache directories with os.scandir and
+removes (or moves to data/cache_quarantine/<timestamp>/) every unreferenced file that
+is older than the grace period (storage.gc_grace_hours). Audio files played within the
+grace period are kept as well, since the audio cache manifest records their last access.
+
+Every removed file is dropped from its cache manifest right away; a running app notices
+the manifest change and reloads its in-memory audio index, so the collector can run while
+the app is open.
+
+CLI:
+    python -m app.services.cache_gc [--dry-run] [--quarantine] [--grace-hours 24] [--purge-quarantine]
+"""
+import argparse
+import os
+import shutil
+import time
+
+import config
+from app.database.db_manager import DBManager
+from app.services.audio_cache import get_audio_cache, hash_of_path as audio_hash_of_path, MANIFEST_NAME
+from app.services.image_store import get_image_store, hash_of_path as image_hash_of_path
+from app.utils.file_helper import to_abs_path
+from app.utils.image_processing import medium_path_for
+
+QUARANTINE_DIR = config.DATA_DIR / "cache_quarantine"
+
+
+def _norm(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def referenced_paths(db):
+    """Set of normalized absolute paths referenced by the database (thumbnails imply their medium rendition)."""
+    refs = set()
+    for path in db.iter_media_paths():
+        abs_path = to_abs_path(path)
+        refs.add(_norm(abs_path))
+        medium = medium_path_for(abs_path)
+        if medium:
+            refs.add(_norm(medium))
+    return refs
+
+
+def _scan_files(root):
+    """Yields os.DirEntry objects of all regular files below root (iterative os.scandir walk)."""
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+def find_orphans(cache_dir, refs, grace_seconds, last_used=None, now=None):
+    """
+    Yields (abs_path, size) of unreferenced files not modified or used within grace_seconds.
+    last_used: {normalized path: last access timestamp}.
+    """
+    last_used = last_used or {}
+    now = now or time.time()
+    for entry in _scan_files(cache_dir):
+        if entry.name.startswith(MANIFEST_NAME):
+            continue
+        if _norm(entry.path) in refs:
+            continue
+        st = entry.stat(follow_symlinks=False)
+        used = max(st.st_mtime, last_used.get(_norm(entry.path), 0.0))
+        if now - used < grace_seconds:
+            continue
+        yield entry.path, st.st_size
+
+
+def collect(db, grace_seconds=None, dry_run=False, quarantine=False, on_file=None):
+    """
+    Removes (or quarantines) orphan files from both caches.
+    on_file(kind, path, size) is called for every orphan. Returns a stats dict per cache.
+    """
+    grace_seconds = config.CACHE_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    refs = referenced_paths(db)
+    audio_cache = get_audio_cache()
+    image_store = get_image_store()
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+
+    caches = [
+        ("audio", config.AUDIO_CACHE_DIR, {_norm(p): ts for p, ts in audio_cache.access_times().items()}),
+        ("image", config.IMAGE_CACHE_DIR, {}),
+    ]
+    stats = {}
+    for kind, cache_dir, last_used in caches:
+        s = stats[kind] = {"files": 0, "bytes": 0, "failed": 0}
+        for path, size in find_orphans(cache_dir, refs, grace_seconds, last_used):
+            if on_file:
+                on_file(kind, path, size)
+            if not dry_run:
+                try:
+                    if quarantine:
+                        target = QUARANTINE_DIR / stamp / kind / os.path.relpath(path, cache_dir)
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                        shutil.move(path, target)
+                    else:
+                        os.remove(path)
+                except OSError as e:
+                    print(f"Cache GC: failed to remove {path}: {e}")
+                    s["failed"] += 1
+                    continue
+                if kind == "audio":
+                    # Still indexed under this path (the index answers from memory, the file is gone)
+                    file_hash = audio_hash_of_path(path)
+                    if file_hash and audio_cache.exists(path):
+                        audio_cache.forget(file_hash)
+                else:
+                    file_hash = image_hash_of_path(path)
+                    if file_hash and not os.path.exists(image_store.path_for(file_hash, create=False)):
+                        image_store.forget(file_hash)
+            s["files"] += 1
+            s["bytes"] += size
+    return stats
+
+
+def purge_quarantine(older_than_seconds):
+    """Deletes quarantine batches older than the given age. Returns (batches, bytes)."""
+    removed, freed = 0, 0
+    if not QUARANTINE_DIR.exists():
+        return removed, freed
+    now = time.time()
+    for batch in QUARANTINE_DIR.iterdir():
+        if not batch.is_dir() or now - batch.stat().st_mtime < older_than_seconds:
+            continue
+        freed += sum(entry.stat().st_size for entry in _scan_files(batch))
+        shutil.rmtree(batch, ignore_errors=True)
+        removed += 1
+    return removed, freed
+
+
+def format_stats(stats, dry_run=False):
+    verb = "would be removed" if dry_run else "removed"
+    return "; ".join(
+        f"{kind}: {s['files']} orphan files ({s['bytes'] / 1e6:.1f} MB) {verb}"
+        + (f", {s['failed']} failed" if s["failed"] else "")
+        for kind, s in stats.items()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove audio/image cache files no saved term or sentence uses.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report orphans and their size")
+    parser.add_argument("--quarantine", action="store_true",
+                        help=f"Move orphans to {QUARANTINE_DIR} instead of deleting them")
+    parser.add_argument("--grace-hours", type=float, default=config.CACHE_GC_GRACE_SECONDS / 3600,
+                        help="Keep orphans younger than this (defaults to storage.gc_grace_hours)")
+    parser.add_argument("--purge-quarantine", action="store_true",
+                        help="Also delete quarantine batches older than the grace period")
+    parser.add_argument("--verbose", action="store_true", help="List every orphan file")
+    args = parser.parse_args()
+
+    def _print_file(kind, path, size):
+        print(f"[{kind}] {path} ({size / 1e3:.1f} KB)")
+
+    stats = collect(DBManager(), grace_seconds=args.grace_hours * 3600, dry_run=args.dry_run,
+                    quarantine=args.quarantine, on_file=_print_file if args.verbose else None)
+    print(format_stats(stats, dry_run=args.dry_run))
+
+    if args.purge_quarantine and not args.dry_run:
+        batches, freed = purge_quarantine(args.grace_hours * 3600)
+        print(f"Purged {batches} quarantine batches ({freed / 1e6:.1f} MB).")
+
+
+if __name__ == "__main__":
+    main()
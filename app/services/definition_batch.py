@@ -0,0 +1,198 @@
+"""
+Batch generation of definitions for every term of a domain whose `definition` is empty.
+
+Runs on the async OpenAI client: a fixed number of worker coroutines (bounded concurrency)
+share a token bucket (requests per minute), retry transient failures with exponential
+backoff and write results back to SQLite in bulk every few items.
+
+The job is resumable: only terms that still lack a definition are selected, and answers
+already in the LLM response cache are reused without an API call.
+
+CLI:
+    python -m app.services.definition_batch --domain "Stanford_CS336" --concurrency 8 --rpm 120
+"""
+import argparse
+import asyncio
+import time
+
+import config
+from app.database.db_manager import DBManager
+from app.services.llm_cache import get_llm_cache
+from app.services.llm_client import LLMClient, DEFAULT_TEMPERATURE
+from app.services.llm_metrics import get_llm_metrics, usage_of
+from app.utils.rate_limit import TokenBucket
+
+
+class DefinitionBatchJob:
+    def __init__(self, db, domain_id, concurrency=None, requests_per_minute=None, max_retries=4, commit_every=20):
+        self.db = db
+        self.domain_id = domain_id
+        self.concurrency = max(1, int(concurrency or config.LLM_BATCH_CONCURRENCY))
+        self.requests_per_minute = max(1, int(requests_per_minute or config.LLM_REQUESTS_PER_MINUTE))
+        self.max_retries = max(0, int(max_retries))
+        self.commit_every = max(1, int(commit_every))
+
+        self.model = config.LLM_MODEL
+        self.cache = get_llm_cache() if config.LLM_CACHE_ENABLED else None
+        self.metrics = get_llm_metrics()
+        self._updates = []
+
+    def _collect(self):
+        """Groups pending terms by word, so duplicates are requested only once."""
+        pending = {}
+        for row in self.db.get_terms_missing_definition(self.domain_id):
+            word = (row['word'] or "").strip()
+            if word:
+                pending.setdefault(word, []).append(row['id'])
+        return pending
+
+    def _flush(self):
+        if self._updates:
+            self.db.bulk_update_definitions(self._updates)
+            self._updates = []
+
+    async def _request(self, client, bucket, word, stats):
+        """Returns the definition of a word, or None after max_retries failed attempts."""
+        prompt = LLMClient.definition_prompt(word)
+        key = LLMClient.definition_key(word, self.model)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached:
+                stats["cached"] += 1
+                self.metrics.record("definition_batch", self.model, self.domain_id, cache_hit=True)
+                return cached
+
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire_async()
+            try:
+                start = time.perf_counter()
+                response = await client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": LLMClient.DEFINITION_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=DEFAULT_TEMPERATURE
+                )
+                content = (response.choices[0].message.content or "").strip()
+                prompt_tokens, completion_tokens = usage_of(response)
+                self.metrics.record("definition_batch", self.model, self.domain_id,
+                                    latency=time.perf_counter() - start,
+                                    prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+                if self.cache is not None and content:
+                    self.cache.record_api_call(time.perf_counter() - start)
+                    self.cache.put(key, self.model, content)
+                return content or None
+            except Exception as e:
+                self.metrics.record("definition_batch", self.model, self.domain_id,
+                                    latency=time.perf_counter() - start, ok=False)
+                status = getattr(e, "status_code", None)
+                # Client errors other than rate limiting won't succeed on retry
+                if status is not None and 400 <= status < 500 and status != 429:
+                    print(f"Batch LLM Error ({word}): {e}")
+                    return None
+                if attempt == self.max_retries:
+                    print(f"Batch LLM Error ({word}), giving up after {attempt + 1} attempts: {e}")
+                    return None
+                stats["retries"] += 1
+                await asyncio.sleep(min(30.0, 2 ** attempt))
+        return None
+
+    async def _run_async(self, pending, stats, on_progress):
+        from openai import AsyncOpenAI
+
+        # Same per-request timeout as the interactive client; retries are done below
+        client = AsyncOpenAI(base_url=config.LLM_BASE_URL, api_key=config.LLM_API_KEY,
+                             max_retries=0, timeout=config.LLM_REQUEST_TIMEOUT)
+        bucket = TokenBucket.per_minute(self.requests_per_minute, burst=self.concurrency)
+        queue = asyncio.Queue()
+        for word in pending:
+            queue.put_nowait(word)
+        total = len(pending)
+
+        async def worker():
+            while True:
+                try:
+                    word = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                definition = await self._request(client, bucket, word, stats)
+                if definition:
+                    self._updates.extend((definition, term_id) for term_id in pending[word])
+                    stats["done"] += 1
+                else:
+                    stats["failed"] += 1
+                if on_progress:
+                    on_progress(stats["done"] + stats["failed"], total)
+                if len(self._updates) >= self.commit_every:
+                    self._flush()
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            # Persist whatever finished; unfinished terms are picked up by the next run
+            self._flush()
+            await client.close()
+
+    def run(self, on_progress=None):
+        """
+        Generates all missing definitions. on_progress(done, total) is called after each term.
+        Returns a stats dict (also on interruption, with 'interrupted': True).
+        """
+        pending = self._collect()
+        stats = {"total": len(pending), "done": 0, "failed": 0, "cached": 0, "retries": 0,
+                 "elapsed": 0.0, "items_per_sec": 0.0, "interrupted": False}
+        if not pending:
+            return stats
+
+        start = time.perf_counter()
+        try:
+            asyncio.run(self._run_async(pending, stats, on_progress))
+        except KeyboardInterrupt:
+            stats["interrupted"] = True
+        finally:
+            self._flush()
+
+        stats["elapsed"] = time.perf_counter() - start
+        if stats["elapsed"] > 0:
+            stats["items_per_sec"] = stats["done"] / stats["elapsed"]
+        return stats
+
+
+def format_stats(stats):
+    return (
+        f"{stats['done']}/{stats['total']} definitions generated ({stats['cached']} from cache), "
+        f"{stats['failed']} failed, {stats['retries']} retries in {stats['elapsed']:.1f}s "
+        f"({stats['items_per_sec']:.2f} terms/s)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate missing term definitions for a domain.")
+    parser.add_argument("--domain", required=True, help="Domain name or id")
+    parser.add_argument("--concurrency", type=int, default=config.LLM_BATCH_CONCURRENCY, help="Parallel requests")
+    parser.add_argument("--rpm", type=int, default=config.LLM_REQUESTS_PER_MINUTE, help="Requests per minute")
+    parser.add_argument("--retries", type=int, default=4, help="Retries per term on transient errors")
+    parser.add_argument("--commit-every", type=int, default=20, help="Definitions per DB commit")
+    args = parser.parse_args()
+
+    db = DBManager()
+    domain_id = db.resolve_domain(args.domain)
+    if domain_id is None:
+        print(f"Domain not found: {args.domain}")
+        return
+
+    def _print_progress(done, total):
+        print(f"\r[{done}/{total}]", end="", flush=True)
+
+    job = DefinitionBatchJob(db, domain_id, concurrency=args.concurrency, requests_per_minute=args.rpm,
+                             max_retries=args.retries, commit_every=args.commit_every)
+    stats = job.run(on_progress=_print_progress)
+    print()
+    if stats["interrupted"]:
+        print("Interrupted. Progress was saved; run the same command again to resume.")
+    print(format_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Background pre-generation of sentence translations (`sentences.content_cn`) and contextual
+term explanations (`matches.cn_explanation`).
+
+Finds matched (term, sentence) pairs with a missing translation or explanation, most
+important terms first (star level, then frequency), and sends them as packed JSON-mode
+requests (LLMClient.explain_terms_packed) from a small thread pool, paced by a shared
+token bucket. Results only fill empty fields, so nothing a user saved is overwritten, and
+they share cache entries with the "AI Explain" button.
+
+The Batch Jobs tab starts it as a background thread of the server process; the CLI runs it
+in the foreground:
+    python -m app.services.explanation_pipeline --domain "Stanford_CS336" --limit 500
+"""
+import argparse
+import concurrent.futures
+import threading
+import time
+
+import config
+from app.database.db_manager import DBManager
+from app.services.llm_client import LLMClient
+from app.utils.rate_limit import TokenBucket
+
+
+class ExplanationPipeline:
+    def __init__(self, domain_id=None, pack_size=None, concurrency=None, requests_per_minute=None,
+                 limit=None, commit_every=40):
+        self.domain_id = domain_id
+        self.pack_size = max(1, int(pack_size or config.LLM_PACK_SIZE))
+        self.concurrency = max(1, int(concurrency or config.LLM_BATCH_CONCURRENCY))
+        self.requests_per_minute = max(1, int(requests_per_minute or config.LLM_REQUESTS_PER_MINUTE))
+        self.limit = limit
+        self.commit_every = max(1, int(commit_every))
+
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"total": 0, "done": 0, "failed": 0, "elapsed": 0.0, "running": False, "stopped": False}
+
+    # ------------------------------------------
+    # Control
+    # ------------------------------------------
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Runs the pipeline in a daemon thread. Returns immediately."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="explanation-pipeline", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops after the packs already in flight; their results are still saved."""
+        self._stop.set()
+
+    # ------------------------------------------
+    # Work
+    # ------------------------------------------
+    def _packs(self, rows):
+        for start in range(0, len(rows), self.pack_size):
+            yield rows[start:start + self.pack_size]
+
+    def _explain_pack(self, llm, bucket, pack):
+        pairs = [(row['word'], llm.bilingual_context(row['content_en'])) for row in pack]
+        domains = {row['domain_id'] for row in pack}
+        domain_id = domains.pop() if len(domains) == 1 else None
+        results = llm.explain_terms_packed(pairs, pack_size=len(pairs), feature="explain_pipeline",
+                                           domain_id=domain_id, limiter=bucket)
+        return pack, results
+
+    def run(self, on_progress=None):
+        """
+        Generates all missing translations/explanations (blocking).
+        on_progress(done, total) is called after each pack. Returns the stats dict.
+        """
+        # SQLite connections stay with the thread that runs the pipeline
+        db = DBManager()
+        rows = db.get_matches_missing_explanations(self.domain_id, limit=self.limit)
+        self.stats.update(total=len(rows), done=0, failed=0, elapsed=0.0, running=True, stopped=False)
+        if not rows:
+            self.stats["running"] = False
+            return self.stats
+
+        llm = LLMClient()
+        bucket = TokenBucket.per_minute(self.requests_per_minute, burst=self.concurrency)
+        start = time.perf_counter()
+        sentence_updates, match_updates = [], []
+        seen_sentences = set()
+
+        def flush():
+            if sentence_updates or match_updates:
+                db.bulk_fill_explanations(sentence_updates, match_updates)
+                sentence_updates.clear()
+                match_updates.clear()
+
+        packs = self._packs(rows)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency)
+        in_flight = set()
+        try:
+            # Bounded submission keeps priority order and lets stop() take effect quickly
+            for pack in packs:
+                in_flight.add(executor.submit(self._explain_pack, llm, bucket, pack))
+                if len(in_flight) >= self.concurrency * 2:
+                    break
+
+            while in_flight:
+                finished, in_flight = concurrent.futures.wait(
+                    in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in finished:
+                    try:
+                        pack, results = future.result()
+                    except Exception as e:
+                        print(f"Explanation pipeline error: {e}")
+                        continue
+                    for row, result in zip(pack, results):
+                        if result is None:
+                            self.stats["failed"] += 1
+                            continue
+                        if not row['content_cn'] and row['sentence_id'] not in seen_sentences:
+                            sentence_updates.append((result['translation'], row['sentence_id']))
+                            seen_sentences.add(row['sentence_id'])
+                        if not row['cn_explanation']:
+                            match_updates.append((result['explanation'], row['match_id']))
+                        self.stats["done"] += 1
+
+                    if not self._stop.is_set():
+                        next_pack = next(packs, None)
+                        if next_pack is not None:
+                            in_flight.add(executor.submit(self._explain_pack, llm, bucket, next_pack))
+                    if on_progress:
+                        on_progress(self.stats["done"] + self.stats["failed"], self.stats["total"])
+
+                if len(sentence_updates) + len(match_updates) >= self.commit_every:
+                    flush()
+        except KeyboardInterrupt:
+            self._stop.set()
+        finally:
+            # Persist whatever finished; the rest is picked up by the next run
+            flush()
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.stats["elapsed"] = time.perf_counter() - start
+            self.stats["stopped"] = self._stop.is_set()
+            self.stats["running"] = False
+        return self.stats
+
+
+def format_stats(stats):
+    return (
+        f"{stats['done']}/{stats['total']} pairs explained, {stats['failed']} failed "
+        f"in {stats['elapsed']:.1f}s"
+    )
+
+
+_background = None
+_background_lock = threading.Lock()
+
+
+def start_background(domain_id=None, **kwargs):
+    """Starts a background run unless one is active. Returns the (new or running) pipeline."""
+    global _background
+    with _background_lock:
+        if _background is None or not _background.running:
+            _background = ExplanationPipeline(domain_id, **kwargs)
+            _background.start()
+        return _background
+
+
+def current_background():
+    """The pipeline of the latest background run of this process (or None)."""
+    return _background
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate sentence translations and term explanations.")
+    parser.add_argument("--domain", default=None, help="Domain name or id (default: all domains)")
+    parser.add_argument("--limit", type=int, default=None, help="Max (term, sentence) pairs")
+    parser.add_argument("--pack-size", type=int, default=config.LLM_PACK_SIZE, help="Pairs per request")
+    parser.add_argument("--concurrency", type=int, default=config.LLM_BATCH_CONCURRENCY, help="Parallel requests")
+    parser.add_argument("--rpm", type=int, default=config.LLM_REQUESTS_PER_MINUTE, help="Requests per minute")
+    args = parser.parse_args()
+
+    domain_id = None
+    if args.domain is not None:
+        domain_id = DBManager().resolve_domain(args.domain)
+        if domain_id is None:
+            print(f"Domain not found: {args.domain}")
+            return
+
+    def _print_progress(done, total):
+        print(f"\r[{done}/{total}]", end="", flush=True)
+
+    pipeline = ExplanationPipeline(domain_id, pack_size=args.pack_size, concurrency=args.concurrency,
+                                   requests_per_minute=args.rpm, limit=args.limit)
+    stats = pipeline.run(on_progress=_print_progress)
+    print()
+    if stats["stopped"]:
+        print("Interrupted. Progress was saved; run the same command again to resume.")
+    print(format_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
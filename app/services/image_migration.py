@@ -0,0 +1,118 @@
+"""
+Converts the existing image cache into WebP renditions (see app/utils/image_processing.py).
+
+Every original in IMAGE_CACHE_DIR is validated and re-encoded in parallel worker processes
+and put into the content-addressed image store, the `terms.image_paths` references are
+repointed to the thumbnails in one transaction, and the originals are removed afterwards.
+Files that are not decodable images are left alone. Re-running the tool only converts what
+is left.
+
+CLI:
+    python -m app.services.image_migration --workers 4 [--keep-source] [--dry-run]
+"""
+import argparse
+import concurrent.futures
+import os
+from pathlib import Path
+
+import config
+from app.database.db_manager import DBManager
+from app.services.image_store import get_image_store
+from app.utils.file_helper import to_rel_path
+from app.utils.image_processing import is_rendition, make_renditions
+
+SOURCE_EXTS = (".jpg", ".jpeg", ".png", ".gif", ".webp")
+
+
+def _convert(src):
+    """Runs inside a worker process. Returns (src, renditions or None, src_bytes)."""
+    with open(src, 'rb') as in_file:
+        data = in_file.read()
+    return src, make_renditions(data), len(data)
+
+
+def find_source_files(cache_dir):
+    for path in Path(cache_dir).rglob("*"):
+        if path.is_file() and path.suffix.lower() in SOURCE_EXTS and not is_rendition(path):
+            yield path
+
+
+def migrate_image_cache(db, workers=4, keep_source=False, dry_run=False, on_progress=None):
+    """
+    Converts every original in IMAGE_CACHE_DIR and repoints DB references to the thumbnails.
+    Returns a stats dict with file counts and byte totals.
+    """
+    sources = list(find_source_files(config.IMAGE_CACHE_DIR))
+    stats = {"files": len(sources), "converted": 0, "failed": 0,
+             "bytes_before": 0, "bytes_after": 0, "db_rows": 0}
+    if dry_run or not sources:
+        stats["bytes_before"] = sum(p.stat().st_size for p in sources)
+        return stats
+
+    store = get_image_store()
+    converted = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, int(workers))) as executor:
+        futures = [executor.submit(_convert, str(p)) for p in sources]
+        for i, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            try:
+                src, renditions, src_bytes = future.result()
+                if renditions is None:
+                    print(f"Image migration: not a usable image, skipped: {src}")
+                    stats["failed"] += 1
+                else:
+                    converted.append((src, str(store.put(renditions))))
+                    stats["converted"] += 1
+                    stats["bytes_before"] += src_bytes
+                    stats["bytes_after"] += len(renditions["thumb"]) + len(renditions["medium"] or b"")
+            except Exception as e:
+                print(f"Image migration error: {e}")
+                stats["failed"] += 1
+            if on_progress:
+                on_progress(i, len(futures))
+
+    # References may be stored relative to the project root or as absolute paths
+    path_map = {}
+    for src, thumb_path in converted:
+        path_map[to_rel_path(src)] = to_rel_path(thumb_path)
+        path_map[src] = thumb_path
+    stats["db_rows"] = db.replace_image_paths(path_map)
+    store.refresh_refs()
+
+    if not keep_source:
+        for src, _thumb_path in converted:
+            try:
+                os.remove(src)
+            except OSError:
+                pass
+
+    return stats
+
+
+def format_stats(stats):
+    saved = stats["bytes_before"] - stats["bytes_after"]
+    ratio = stats["bytes_before"] / stats["bytes_after"] if stats["bytes_after"] else 0.0
+    return (
+        f"{stats['converted']}/{stats['files']} images converted ({stats['failed']} failed), "
+        f"{stats['db_rows']} terms updated. "
+        f"Disk: {stats['bytes_before'] / 1e6:.1f} MB -> {stats['bytes_after'] / 1e6:.1f} MB "
+        f"(saved {saved / 1e6:.1f} MB, {ratio:.1f}x smaller)."
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert cached term images to WebP thumbnails.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Worker processes")
+    parser.add_argument("--keep-source", action="store_true", help="Keep the original files")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be converted")
+    args = parser.parse_args()
+
+    stats = migrate_image_cache(DBManager(), workers=args.workers,
+                                keep_source=args.keep_source, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"{stats['files']} images ({stats['bytes_before'] / 1e6:.1f} MB) would be converted.")
+    else:
+        print(format_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
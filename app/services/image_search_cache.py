@@ -0,0 +1,171 @@
+"""
+Persistent cache of image search results (data/image_search_cache.db).
+
+Each query maps to the pool of image URLs scraped for it, plus the URLs already shown to
+the user. Opening a term again reuses the pool instead of scraping Google/Bing, and
+"Regenerate" draws from the URLs not shown yet; a new scrape only happens once the pool
+is exhausted or older than images.search_cache_ttl_hours. URLs that fail to download
+are dropped from their pool.
+
+CLI:
+    python -m app.services.image_search_cache stats | prune | clear
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import time
+
+import config
+
+
+def _key(query):
+    return " ".join(query.lower().split())
+
+
+class ImageSearchCache:
+    def __init__(self, db_path=None, ttl_seconds=0):
+        self.db_path = db_path or (config.DATA_DIR / "image_search_cache.db")
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_searches (
+                query TEXT PRIMARY KEY,
+                urls TEXT NOT NULL,
+                used TEXT NOT NULL DEFAULT '[]',
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _expired(self, created_at):
+        return bool(self.ttl_seconds) and time.time() - created_at > self.ttl_seconds
+
+    def _row(self, query):
+        return self._conn.execute(
+            "SELECT urls, used, created_at FROM image_searches WHERE query = ?", (_key(query),)
+        ).fetchone()
+
+    def get(self, query):
+        """Returns the cached URL pool of a query, or None on a miss / expired entry."""
+        with self._lock:
+            row = self._row(query)
+            if row is None or self._expired(row[2]):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, query, urls):
+        """Stores a freshly scraped pool. Shown (or dead) URLs that are found again stay marked."""
+        with self._lock:
+            row = self._row(query)
+            used = [u for u in json.loads(row[1]) if u in urls] if row else []
+            self._conn.execute(
+                "INSERT OR REPLACE INTO image_searches (query, urls, used, created_at) VALUES (?, ?, ?, ?)",
+                (_key(query), json.dumps(urls), json.dumps(used), time.time())
+            )
+            self._conn.commit()
+
+    def used(self, query):
+        """URLs of this query's pool that were already shown."""
+        with self._lock:
+            row = self._row(query)
+        return set(json.loads(row[1])) if row else set()
+
+    def mark_used(self, query, urls):
+        with self._lock:
+            row = self._row(query)
+            if row is None:
+                return
+            used = json.loads(row[1])
+            used.extend(u for u in urls if u not in used)
+            self._conn.execute("UPDATE image_searches SET used = ? WHERE query = ?", (json.dumps(used), _key(query)))
+            self._conn.commit()
+
+    def reset_used(self, query):
+        with self._lock:
+            self._conn.execute("UPDATE image_searches SET used = '[]' WHERE query = ?", (_key(query),))
+            self._conn.commit()
+
+    def drop(self, query, urls):
+        """
+        Removes URLs (e.g. dead links) from a query's pool. They stay marked as shown, so a
+        re-scrape that finds them again does not offer them to Regenerate.
+        """
+        with self._lock:
+            row = self._row(query)
+            if row is None:
+                return
+            pool = [u for u in json.loads(row[0]) if u not in urls]
+            used = json.loads(row[1])
+            used.extend(u for u in urls if u not in used)
+            self._conn.execute("UPDATE image_searches SET urls = ?, used = ? WHERE query = ?",
+                               (json.dumps(pool), json.dumps(used), _key(query)))
+            self._conn.commit()
+
+    def prune(self):
+        """Drops expired entries. Returns the number removed."""
+        if not self.ttl_seconds:
+            return 0
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM image_searches WHERE created_at < ?",
+                                     (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+            return cur.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM image_searches")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM image_searches").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_image_search_cache():
+    """Returns the image search cache of this process (created on first use)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ImageSearchCache(ttl_seconds=config.IMAGE_SEARCH_CACHE_TTL_SECONDS)
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and maintain the image search cache.")
+    parser.add_argument("command", choices=["stats", "prune", "clear"])
+    args = parser.parse_args()
+
+    cache = get_image_search_cache()
+    if args.command == "prune":
+        print(f"Removed {cache.prune()} entries.")
+    elif args.command == "clear":
+        cache.clear()
+        print("Cache cleared.")
+
+    s = cache.stats()
+    ttl = f"{cache.ttl_seconds / 3600:.0f} h" if cache.ttl_seconds else "none"
+    print(f"{s['entries']} cached searches (TTL {ttl}).")
+
+
+if __name__ == "__main__":
+    main()
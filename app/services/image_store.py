@@ -0,0 +1,235 @@
+"""
+Content-addressed store for term images in IMAGE_CACHE_DIR.
+
+Renditions are named after a hash of the thumbnail bytes and sharded like the audio cache
+(ab/cd/<hash>.thumb.webp, ab/cd/<hash>.medium.webp), so an image that is fetched again
+(regenerate, or the same picture for related terms) is stored only once.
+A SQLite manifest (hash, path, size, number of referencing terms) indexes the files;
+reference counts are computed from `terms.image_paths`.
+
+CLI:
+    python -m app.services.image_store stats | rebuild
+"""
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import config
+from app.database.db_manager import DB_PATH
+from app.utils.image_processing import THUMB_SUFFIX, MEDIUM_SUFFIX, medium_path_for
+
+MANIFEST_NAME = "manifest.db"
+
+_HASH_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def hash_of_path(path):
+    """Hash of a managed thumbnail/medium path, None for any other file."""
+    stem = Path(path).name.split(".", 1)[0]
+    return stem if _HASH_RE.match(stem) else None
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    with open(tmp, 'wb') as out_file:
+        out_file.write(data)
+    os.replace(tmp, path)
+
+
+class ImageStore:
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.cache_dir / MANIFEST_NAME), check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_files (
+                hash TEXT PRIMARY KEY,
+                rel_path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                ref_count INTEGER DEFAULT 0
+            )
+        """)
+        self._conn.commit()
+
+        # hash -> {"rel_path", "size", "created_at", "ref_count"}; rel_path is the thumbnail
+        self._entries = {}
+        self._load()
+        if not self._entries:
+            self.rebuild()
+
+    # ------------------------------------------
+    # Manifest bookkeeping
+    # ------------------------------------------
+    def _load(self):
+        rows = self._conn.execute("SELECT hash, rel_path, size, created_at, ref_count FROM image_files").fetchall()
+        self._entries = {
+            h: {"rel_path": p, "size": size, "created_at": ts, "ref_count": refs}
+            for h, p, size, ts, refs in rows
+        }
+
+    def _abs(self, rel_path):
+        return self.cache_dir / rel_path
+
+    def _upsert(self, file_hash, thumb_path, created_at=None):
+        size = os.path.getsize(thumb_path)
+        medium = medium_path_for(thumb_path)
+        if medium and os.path.exists(medium):
+            size += os.path.getsize(medium)
+        old = self._entries.get(file_hash)
+        entry = {
+            "rel_path": os.path.relpath(thumb_path, self.cache_dir).replace("\\", "/"),
+            "size": size,
+            "created_at": created_at or (old["created_at"] if old else time.time()),
+            "ref_count": old["ref_count"] if old else 0,
+        }
+        self._entries[file_hash] = entry
+        self._conn.execute(
+            "INSERT OR REPLACE INTO image_files (hash, rel_path, size, created_at, ref_count) VALUES (?, ?, ?, ?, ?)",
+            (file_hash, entry["rel_path"], entry["size"], entry["created_at"], entry["ref_count"])
+        )
+
+    def forget(self, file_hash):
+        """Drops a hash from the manifest (the files themselves are not touched)."""
+        with self._lock:
+            entry = self._entries.pop(file_hash, None)
+            self._conn.execute("DELETE FROM image_files WHERE hash = ?", (file_hash,))
+            self._conn.commit()
+            return entry
+
+    # ------------------------------------------
+    # Public API
+    # ------------------------------------------
+    def path_for(self, file_hash, suffix=THUMB_SUFFIX, create=True):
+        shard_dir = self.cache_dir / file_hash[:2] / file_hash[2:4]
+        if create:
+            shard_dir.mkdir(parents=True, exist_ok=True)
+        return shard_dir / f"{file_hash}{suffix}"
+
+    def lookup(self, file_hash):
+        """Absolute thumbnail path of a stored hash, or None."""
+        with self._lock:
+            entry = self._entries.get(file_hash)
+            return self._abs(entry["rel_path"]) if entry else None
+
+    def put(self, renditions):
+        """
+        Stores the renditions of an image (see image_processing.make_renditions).
+        Identical images are written only once. Returns the absolute thumbnail path.
+        """
+        file_hash = content_hash(renditions["thumb"])
+        with self._lock:
+            existing = self.lookup(file_hash)
+            if existing is not None and existing.exists():
+                return existing
+
+            thumb_path = self.path_for(file_hash)
+            _write_atomic(thumb_path, renditions["thumb"])
+            if renditions.get("medium"):
+                _write_atomic(self.path_for(file_hash, MEDIUM_SUFFIX), renditions["medium"])
+            self._upsert(file_hash, thumb_path)
+            self._conn.commit()
+            return thumb_path
+
+    def _referenced_hashes(self):
+        """Counts terms referencing each stored hash (a term counts once per image)."""
+        refs = {}
+        try:
+            conn = sqlite3.connect(str(DB_PATH), timeout=30.0)
+            try:
+                rows = conn.execute("SELECT image_paths FROM terms WHERE image_paths IS NOT NULL AND image_paths != ''")
+                for (paths,) in rows:
+                    for file_hash in {hash_of_path(p.strip()) for p in paths.split(",")}:
+                        if file_hash:
+                            refs[file_hash] = refs.get(file_hash, 0) + 1
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Image store: failed to read DB references: {e}")
+            return None
+        return refs
+
+    def refresh_refs(self):
+        """Updates ref_count of every manifest entry from `terms.image_paths`. Returns {hash: count} or None."""
+        refs = self._referenced_hashes()
+        if refs is None:
+            return None
+        with self._lock:
+            for file_hash, entry in self._entries.items():
+                entry["ref_count"] = refs.get(file_hash, 0)
+            self._conn.executemany(
+                "UPDATE image_files SET ref_count = ? WHERE hash = ?",
+                [(e["ref_count"], h) for h, e in self._entries.items()]
+            )
+            self._conn.commit()
+        return refs
+
+    def entries(self):
+        """Snapshot of the manifest: {hash: entry dict}."""
+        with self._lock:
+            return {h: dict(e) for h, e in self._entries.items()}
+
+    def rebuild(self):
+        """Re-indexes the stored thumbnails from disk."""
+        with self._lock:
+            self._entries = {}
+            self._conn.execute("DELETE FROM image_files")
+            for path in self.cache_dir.rglob(f"*{THUMB_SUFFIX}"):
+                file_hash = hash_of_path(path)
+                if file_hash and path.is_file():
+                    self._upsert(file_hash, path, created_at=path.stat().st_mtime)
+            self._conn.commit()
+        self.refresh_refs()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "bytes": sum(e["size"] for e in self._entries.values()),
+                "referenced_files": sum(1 for e in self._entries.values() if e["ref_count"] > 0),
+                "references": sum(e["ref_count"] for e in self._entries.values()),
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_image_store():
+    """Returns the image store of this process (created on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ImageStore(config.IMAGE_CACHE_DIR)
+    return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and maintain the content-addressed image store.")
+    parser.add_argument("command", choices=["stats", "rebuild"])
+    args = parser.parse_args()
+
+    store = get_image_store()
+    if args.command == "rebuild":
+        store.rebuild()
+
+    store.refresh_refs()
+    s = store.stats()
+    print(f"{s['files']} images, {s['bytes'] / 1e6:.1f} MB, {s['referenced_files']} referenced "
+          f"({s['references']} references from terms).")
+
+
+if __name__ == "__main__":
+    main()
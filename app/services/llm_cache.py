@@ -0,0 +1,208 @@
+"""
+Persistent cache for LLM responses (data/llm_cache.db).
+
+Responses are keyed by model, system prompt, user prompt, temperature and output mode,
+so re-opening a term, re-clicking "AI Explain" or two learners asking the same question
+are answered locally. Entries expire after llm.cache_ttl_hours and the table is capped
+at llm.cache_max_entries (least recently used entries are pruned first).
+
+Hit / miss counts and latencies are kept in the same database (cache_stats), summed over
+all processes, so the CLI can report them for the running app.
+
+CLI:
+    python -m app.services.llm_cache stats | prune | clear
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import time
+
+import config
+
+# The size cap is enforced every this many writes, not on each one
+_PRUNE_EVERY = 50
+
+_STAT_NAMES = ("hits", "misses", "hit_seconds", "api_calls", "api_seconds", "streams", "ttft_seconds")
+
+
+class LLMResponseCache:
+    def __init__(self, db_path=None, ttl_seconds=0, max_entries=0):
+        self.db_path = db_path or (config.DATA_DIR / "llm_cache.db")
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_stats (
+                name TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+        self._writes = 0
+        # Counter increments not written yet; misses are flushed with the next write
+        # (the API call that follows them) instead of costing a write of their own
+        self._pending = dict.fromkeys(_STAT_NAMES, 0)
+
+    def _flush_stats_locked(self):
+        rows = [(name, value) for name, value in self._pending.items() if value]
+        if rows:
+            self._conn.executemany(
+                "INSERT INTO cache_stats (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", rows
+            )
+            self._pending = dict.fromkeys(_STAT_NAMES, 0)
+
+    def _expired(self, created_at, now):
+        return bool(self.ttl_seconds) and now - created_at > self.ttl_seconds
+
+    def get(self, key):
+        """Returns the cached response (str or dict) or None on a miss / expired entry."""
+        start = time.perf_counter()
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                self._pending["misses"] += 1
+                if row is not None:
+                    self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                    self._flush_stats_locked()
+                    self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+            self._pending["hits"] += 1
+            self._pending["hit_seconds"] += time.perf_counter() - start
+            self._flush_stats_locked()
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, model, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, json.dumps(response, ensure_ascii=False), now, now)
+            )
+            self._flush_stats_locked()
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                self._prune_locked()
+
+    def record_api_call(self, seconds, ttft=None):
+        """Latency of a request that had to go to the API (cache miss or bypass); ttft for streamed ones."""
+        with self._lock:
+            self._pending["api_calls"] += 1
+            self._pending["api_seconds"] += seconds
+            if ttft is not None:
+                self._pending["streams"] += 1
+                self._pending["ttft_seconds"] += ttft
+            self._flush_stats_locked()
+            self._conn.commit()
+
+    def _prune_locked(self):
+        removed = 0
+        if self.ttl_seconds:
+            cur = self._conn.execute(
+                "DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            removed += cur.rowcount
+        if self.max_entries:
+            cur = self._conn.execute("""
+                DELETE FROM llm_responses WHERE key IN (
+                    SELECT key FROM llm_responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            removed += cur.rowcount
+        self._conn.commit()
+        return removed
+
+    def prune(self):
+        """Drops expired entries and trims the table to max_entries. Returns the number removed."""
+        with self._lock:
+            return self._prune_locked()
+
+    def clear(self):
+        """Drops all responses and resets the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+            self._conn.execute("DELETE FROM cache_stats")
+            self._pending = dict.fromkeys(_STAT_NAMES, 0)
+            self._conn.commit()
+
+    def stats(self):
+        """Entry count plus hit / miss / latency counters summed over every process using the cache."""
+        with self._lock:
+            self._flush_stats_locked()
+            self._conn.commit()
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+            c = dict.fromkeys(_STAT_NAMES, 0)
+            c.update(self._conn.execute("SELECT name, value FROM cache_stats").fetchall())
+        hits, misses = int(c["hits"]), int(c["misses"])
+        api_calls, streams = int(c["api_calls"]), int(c["streams"])
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "avg_hit_ms": c["hit_seconds"] / hits * 1000 if hits else 0.0,
+            "api_calls": api_calls,
+            "avg_api_ms": c["api_seconds"] / api_calls * 1000 if api_calls else 0.0,
+            "avg_ttft_ms": c["ttft_seconds"] / streams * 1000 if streams else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Returns the LLM response cache of this process (created on first use)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache(ttl_seconds=config.LLM_CACHE_TTL_SECONDS,
+                                      max_entries=config.LLM_CACHE_MAX_ENTRIES)
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and maintain the LLM response cache.")
+    parser.add_argument("command", choices=["stats", "prune", "clear"])
+    args = parser.parse_args()
+
+    cache = get_llm_cache()
+    if args.command == "prune":
+        print(f"Removed {cache.prune()} entries.")
+    elif args.command == "clear":
+        cache.clear()
+        print("Cache cleared.")
+
+    s = cache.stats()
+    ttl = f"{cache.ttl_seconds / 3600:.0f} h" if cache.ttl_seconds else "none"
+    cap = cache.max_entries or "unlimited"
+    print(f"{s['entries']} cached responses (TTL {ttl}, cap {cap}).")
+    print(f"Lookups: {s['hits']} hits, {s['misses']} misses (hit rate {s['hit_rate']:.1%}).")
+    print(f"Latency: {s['avg_hit_ms']:.1f} ms per hit, {s['avg_api_ms']:.0f} ms per API call "
+          f"({s['api_calls']} calls); time to first token {s['avg_ttft_ms']:.0f} ms over {s['streams']} streams.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,329 @@
-from openai import OpenAI
+import hashlib
 import json
+import time
 import config
+from app.services.llm_cache import get_llm_cache
+from app.services.llm_metrics import get_llm_metrics, usage_of
+from app.services.llm_transport import get_llm_transport
+from app.utils.single_flight import SingleFlight
+
+# Identical prompts sent concurrently (double clicks, several learners on the same term)
+# are collapsed into a single API request per process. A leader gets at most its request
+# deadline; waiters that outlast it send their own request.
+_request_flight = SingleFlight(wait_timeout=config.LLM_REQUEST_DEADLINE + 5)
+
+DEFAULT_TEMPERATURE = 0.3
+
+
+def _request_key(model, system_prompt, prompt, temperature, json_mode=False):
+    raw = json.dumps([model, system_prompt, prompt, temperature, json_mode], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _replay(text):
+    """Cached answers are served through the same generator interface as live streams."""
+    yield text
 
 
 class LLMClient:
+    # Shared by the study dialog and the batch definition job, so both use the same cache entries
+    DEFINITION_SYSTEM_PROMPT = "You are a helpful dictionary assistant. Output only the definition."
+
+    @staticmethod
+    def definition_prompt(term):
+        return f"Provide a clear, concise English definition and its Chinese translation for the term '{term}'."
+
+    @classmethod
+    def definition_key(cls, term, model=None):
+        """Cache key of get_definition(term), for callers that read the cache directly (batch job)."""
+        return _request_key(model or config.LLM_MODEL, cls.DEFINITION_SYSTEM_PROMPT, cls.definition_prompt(term),
+                            DEFAULT_TEMPERATURE)
+
     def __init__(self):
-        # Initialize client with unified LLM_API_KEY and LLM_BASE_URL
-        self.client = OpenAI(
-            base_url=config.LLM_BASE_URL,
-            api_key=config.LLM_API_KEY
-        )
+        # Process-wide client (LLM_API_KEY / LLM_BASE_URL): keep-alive pool, deadlines, retries, breaker
+        self.transport = get_llm_transport()
         self.model = config.LLM_MODEL
+        self.cache = get_llm_cache() if config.LLM_CACHE_ENABLED else None
+        self.metrics = get_llm_metrics()
+
+    def _cached(self, key, bypass_cache, feature, domain_id):
+        if self.cache is None or bypass_cache:
+            return None
+        start = time.perf_counter()
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.metrics.record(feature, self.model, domain_id, latency=time.perf_counter() - start, cache_hit=True)
+        return cached
+
+    def _record_call(self, feature, domain_id, start, response=None, ttft=None, ok=True):
+        latency = time.perf_counter() - start
+        if self.cache is not None:
+            self.cache.record_api_call(latency, ttft=ttft)
+        prompt_tokens, completion_tokens = usage_of(response)
+        self.metrics.record(feature, self.model, domain_id, latency=latency, ttft=ttft,
+                            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, ok=ok)
+
+    def get_completion(self, prompt, system_prompt="You are a helpful assistant.", bypass_cache=False, stream=False,
+                       feature="completion", domain_id=None):
+        """
+        bypass_cache: always ask the API (e.g. "regenerate"); the fresh answer replaces the cached one.
+        stream: return a generator of text deltas (for st.write_stream) instead of the full text.
+        feature / domain_id: tags for the LLM metrics.
+        """
+        key = _request_key(self.model, system_prompt, prompt, DEFAULT_TEMPERATURE)
+        cached = self._cached(key, bypass_cache, feature, domain_id)
+        if stream:
+            if cached is not None:
+                return _replay(cached)
+            return self._stream_completion(key, prompt, system_prompt, feature, domain_id)
+        if cached is not None:
+            return cached
+        return _request_flight.do(key, self._fetch_completion, key, prompt, system_prompt, feature, domain_id)
 
-    def get_completion(self, prompt, system_prompt="You are a helpful assistant."):
+    def _stream_completion(self, key, prompt, system_prompt, feature, domain_id):
+        """
+        Yields content deltas as they arrive. Closing the generator (e.g. Streamlit stopping the
+        script when the user navigates away) closes the HTTP stream, so no tokens are paid for in vain.
+        Only fully received answers are cached.
+        """
+        start = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
+            response = self.transport.create(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.3
+                temperature=DEFAULT_TEMPERATURE,
+                stream=True,
+                # The final chunk then carries the token usage
+                stream_options={"include_usage": True}
             )
-            return response.choices[0].message.content.strip()
+        except Exception as e:
+            print(f"LLM Stream Error: {e}")
+            self._record_call(feature, domain_id, start, ok=False)
+            yield f"Error: {e}"
+            return
+
+        parts = []
+        ttft = None
+        usage_chunk = None
+        ok = False
+        try:
+            for chunk in response:
+                if getattr(chunk, "usage", None):
+                    usage_chunk = chunk
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    parts.append(delta)
+                    yield delta
+            ok = True
+        except Exception as e:
+            print(f"LLM Stream Error: {e}")
+            yield f"\n\nError: {e}"
+            return
+        finally:
+            response.close()
+            self._record_call(feature, domain_id, start, response=usage_chunk, ttft=ttft, ok=ok)
+
+        content = "".join(parts).strip()
+        if self.cache is not None and content:
+            self.cache.put(key, self.model, content)
+
+    def _fetch_completion(self, key, prompt, system_prompt, feature, domain_id):
+        start = time.perf_counter()
+        try:
+            response = self.transport.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=DEFAULT_TEMPERATURE
+            )
+            content = response.choices[0].message.content.strip()
+            self._record_call(feature, domain_id, start, response=response)
+            if self.cache is not None:
+                self.cache.put(key, self.model, content)
+            return content
         except Exception as e:
             print(f"LLM Error: {e}")
+            self._record_call(feature, domain_id, start, ok=False)
             return f"Error: {e}"
 
-    def explain_term_in_context(self, term, context_sentence):
+    def get_definition(self, term, bypass_cache=False, domain_id=None):
+        return self.get_completion(self.definition_prompt(term), system_prompt=self.DEFINITION_SYSTEM_PROMPT,
+                                   bypass_cache=bypass_cache, feature="definition", domain_id=domain_id)
+
+    # ✅ 修正 Prompt：明确要求翻译 "Entire Sentence" 而不是 "Target Term"
+    EXPLAIN_SYSTEM_PROMPT = (
+        "You are a linguistic expert helper. "
+        "Please perform two tasks:\n"
+        "1. **Translate the entire context sentence** into natural, fluent Chinese.\n"
+        "2. Provide a concise explanation of the **target term's** specific meaning/usage within this context (in English).\n\n"
+        "Output strictly in JSON format with keys:\n"
+        "- 'translation': The full Chinese translation of the sentence.\n"
+        "- 'explanation': The explanation of the term."
+    )
+
+    PACKED_SYSTEM_PROMPT = (
+        "You are a linguistic expert helper. "
+        "You receive a JSON array of items, each with an 'id', a target 'term' and a context 'sentence'. "
+        "For every item:\n"
+        "1. **Translate the entire context sentence** into natural, fluent Chinese.\n"
+        "2. Provide a concise explanation of the **target term's** specific meaning/usage within this context (in English).\n\n"
+        "Output strictly in JSON format: {\"items\": [{\"id\": <id>, \"translation\": \"...\", \"explanation\": \"...\"}, ...]} "
+        "with exactly one entry per input id."
+    )
+
+    @staticmethod
+    def bilingual_context(sentence):
+        """Context sentence as sent by "AI Explain" (asks for the explanation in English and Chinese)."""
+        return f"{sentence}\n\n(Instruction: You MUST provide the explanation of the term in BOTH English and Chinese.)"
+
+    def _explain_key(self, term, context_sentence):
+        user_prompt = f"Target Term: {term}\nContext Sentence: {context_sentence}"
+        key = _request_key(self.model, self.EXPLAIN_SYSTEM_PROMPT, user_prompt, DEFAULT_TEMPERATURE, json_mode=True)
+        return key, user_prompt
+
+    def explain_term_in_context(self, term, context_sentence, bypass_cache=False, domain_id=None):
         """
         Returns JSON: {'translation': '...', 'explanation': '...'}
         """
-        # ✅ 修正 Prompt：明确要求翻译 "Entire Sentence" 而不是 "Target Term"
-        system_prompt = (
-            "You are a linguistic expert helper. "
-            "Please perform two tasks:\n"
-            "1. **Translate the entire context sentence** into natural, fluent Chinese.\n"
-            "2. Provide a concise explanation of the **target term's** specific meaning/usage within this context (in English).\n\n"
-            "Output strictly in JSON format with keys:\n"
-            "- 'translation': The full Chinese translation of the sentence.\n"
-            "- 'explanation': The explanation of the term."
-        )
-        user_prompt = f"Target Term: {term}\nContext Sentence: {context_sentence}"
+        key, user_prompt = self._explain_key(term, context_sentence)
+        result = _validate_explanation(self._cached(key, bypass_cache, "explain", domain_id))
+        if result is None:
+            result = _request_flight.do(key, self._fetch_json, key, self.EXPLAIN_SYSTEM_PROMPT, user_prompt,
+                                        "explain", domain_id)
+        # Every waiter gets its own copy, so callers may mutate the dict safely
+        return dict(result) if isinstance(result, dict) else result
 
+    def _fetch_json(self, key, system_prompt, user_prompt, feature, domain_id):
+        start = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
+            response = self.transport.create(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
                 response_format={"type": "json_object"},
-                temperature=0.3
+                temperature=DEFAULT_TEMPERATURE
             )
-            return json.loads(response.choices[0].message.content)
+            # A malformed answer is reported, not cached (it would be served for the whole TTL)
+            result = _validate_explanation(json.loads(response.choices[0].message.content))
+            if result is None:
+                raise ValueError("response has no 'translation' and 'explanation' text")
+            self._record_call(feature, domain_id, start, response=response)
+            if self.cache is not None:
+                self.cache.put(key, self.model, result)
+            return result
         except Exception as e:
             print(f"LLM JSON Error: {e}")
+            self._record_call(feature, domain_id, start, ok=False)
             # Fallback for error visibility
-            return {"translation": "Error parsing AI response.", "explanation": str(e)}
\ No newline at end of file
+            return {"translation": "Error parsing AI response.", "explanation": str(e)}
+
+    def explain_terms_packed(self, pairs, pack_size=None, max_rounds=3, feature="explain_batch", domain_id=None,
+                             limiter=None):
+        """
+        Packed variant of explain_term_in_context: sends up to pack_size (term, context_sentence)
+        pairs per JSON-mode request and splits the validated answer back per item.
+        Items missing or malformed in a response are re-requested (up to max_rounds in total).
+        limiter: optional TokenBucket acquired before every request.
+        Returns a list aligned with pairs: {'translation', 'explanation'} dicts, or None for failed items.
+        """
+        pack_size = max(1, int(pack_size or config.LLM_PACK_SIZE))
+        results = [None] * len(pairs)
+
+        # Items are cached under the same key as single requests, so both paths share answers
+        keys = [self._explain_key(term, sentence)[0] for term, sentence in pairs]
+        todo = []
+        for i, key in enumerate(keys):
+            cached = _validate_explanation(self._cached(key, False, feature, domain_id))
+            if cached is not None:
+                results[i] = cached
+            else:
+                todo.append(i)
+
+        for _ in range(max_rounds):
+            if not todo:
+                break
+            failed = []
+            for start in range(0, len(todo), pack_size):
+                pack = todo[start:start + pack_size]
+                if limiter is not None:
+                    limiter.acquire()
+                answers = self._fetch_packed([pairs[i] for i in pack], feature, domain_id)
+                for local_id, i in enumerate(pack):
+                    item = answers.get(local_id)
+                    if item is None:
+                        failed.append(i)
+                        continue
+                    results[i] = item
+                    if self.cache is not None:
+                        self.cache.put(keys[i], self.model, item)
+            todo = failed
+        return results
+
+    def _fetch_packed(self, pairs, feature, domain_id):
+        """One packed request. Returns {local_id: {'translation', 'explanation'}} for the valid items."""
+        items = [{"id": i, "term": term, "sentence": sentence} for i, (term, sentence) in enumerate(pairs)]
+        user_prompt = "Items:\n" + json.dumps(items, ensure_ascii=False)
+        start = time.perf_counter()
+        try:
+            response = self.transport.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": self.PACKED_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                response_format={"type": "json_object"},
+                temperature=DEFAULT_TEMPERATURE
+            )
+            self._record_call(feature, domain_id, start, response=response)
+            return _validate_packed(json.loads(response.choices[0].message.content), len(pairs))
+        except Exception as e:
+            print(f"LLM Packed Error: {e}")
+            self._record_call(feature, domain_id, start, ok=False)
+            return {}
+
+
+def _validate_explanation(data):
+    """{'translation', 'explanation'} with both texts non-empty (stripped), else None."""
+    if not isinstance(data, dict):
+        return None
+    translation, explanation = data.get("translation"), data.get("explanation")
+    if not isinstance(translation, str) or not isinstance(explanation, str):
+        return None
+    if not translation.strip() or not explanation.strip():
+        return None
+    return {"translation": translation.strip(), "explanation": explanation.strip()}
+
+
+def _validate_packed(data, count):
+    """
+    Checks a packed response against {"items": [{"id": int, "translation": str, "explanation": str}]}.
+    Returns the valid items by id; invalid, duplicate or out-of-range entries are dropped.
+    """
+    entries = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        return {}
+
+    valid = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        item_id = entry.get("id")
+        if isinstance(item_id, str) and item_id.isdigit():
+            item_id = int(item_id)
+        if not isinstance(item_id, int) or not 0 <= item_id < count or item_id in valid:
+            continue
+        item = _validate_explanation(entry)
+        if item is not None:
+            valid[item_id] = item
+    return valid
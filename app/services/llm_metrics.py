@@ -0,0 +1,93 @@
+"""
+Per-call instrumentation of LLM requests (data/llm_metrics.db).
+
+Every completion made through LLMClient (and the batch jobs) records one row: feature tag
+(definition, explain, syntax, ...), model, domain, latency, time to first token for streams,
+prompt/completion tokens and whether it was answered from the response cache.
+The "LLM Metrics" page aggregates these rows into latency percentiles and token spend.
+"""
+import sqlite3
+import threading
+import time
+
+import config
+
+
+class LLMMetrics:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or (config.DATA_DIR / "llm_metrics.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30.0)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS llm_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                feature TEXT NOT NULL,
+                model TEXT,
+                domain_id INTEGER,
+                latency_ms REAL,
+                ttft_ms REAL,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0,
+                cache_hit INTEGER DEFAULT 0,
+                ok INTEGER DEFAULT 1
+            );
+            CREATE INDEX IF NOT EXISTS idx_llm_metrics_ts ON llm_metrics(ts);
+        """)
+        self._conn.commit()
+
+    def record(self, feature, model, domain_id=None, latency=0.0, ttft=None,
+               prompt_tokens=0, completion_tokens=0, cache_hit=False, ok=True):
+        """latency / ttft in seconds."""
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO llm_metrics (ts, feature, model, domain_id, latency_ms, ttft_ms, "
+                    "prompt_tokens, completion_tokens, cache_hit, ok) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (time.time(), feature, model, domain_id, latency * 1000,
+                     ttft * 1000 if ttft is not None else None,
+                     prompt_tokens or 0, completion_tokens or 0, int(cache_hit), int(ok))
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            # Instrumentation must never break the feature it measures
+            print(f"LLM metrics error: {e}")
+
+    def rows(self, since=None):
+        """Recorded calls (newest last), optionally only those after the `since` timestamp."""
+        with self._lock:
+            if since is None:
+                return self._conn.execute("SELECT * FROM llm_metrics ORDER BY ts").fetchall()
+            return self._conn.execute("SELECT * FROM llm_metrics WHERE ts >= ? ORDER BY ts", (since,)).fetchall()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_metrics")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_llm_metrics():
+    """Returns the LLM metrics store of this process (created on first use)."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = LLMMetrics()
+    return _metrics
+
+
+def usage_of(response):
+    """(prompt_tokens, completion_tokens) of a completion or final stream chunk, (0, 0) if unknown."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return 0, 0
+    return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
@@ -0,0 +1,238 @@
+"""
+Process-wide transport for the LLM API.
+
+A single OpenAI client, and with it a single keep-alive connection pool, is shared by
+every session and script run of the server process. Each call gets a deadline. Rate
+limiting (429), server errors (5xx) and connection failures are retried with exponential
+backoff and full jitter as long as the deadline allows. After llm.breaker_failures
+consecutive failed calls the circuit breaker opens and calls fail fast for
+llm.breaker_cooldown_seconds; then a single probe request decides whether it closes again.
+Latencies of recent calls are kept so tail latency can be shown (p50/p95/p99).
+"""
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+import openai
+
+import config
+
+# Number of recent calls used for latency percentiles
+_LATENCY_WINDOW = 500
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, cooldown=30.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or time.monotonic() - self._opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def retry_in(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def allow(self):
+        """True if a call may go out. After the cooldown exactly one probe call is let through."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self):
+        """A call ended without an outcome (interrupted): let the next call probe instead."""
+        with self._lock:
+            self._probing = False
+
+
+def _status_of(error):
+    return getattr(error, "status_code", None)
+
+
+def _is_retryable(error):
+    if isinstance(error, openai.APIConnectionError):  # includes timeouts
+        return True
+    status = _status_of(error)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def _is_outage(error):
+    """Failures that say the provider is unreachable or broken (rate limiting is not one)."""
+    if isinstance(error, (openai.APIConnectionError, TimeoutError)):
+        return True
+    status = _status_of(error)
+    return status is not None and status >= 500
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class LLMTransport:
+    def __init__(self, base_url, api_key, timeout=None, deadline=None, max_retries=None,
+                 breaker_failures=None, breaker_cooldown=None, keepalive_seconds=None):
+        self.timeout = timeout or config.LLM_REQUEST_TIMEOUT
+        self.deadline = deadline or config.LLM_REQUEST_DEADLINE
+        self.max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.base_backoff = 0.5
+        self.max_backoff = 8.0
+
+        limits = httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=20,
+            keepalive_expiry=keepalive_seconds or config.LLM_KEEPALIVE_SECONDS,
+        )
+        # Retries are handled here (with the deadline and breaker), not by the SDK
+        self.client = openai.OpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            max_retries=0,
+            timeout=openai.Timeout(self.timeout, connect=min(10.0, self.timeout)),
+            http_client=openai.DefaultHttpxClient(limits=limits),
+        )
+        self.breaker = CircuitBreaker(
+            breaker_failures or config.LLM_BREAKER_FAILURES,
+            breaker_cooldown or config.LLM_BREAKER_COOLDOWN_SECONDS,
+        )
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=_LATENCY_WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def _record(self, seconds, ok):
+        with self._lock:
+            self.calls += 1
+            self._latencies.append(seconds)
+            if not ok:
+                self.errors += 1
+
+    def create(self, deadline=None, **kwargs):
+        """
+        chat.completions.create with deadline, retries and circuit breaker.
+        With stream=True the deadline covers opening the stream, not reading it.
+        """
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError(
+                f"LLM provider unavailable, not retrying for {self.breaker.retry_in():.0f}s"
+            )
+
+        start = time.monotonic()
+        end = start + (deadline or self.deadline)
+        attempt = 0
+        settled = False
+        try:
+            while True:
+                remaining = end - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise TimeoutError("LLM request deadline exceeded")
+                    response = self.client.chat.completions.create(timeout=min(self.timeout, remaining), **kwargs)
+                except Exception as e:
+                    if _is_retryable(e) and attempt < self.max_retries:
+                        # Full jitter spreads retries of concurrent callers; honor Retry-After on 429
+                        delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+                        delay = max(delay, _retry_after(e) or 0.0)
+                        if time.monotonic() + delay < end:
+                            attempt += 1
+                            with self._lock:
+                                self.retries += 1
+                            time.sleep(delay)
+                            continue
+
+                    self._record(time.monotonic() - start, ok=False)
+                    settled = True
+                    if _is_outage(e):
+                        self.breaker.record_failure()
+                    else:
+                        # The provider answered (e.g. 400 / 429): it is up
+                        self.breaker.record_success()
+                    raise
+
+                self._record(time.monotonic() - start, ok=True)
+                settled = True
+                self.breaker.record_success()
+                return response
+        finally:
+            if not settled:
+                # Interrupted (KeyboardInterrupt, Streamlit stopping the script run...): without this
+                # an interrupted probe would leave the breaker half-open and rejecting every call
+                self.breaker.release_probe()
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            calls, errors, retries, rejected = self.calls, self.errors, self.retries, self.rejected
+
+        def pct(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+        return {
+            "calls": calls,
+            "errors": errors,
+            "retries": retries,
+            "rejected": rejected,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+            "breaker": self.breaker.state,
+        }
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_llm_transport():
+    """Returns the LLM transport of this process (created on first use)."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = LLMTransport(config.LLM_BASE_URL, config.LLM_API_KEY)
+    return _transport
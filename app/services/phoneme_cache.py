@@ -0,0 +1,222 @@
+"""
+Persistent word -> phoneme cache for Kokoro's English G2P (misaki).
+
+Domain vocabularies repeat the same technical words across thousands of sentences,
+yet every synthesis re-runs spaCy tagging and the misaki lexicon over the full text.
+This cache remembers the phonemes misaki produced for each whitespace-delimited word
+(keyed by language and voice) in memory, backed by SQLite. When every word of a
+text segment is known, the tokens are rebuilt from the cache and handed straight to
+`KPipeline.generate_from_tokens`, skipping G2P entirely; otherwise G2P runs once and
+its output is learned.
+
+Words whose pronunciation depends on the part-of-speech tag are never cached, since the
+tag is only known after G2P: heteronyms (lexicon entries keyed by tag, e.g. "read",
+"live", "record") and the tag-dependent special cases of misaki ("a", "in", "by", ...).
+A segment containing one always goes through G2P.
+"""
+import json
+import re
+import sqlite3
+import threading
+
+import config
+
+# Words misaki pronounces by the sound that follows them ("the" -> ðə / ði, "to" -> tə / tʊ);
+# they are cached per onset of the next word's phonemes (so "the hour" and "the user" are right)
+_ONSET_WORDS = {"the", "The", "to", "To"}
+# misaki special cases that depend on the POS tag (Lexicon.get_special_case)
+_TAGGED_WORDS = {"a", "am", "by", "i", "in", "used"}
+_TAGGED_EXACT = {"AN", "TO", "THE"}
+
+_WORD_RE = re.compile(r"\S+\s*")
+_DIGIT_RE = re.compile(r"\d")
+
+
+def _onset(entry):
+    """
+    What misaki sees as the start of a word: 'v'owel, 'c'onsonant or 'x' (punctuation / end
+    of segment), from its cached [[text, phonemes], ...]. None if it has no such phoneme.
+    """
+    if entry is None:
+        return "x"
+    from misaki.en import CONSONANTS, NON_QUOTE_PUNCTS, VOWELS
+    for _text, phonemes in entry:
+        for c in phonemes or "":
+            if c in NON_QUOTE_PUNCTS:
+                return "x"
+            if c in VOWELS:
+                return "v"
+            if c in CONSONANTS:
+                return "c"
+    return None
+
+
+def _word_key(word, next_entry):
+    """Cache key of a word; None if it cannot be keyed (the next word has no usable onset)."""
+    bare = word.strip()
+    if bare in _ONSET_WORDS:
+        onset = _onset(next_entry)
+        return f"{bare}|{onset}" if onset else None
+    return bare
+
+
+def _is_tag_dependent(text, lexicon):
+    if text.lower() in _TAGGED_WORDS or text in _TAGGED_EXACT:
+        return True
+    if lexicon is None:
+        return False
+    # Heteronyms: lexicon entries like {"DEFAULT": ..., "VERB": ..., "NOUN": ...}
+    return any(isinstance(d.get(w), dict) for d in (lexicon.golds, lexicon.silvers) for w in (text, text.lower()))
+
+
+class PhonemeCache:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or (config.DATA_DIR / "phoneme_cache.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS word_phonemes (
+                lang TEXT NOT NULL,
+                voice TEXT NOT NULL,
+                word TEXT NOT NULL,
+                tokens TEXT NOT NULL,
+                PRIMARY KEY (lang, voice, word)
+            )
+        """)
+        self._conn.commit()
+
+        # (lang, voice) -> {word_key: [[text, phonemes], ...]}, loaded lazily per namespace
+        self._memory = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _namespace(self, lang, voice):
+        ns = self._memory.get((lang, voice))
+        if ns is None:
+            rows = self._conn.execute(
+                "SELECT word, tokens FROM word_phonemes WHERE lang = ? AND voice = ?", (lang, voice)
+            ).fetchall()
+            ns = {word: json.loads(tokens) for word, tokens in rows}
+            self._memory[(lang, voice)] = ns
+        return ns
+
+    def lookup(self, lang, voice, segment):
+        """
+        Returns MTokens for a text segment if every word is cached, else None.
+        """
+        words = _WORD_RE.findall(segment.strip())
+        if not words:
+            return None
+
+        with self._lock:
+            ns = self._namespace(lang, voice)
+            cached = []
+            next_entry = None
+            # Right to left, like misaki: a word's key may depend on the word after it
+            for word in reversed(words):
+                key = _word_key(word, next_entry)
+                entry = ns.get(key) if key else None
+                if entry is None:
+                    self.misses += 1
+                    return None
+                cached.append((entry, word[len(word.rstrip()):]))
+                next_entry = entry
+            cached.reverse()
+            self.hits += 1
+
+        from misaki import en
+        tokens = []
+        for entry, trailing_ws in cached:
+            for j, (text, phonemes) in enumerate(entry):
+                # Sub-tokens of one word are glued together; only the last keeps the word's whitespace
+                ws = trailing_ws if j == len(entry) - 1 else ""
+                tokens.append(en.MToken(text=text, tag="", whitespace=ws, phonemes=phonemes))
+        return tokens
+
+    def learn(self, lang, voice, tokens, lexicon=None):
+        """
+        Stores the phonemes of misaki tokens, grouped into whitespace-delimited words.
+        lexicon: the G2P's misaki Lexicon, used to leave out heteronyms.
+        """
+        groups, current = [], []
+        for tk in tokens:
+            current.append(tk)
+            if tk.whitespace:
+                groups.append(current)
+                current = []
+        if current:
+            groups.append(current)
+
+        texts = ["".join(t.text for t in g) for g in groups]
+        entries = [[[t.text, t.phonemes] for t in g] for g in groups]
+        new_rows = []
+        for i, group in enumerate(groups):
+            word = texts[i]
+            # Numbers are context dependent (currency, ordinals...), multi-word merges can't be replayed
+            if not word or _DIGIT_RE.search(word) or any(c.isspace() for c in word):
+                continue
+            if any(t.phonemes is None for t in group):
+                continue
+            if any(_is_tag_dependent(t.text, lexicon) for t in group):
+                continue
+            key = _word_key(word, entries[i + 1] if i + 1 < len(groups) else None)
+            if key:
+                new_rows.append((key, entries[i]))
+
+        if not new_rows:
+            return
+        with self._lock:
+            ns = self._namespace(lang, voice)
+            fresh = [(k, v) for k, v in new_rows if k not in ns]
+            for key, value in fresh:
+                ns[key] = value
+            if fresh:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO word_phonemes (lang, voice, word, tokens) VALUES (?, ?, ?, ?)",
+                    [(lang, voice, k, json.dumps(v, ensure_ascii=False)) for k, v in fresh]
+                )
+                self._conn.commit()
+
+    def tokens_for(self, pipeline, segment, voice):
+        """Cached tokens when possible, otherwise runs misaki G2P once and learns the result."""
+        tokens = self.lookup(pipeline.lang_code, voice, segment)
+        if tokens is not None:
+            return tokens
+        _, tokens = pipeline.g2p(segment)
+        self.learn(pipeline.lang_code, voice, tokens, getattr(pipeline.g2p, "lexicon", None))
+        return tokens
+
+    def generate(self, pipeline, text, voice):
+        """
+        Drop-in replacement for `pipeline(text, voice=voice)` on English pipelines.
+        Splits on newlines like KPipeline does and yields KPipeline.Result objects.
+        """
+        for segment in re.split(r"\n+", text.strip()):
+            if not segment.strip():
+                continue
+            tokens = self.tokens_for(pipeline, segment, voice)
+            yield from pipeline.generate_from_tokens(tokens, voice=voice)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "words": sum(len(ns) for ns in self._memory.values()),
+                "segment_hits": self.hits,
+                "segment_misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_phoneme_cache():
+    """Returns the phoneme cache of this process (created on first use)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PhonemeCache()
+    return _cache
@@ -0,0 +1,149 @@
+"""
+Background warm-up of the neighbouring cards of the study dialog.
+
+While term i is shown, terms i+1..i+k (study.prefetch_ahead) and i-1 are prepared in a
+small thread pool (study.prefetch_workers), nearest first:
+  1. the term's view model (term_view: row, linked sentences or the hybrid search result)
+  2. a definition (LLM) if the term has none
+  3. context images if the term has none saved (marked as shown only once the card displays them)
+  4. the term pronunciation (TTS cache), so "Gen Pronunciation" plays instantly
+Prev/Next then only render what is already there. Jumping elsewhere cancels the terms that
+left the window: queued ones never start, running ones skip their remaining steps.
+"""
+import concurrent.futures
+import os
+import threading
+import weakref
+
+import config
+from app.database.db_manager import DBManager
+from app.services.term_view import get_term_view_cache
+from app.utils.file_helper import to_abs_path
+from app.utils.image_scraper import fetch_term_images
+
+_local = threading.local()
+
+
+def _thread_db():
+    # Each prefetch thread uses its own SQLite connection
+    if getattr(_local, "db", None) is None:
+        _local.db = DBManager()
+    return _local.db
+
+
+def _has_images(image_paths):
+    paths = [p.strip() for p in (image_paths or "").split(",") if p.strip()]
+    return any(os.path.exists(to_abs_path(p)) for p in paths)
+
+
+class _Job:
+    def __init__(self):
+        self.future = None
+        self.data = {}
+        self.cancelled = threading.Event()
+        # Set once everything the card shows is prepared (the audio step may still run)
+        self.ready = threading.Event()
+
+
+class StudyPrefetcher:
+    def __init__(self, tts, llm, workers=None, ahead=None):
+        self.tts = tts
+        self.llm = llm
+        self.ahead = max(0, int(config.STUDY_PREFETCH_AHEAD if ahead is None else ahead))
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, int(workers or config.STUDY_PREFETCH_WORKERS)),
+            thread_name_prefix="study-prefetch",
+        )
+        # Sessions that end without closing the dialog drop the prefetcher with their session_state
+        weakref.finalize(self, self._executor.shutdown, wait=False, cancel_futures=True)
+        self._lock = threading.Lock()
+        self._jobs = {}     # term_id -> _Job (queued, running or finished)
+
+    # ------------------------------------------
+    # Scheduling
+    # ------------------------------------------
+    def window(self, term_ids, index):
+        """Neighbours of the card at index, nearest first (the next one, the previous one, then further ahead)."""
+        ahead = term_ids[index + 1:index + 1 + self.ahead]
+        behind = term_ids[index - 1:index] if index > 0 else []
+        return ahead[:1] + behind + ahead[1:]
+
+    def warm(self, term_ids, keep=()):
+        """
+        Schedules term_ids (in order) and cancels every other job except those of `keep`
+        (the card on screen), so the pool only ever works on the current window.
+        """
+        wanted = list(dict.fromkeys(term_ids)) if self.ahead else []
+        with self._lock:
+            for term_id in list(self._jobs):
+                if term_id not in wanted and term_id not in keep:
+                    self._cancel_locked(term_id)
+            for term_id in wanted:
+                if term_id not in self._jobs:
+                    job = _Job()
+                    self._jobs[term_id] = job
+                    job.future = self._executor.submit(self._warm, term_id, job)
+
+    def take(self, term_id, timeout=None):
+        """
+        Prepared data of a term ({} if it was not prefetched). If its job is still running,
+        waits up to timeout for the visible parts.
+        """
+        with self._lock:
+            job = self._jobs.get(term_id)
+        if job is None:
+            return {}
+        if timeout and not job.future.cancelled():
+            job.ready.wait(timeout)
+        with self._lock:
+            return dict(job.data)
+
+    def _cancel_locked(self, term_id):
+        job = self._jobs.pop(term_id, None)
+        if job is not None:
+            job.cancelled.set()
+            job.future.cancel()
+
+    def invalidate(self, term_id):
+        """Drops prepared data of a term, e.g. after it was saved."""
+        with self._lock:
+            self._cancel_locked(term_id)
+
+    def shutdown(self):
+        with self._lock:
+            for term_id in list(self._jobs):
+                self._cancel_locked(term_id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ------------------------------------------
+    # Work (prefetch threads)
+    # ------------------------------------------
+    def _store(self, job, **values):
+        with self._lock:
+            job.data.update(values)
+
+    def _warm(self, term_id, job):
+        try:
+            view = get_term_view_cache().get(_thread_db(), term_id)
+            if view is None:
+                return
+            term = view['term']
+            word = term['word']
+
+            definition = term['definition']
+            if not definition and not job.cancelled.is_set():
+                definition = self.llm.get_definition(word, domain_id=term['domain_id'])
+                self._store(job, definition=definition or "")
+
+            if not _has_images(term.get('image_paths')) and not job.cancelled.is_set():
+                shown = {}
+                images = fetch_term_images(word, definition or "", view['context'], shown=shown)
+                self._store(job, images=images, image_urls=shown)
+            job.ready.set()
+
+            if not term.get('audio_hash') and not job.cancelled.is_set():
+                self.tts.get_audio_path(word)
+        except Exception as e:
+            print(f"Study prefetch error (term {term_id}): {e}")
+        finally:
+            job.ready.set()
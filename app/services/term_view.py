@@ -0,0 +1,106 @@
+"""
+Cached view model of a study dialog card.
+
+Every widget interaction reruns the dialog, which used to query the term, its linked
+sentences, the hybrid (SQLite / vector) search and one `content_en` lookup per vector hit
+again. build_term_view assembles all of that once, with batched queries:
+  term       -- the term row (dict)
+  linked     -- linked sentences, de-duplicated, with the match's cn_explanation
+  sentences  -- what the card shows: the linked sentences, else the longest search hit;
+                vector hits that already exist in SQLite carry that row's data and id
+  context    -- the first shown sentence (used as image search context)
+
+TermViewCache keeps the views keyed by term id together with the DBManager write counter
+they were built at. A view goes stale when its term or one of its sentences is written
+afterwards (e.g. Save, or a batch job filling that term), not on writes to other terms, so
+typing in a text area neither touches SQLite nor the embedding model. A commit by another
+process (the batch CLIs) makes every view stale. Views are shared
+between sessions and must be treated as read-only.
+"""
+import collections
+import threading
+
+from app.database.db_manager import last_write, write_counter
+
+MAX_ENTRIES = 256
+
+
+def build_term_view(db, term_id):
+    """Returns the view dict of a term, or None if it does not exist."""
+    term, linked_rows = db.get_term_with_matches(term_id)
+    if term is None:
+        return None
+
+    unique = {}
+    for s in linked_rows:
+        unique.setdefault(s['id'], s)
+    linked = list(unique.values())
+    if linked:
+        sentences = linked
+    else:
+        searched = db.search_sentences_hybrid(term['domain_id'], term['word'])
+        sentences = [max(searched, key=lambda s: len(str(s.get("content_en", "")).strip()))] if searched else []
+
+    # Bridge vector-only hits to the SQLite rows with the same text (one query for all)
+    vdb_texts = [s['content_en'] for s in sentences if str(s['id']).startswith("vdb_")]
+    if vdb_texts:
+        existing = db.get_sentences_by_content(vdb_texts)
+        bridged = []
+        for s in sentences:
+            row = existing.get(s['content_en']) if str(s['id']).startswith("vdb_") else None
+            bridged.append({**s, **dict(row)} if row is not None else s)
+        sentences = bridged
+
+    return {
+        "term": term,
+        "linked": linked,
+        "sentences": sentences,
+        "context": sentences[0].get('content_en', '') if sentences else "",
+    }
+
+
+class TermViewCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._views = collections.OrderedDict()   # term_id -> (write counter when built, sentence ids, view)
+
+    def get(self, db, term_id):
+        """The view of a term, rebuilt only if its term or sentences were written since it was built."""
+        with self._lock:
+            entry = self._views.get(term_id)
+            if entry is not None and last_write(term_id, entry[1]) <= entry[0]:
+                self._views.move_to_end(term_id)
+                return entry[2]
+
+        # Built outside the lock (the vector search can be slow); a write that happens
+        # meanwhile leaves the entry stale because the counter was read before
+        built_at = write_counter()
+        view = build_term_view(db, term_id)
+        sentence_ids = [s['id'] for s in view['sentences']] if view else []
+        with self._lock:
+            self._views[term_id] = (built_at, sentence_ids, view)
+            self._views.move_to_end(term_id)
+            while len(self._views) > self.max_entries:
+                self._views.popitem(last=False)
+        return view
+
+    def invalidate(self, term_id=None):
+        with self._lock:
+            if term_id is None:
+                self._views.clear()
+            else:
+                self._views.pop(term_id, None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_term_view_cache():
+    """Returns the term view cache of this process (created on first use)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TermViewCache()
+    return _cache
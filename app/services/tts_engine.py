@@ -0,0 +1,108 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+import config
+
+
+class KokoroEnginePool:
+    """
+    Process-wide pool of Kokoro pipelines shared by every Streamlit session.
+    Each KPipeline (~320MB) is loaded once and lent to one caller at a time,
+    so concurrent syntheses never run on the same (non thread-safe) pipeline.
+    """
+
+    def __init__(self, size=1, lang_code="a"):
+        # 'a' = American English (uses misaki[en] for phonemization)
+        self.size = max(1, int(size))
+        self.lang_code = lang_code
+
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+
+    def _create_pipeline(self):
+        from kokoro import KPipeline
+        return KPipeline(lang_code=self.lang_code)
+
+    def _grow(self):
+        """Loads one more pipeline if the pool is not full yet. Returns None when full."""
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+
+        try:
+            return self._create_pipeline()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """
+        Borrows a pipeline; waits up to timeout seconds (tts.acquire_timeout_seconds) while all
+        pipelines are busy. Yields None if none became free in time.
+        """
+        timeout = config.TTS_ACQUIRE_TIMEOUT if timeout is None else timeout
+        try:
+            pipeline = self._idle.get_nowait()
+        except queue.Empty:
+            pipeline = self._grow()
+            if pipeline is None:
+                # Pool is full (or still warming up): wait for a pipeline to be returned
+                try:
+                    pipeline = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    print(f"TTS Error: no Kokoro pipeline became available within {timeout:g}s")
+                    pipeline = None
+
+        try:
+            yield pipeline
+        finally:
+            if pipeline is not None:
+                self._idle.put(pipeline)
+
+    def warm_up(self):
+        """Loads all pipelines in a background thread. Safe to call on every rerun."""
+        with self._lock:
+            if self._warmup_thread is not None:
+                return
+            self._warmup_thread = threading.Thread(target=self._warm, name="kokoro-warmup", daemon=True)
+        self._warmup_thread.start()
+
+    def _warm(self):
+        try:
+            while True:
+                pipeline = self._grow()
+                if pipeline is None:
+                    break
+                try:
+                    # A tiny synthesis also triggers the lazy spaCy / voice downloads
+                    for _ in pipeline("Ready.", voice=config.TTS_VOICE):
+                        pass
+                finally:
+                    # Counted in _created already: it must reach the pool even if the warm-up failed
+                    self._idle.put(pipeline)
+        except Exception as e:
+            print(f"TTS warm-up failed: {e}")
+
+    def stats(self):
+        return {"size": self.size, "loaded": self._created, "idle": self._idle.qsize()}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_engine_pool():
+    """Returns the Kokoro pool of this process (created on first use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = KokoroEnginePool(size=config.TTS_POOL_SIZE)
+            if config.TTS_WARMUP:
+                _pool.warm_up()
+    return _pool
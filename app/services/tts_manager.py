@@ -1,13 +1,82 @@
 from pathlib import Path
+import concurrent.futures
 import hashlib
+import os
+import re
+import uuid
 
 import numpy as np
 import soundfile as sf
 
 import config  # Import the configuration module
+from app.services.tts_engine import get_engine_pool
+from app.services.audio_cache import get_audio_cache
+from app.services.phoneme_cache import get_phoneme_cache
+from app.utils.single_flight import SingleFlight
+
+
+# Output codecs supported by soundfile/libsndfile, selected via storage.audio_format
+AUDIO_CODECS = {
+    "wav": {"ext": ".wav", "format": "WAV", "subtype": "FLOAT", "mime": "audio/wav"},
+    "flac": {"ext": ".flac", "format": "FLAC", "subtype": "PCM_16", "mime": "audio/flac"},
+    "ogg": {"ext": ".ogg", "format": "OGG", "subtype": "VORBIS", "mime": "audio/ogg"},
+    "opus": {"ext": ".opus", "format": "OGG", "subtype": "OPUS", "mime": "audio/ogg"},
+}
+
+
+# Concurrent requests for the same text (other sessions, double clicks) share one synthesis;
+# a waiter gives up on it after tts.acquire_timeout_seconds and synthesizes the text itself
+_synthesis_flight = SingleFlight(wait_timeout=config.TTS_ACQUIRE_TIMEOUT)
+
+
+# Length of the blend between two long-text chunks
+_CROSSFADE_SECONDS = 0.02
+
+# Sentence ends and, for overlong sentences, clause breaks where prosody survives a cut
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+_CLAUSE_SPLIT_RE = re.compile(r"(?<=[;:,])\s+")
+
+
+def split_long_text(text, max_chars):
+    """
+    Splits text into chunks of at most ~max_chars at sentence boundaries (packing short
+    sentences together). Sentences longer than max_chars are split at clause punctuation.
+    """
+    pieces = []
+    for sentence in _SENTENCE_SPLIT_RE.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+        else:
+            pieces.extend(p.strip() for p in _CLAUSE_SPLIT_RE.split(sentence) if p.strip())
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def audio_mimetype(path):
+    """Returns the MIME type to hand to st.audio for a cached audio file."""
+    ext = os.path.splitext(str(path))[1].lower()
+    for codec in AUDIO_CODECS.values():
+        if codec["ext"] == ext:
+            return codec["mime"]
+    return "audio/mpeg" if ext == ".mp3" else "audio/wav"
 
 
 class TTSManager:
+    # Kokoro outputs 24kHz mono float32 audio
+    SAMPLE_RATE = 24000
+
     def __init__(self):
         # Use the path resolved in config.py
         self.output_dir = config.AUDIO_CACHE_DIR
@@ -16,57 +85,198 @@ class TTSManager:
         if not self.output_dir.exists():
             self.output_dir.mkdir(parents=True, exist_ok=True)
 
-        # Kokoro pipeline is loaded lazily on first use (it downloads/loads
-        # the ~320MB model), so constructing TTSManager stays cheap.
-        self._pipeline = None
+        # Kokoro pipelines live in a process-wide pool shared by all sessions,
+        # so constructing TTSManager on every rerun stays cheap and the ~320MB
+        # model is loaded once per server process instead of once per instance.
+        self.engine_pool = get_engine_pool()
+        self.codec = AUDIO_CODECS[config.AUDIO_FORMAT]
+
+        # Sharded, size-bounded cache index (in-memory lookups, LRU eviction)
+        self.cache = get_audio_cache()
+
+    def _text_hash(self, text):
+        # Unique hash from text + voice, prefixed with the provider so the
+        # local Kokoro cache never collides with the old OpenAI MP3 cache.
+        hash_input = f"kokoro_{text}_{config.TTS_VOICE}"
+        return hashlib.md5(hash_input.encode("utf-8")).hexdigest()
 
-    def _get_pipeline(self):
-        if self._pipeline is None:
-            from kokoro import KPipeline
+    def _cache_path(self, text):
+        return self.cache.shard_path(self._text_hash(text), self.codec["ext"])
 
-            # 'a' = American English (uses misaki[en] for phonemization)
-            self._pipeline = KPipeline(lang_code="a")
-        return self._pipeline
+    def _find_cached(self, text):
+        """Answers from the in-memory manifest; falls back to disk for files written by other processes."""
+        text_hash = self._text_hash(text)
+        cached = self.cache.lookup(text_hash)
+        if cached:
+            return cached
 
-    def get_audio_path(self, text):
+        # Sharded files from batch workers, or legacy flat files from before the manifest existed
+        for codec in AUDIO_CODECS.values():
+            for file_path in (self.cache.shard_path(text_hash, codec["ext"], create=False),
+                              self.output_dir / f"{text_hash}{codec['ext']}"):
+                if file_path.exists():
+                    self.cache.register(text_hash, file_path)
+                    return file_path
+        return None
+
+    def get_cached_path(self, text):
+        """Returns the absolute path of the cached audio for text, or None if not generated yet."""
+        if not text or len(text.strip()) == 0:
+            return None
+        file_path = self._find_cached(text)
+        return str(file_path) if file_path else None
+
+    def stream_audio(self, text):
         """
-        Generates TTS audio for the given text via local Kokoro-82M.
-        Returns the absolute file path.
-        Checks cache first to avoid redundant generation.
+        Yields the waveform of each Kokoro segment (float32 numpy array) as soon as it is synthesized.
+        Segments are appended to the cache file while streaming; the file only appears under its
+        final name once the whole text is done, so the cache never holds a truncated file.
+        If the audio is already cached, the cached waveform is yielded as a single segment.
         """
         if not text or len(text.strip()) == 0:
-            return None
+            return
 
-        # Unique hash from text + voice, prefixed with the provider so the
-        # local Kokoro WAV cache never collides with the old OpenAI MP3 cache.
-        hash_input = f"kokoro_{text}_{config.TTS_VOICE}"
-        text_hash = hashlib.md5(hash_input.encode("utf-8")).hexdigest()
+        cached_path = self._find_cached(text)
+        if cached_path:
+            yield sf.read(cached_path, dtype="float32")[0]
+            return
 
-        file_name = f"{text_hash}.wav"
-        file_path = self.output_dir / file_name
-
-        # Return the existing path if already cached
-        if file_path.exists():
-            return str(file_path)
+        text_hash = self._text_hash(text)
+        call, is_leader = _synthesis_flight.claim(text_hash)
+        if not is_leader:
+            # Another session is synthesizing the same text: wait for its file instead of redoing the work.
+            # If it was abandoned (a stopped script run leaves its generator unfinished) or takes too
+            # long, synthesize here; publishing is atomic, so doing the work twice is harmless.
+            if call.wait(_synthesis_flight.wait_timeout):
+                cached_path = self._find_cached(text)
+                if cached_path:
+                    yield sf.read(cached_path, dtype="float32")[0]
+                    return
+            yield from self._synthesize_text(text, text_hash)
+            return
 
+        finished = False
         try:
-            pipeline = self._get_pipeline()
-            generator = pipeline(text, voice=config.TTS_VOICE)
+            yield from self._synthesize_text(text, text_hash)
+            finished = True
+        finally:
+            _synthesis_flight.finish(text_hash, call, abandoned=not finished)
+
+    def _synthesize_text(self, text, text_hash):
+        chunks = split_long_text(text, config.TTS_LONG_TEXT_CHARS) if config.TTS_LONG_TEXT_CHARS else []
+        if len(chunks) > 1:
+            yield from self._publish(text, text_hash, self._synthesize_chunks(chunks))
+        else:
+            yield from self._publish(text, text_hash, self._synthesize_segments(text))
+
+    def _synthesize_segments(self, text):
+        with self.engine_pool.acquire() as pipeline:
+            if pipeline is None:
+                # Pool busy for too long: no audio, like a failed synthesis
+                return
+            for _gs, _ps, segment in self._generate(pipeline, text):
+                if segment is not None:
+                    yield np.asarray(segment, dtype=np.float32)
+
+    def _synthesize_chunk(self, chunk):
+        segments = list(self._synthesize_segments(chunk))
+        return np.concatenate(segments) if segments else None
 
-            # Concatenate all yielded segments into a single waveform
-            audio = None
-            for _gs, _ps, segment in generator:
+    def _synthesize_chunks(self, chunks):
+        """
+        Long-text mode: chunks are synthesized in parallel, one per pooled pipeline, so the
+        speedup needs tts.pool_size > 1. They are yielded in order with a short crossfade at
+        every seam; only the joined file is cached.
+        """
+        fade = int(self.SAMPLE_RATE * _CROSSFADE_SECONDS)
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.engine_pool.size)
+        try:
+            futures = [executor.submit(self._synthesize_chunk, chunk) for chunk in chunks]
+            tail = None
+            for i, future in enumerate(futures):
+                audio = future.result()
                 if audio is None:
-                    audio = segment
+                    raise RuntimeError(f"Synthesis failed for chunk {i + 1}/{len(chunks)}")
+
+                if tail is not None:
+                    n = min(len(tail), len(audio))
+                    if n < len(tail):
+                        yield tail[:len(tail) - n]
+                    if n:
+                        ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)
+                        yield tail[len(tail) - n:] * (1.0 - ramp) + audio[:n] * ramp
+                    audio = audio[n:]
+
+                if i < len(futures) - 1 and len(audio) > fade:
+                    # Hold the tail back to blend it with the next chunk's head
+                    yield audio[:-fade]
+                    tail = audio[-fade:]
                 else:
-                    audio = np.concatenate([audio, segment])
+                    yield audio
+                    tail = None
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-            if audio is None:
-                return None
+    def _publish(self, text, text_hash, segments):
+        """
+        Streams segments to a private temp file while yielding them, then publishes the file
+        with an atomic rename, so concurrent readers never see a partially written file.
+        """
+        file_path = self._cache_path(text)
+        if file_path.exists():
+            # Finished by another process (e.g. a batch worker) while we were waiting
+            self.cache.register(text_hash, file_path)
+            yield sf.read(file_path, dtype="float32")[0]
+            return
+
+        tmp_path = file_path.with_name(f"{file_path.stem}.{uuid.uuid4().hex}.part")
+        completed = False
+        try:
+            with sf.SoundFile(tmp_path, mode="w", samplerate=self.SAMPLE_RATE, channels=1,
+                              format=self.codec["format"], subtype=self.codec["subtype"]) as out_file:
+                for segment in segments:
+                    out_file.write(segment)
+                    yield segment
+                has_audio = out_file.frames > 0
 
-            # Kokoro outputs 24kHz float32 audio
-            sf.write(file_path, audio, 24000)
-            return str(file_path)
+            if has_audio:
+                os.replace(tmp_path, file_path)
+                completed = True
+                self.cache.register(text_hash, file_path)
+        finally:
+            # Interrupted streams (errors, or the consumer stopped early) leave no partial file behind
+            if not completed and tmp_path.exists():
+                try:
+                    tmp_path.unlink()
+                except OSError:
+                    pass
+
+    def _generate(self, pipeline, text):
+        """Runs Kokoro, reusing cached phonemes for English pipelines when enabled."""
+        if config.TTS_PHONEME_CACHE and pipeline.lang_code in "ab":
+            return get_phoneme_cache().generate(pipeline, text, config.TTS_VOICE)
+        return pipeline(text, voice=config.TTS_VOICE)
+
+    def get_audio_path(self, text):
+        """
+        Generates TTS audio for the given text via local Kokoro-82M.
+        Returns the absolute file path.
+        Checks cache first to avoid redundant generation.
+        """
+        if not text or len(text.strip()) == 0:
+            return None
+
+        # Return the existing path if already cached
+        cached = self.get_cached_path(text)
+        if cached:
+            return cached
+
+        try:
+            # Segments are written to disk as they arrive; nothing is concatenated in memory
+            for _segment in self.stream_audio(text):
+                pass
+            return self.get_cached_path(text)
 
         except Exception as e:
             print(f"TTS Error: {e}")
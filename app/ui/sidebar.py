@@ -53,4 +53,5 @@ def render_sidebar():
         st.page_link("main.py", label="Home", icon="🏠")
         st.page_link("pages/import_data.py", label="Import Data", icon="📥")
         st.page_link("pages/study_mode.py", label="Study Mode", icon="📖")
-        st.page_link("pages/edit_vocabulary.py", label="Manage Vocabulary", icon="🛠️")
\ No newline at end of file
+        st.page_link("pages/edit_vocabulary.py", label="Manage Vocabulary", icon="🛠️")
+        st.page_link("pages/llm_metrics.py", label="LLM Metrics", icon="📊")
\ No newline at end of file
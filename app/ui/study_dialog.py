@@ -4,30 +4,35 @@ import os
 import streamlit.components.v1 as components
 import concurrent.futures
 import threading
+import time
 from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from app.ui.mic_widget import render_mic_widget
-from app.utils.image_scraper import fetch_term_images
-from config import PROJECT_ROOT
+from app.utils.image_scraper import fetch_term_images, mark_images_shown
+from app.services.tts_manager import audio_mimetype
+from app.services.audio_cache import get_audio_cache
+from app.utils.file_helper import to_abs_path, to_rel_path
+from app.services.study_prefetch import StudyPrefetcher
+from app.services.term_view import get_term_view_cache
+import config
 
 
-def get_safe_abs_path(path_str):
-    """Converts a relative path to absolute for safe loading. Leaves absolute paths intact."""
-    if not path_str: return None
-    if os.path.isabs(path_str): return path_str
-    return str(PROJECT_ROOT / path_str)
+def _get_prefetcher(tts, llm):
+    """Background prefetcher of this session (see app/services/study_prefetch.py)."""
+    if "study_prefetcher" not in st.session_state:
+        st.session_state["study_prefetcher"] = StudyPrefetcher(tts, llm)
+    return st.session_state["study_prefetcher"]
 
 
-def get_rel_path(path_str):
-    """Converts an absolute path to a relative path for database storage."""
-    if not path_str: return path_str
-    try:
-        return os.path.relpath(path_str, PROJECT_ROOT).replace('\\', '/')
-    except ValueError:
-        return str(path_str).replace('\\', '/')
+def _stop_prefetch():
+    # The dialog is closed: release the prefetch threads, the next dialog starts a new pool
+    prefetcher = st.session_state.pop("study_prefetcher", None)
+    if prefetcher is not None:
+        prefetcher.shutdown()
 
 
 def _on_study_dialog_dismiss():
     """Cleanup states when dialog is closed."""
+    _stop_prefetch()
     if "active_study_index" in st.session_state:
         del st.session_state["active_study_index"]
     if "current_viewed_term_id" in st.session_state:
@@ -42,22 +47,44 @@ def _on_study_dialog_dismiss():
 
         # Only delete the physical file if it is different from the one in the database
         if new_path and new_path != old_path:
-            abs_path = get_safe_abs_path(new_path)
-            if abs_path and os.path.exists(abs_path):
-                try:
-                    os.remove(abs_path)
-                except Exception:
-                    pass
+            # Goes through the cache manager, which keeps files that other saved rows still use
+            get_audio_cache().discard(to_abs_path(new_path))
 
         del st.session_state[k]
         if old_k in st.session_state:
             del st.session_state[old_k]
 
 
+def stream_pronunciation(tts, text, audio_ph):
+    """
+    Plays the first synthesized segment right away while the rest is still being generated,
+    then hands over to the complete cached file at the position the preview had reached.
+    Returns the absolute path of the generated audio (or None).
+    """
+    cached = tts.get_cached_path(text)
+    if cached:
+        audio_ph.audio(cached, format=audio_mimetype(cached))
+        return cached
+
+    preview_started = None
+    preview_seconds = 0.0
+    for segment in tts.stream_audio(text):
+        if preview_started is None:
+            audio_ph.audio(segment, sample_rate=tts.SAMPLE_RATE, autoplay=True)
+            preview_started = time.monotonic()
+            preview_seconds = len(segment) / tts.SAMPLE_RATE
+
+    path = tts.get_cached_path(text)
+    if path:
+        played = min(time.monotonic() - preview_started, preview_seconds) if preview_started else 0.0
+        audio_ph.audio(path, format=audio_mimetype(path), start_time=played, autoplay=True)
+    return path
+
+
 def ai_parse_callback(word, context, target_key, llm):
     """Callback for AI explanation of contextual sentences."""
     try:
-        enhanced_context = f"{context}\n\n(Instruction: You MUST provide the explanation of the term in BOTH English and Chinese.)"
+        enhanced_context = llm.bilingual_context(context)
         res = llm.explain_term_in_context(word, enhanced_context)
         if isinstance(res, dict) and 'translation' in res:
             st.session_state[target_key] = res['translation']
@@ -66,9 +93,14 @@ def ai_parse_callback(word, context, target_key, llm):
         st.session_state[f"err_{target_key}"] = str(e)
 
 
-def render_detail_body(term_data, db, tts, llm):
-    t_id = term_data['id']
-    term_dict = dict(term_data)
+def render_detail_body(view, db, tts, llm, prefetched=None):
+    """
+    view: cached view model of the term (app/services/term_view.py).
+    prefetched: data prepared in the background for this term (StudyPrefetcher.take).
+    """
+    prefetched = prefetched or {}
+    term_dict = dict(view['term'])
+    t_id = term_dict['id']
     word = term_dict['word']
     domain_id = term_dict['domain_id']
 
@@ -89,9 +121,9 @@ def render_detail_body(term_data, db, tts, llm):
         t_audio = st.session_state.get(f"new_audio_{t_id}", term_dict.get('audio_hash'))
 
         if t_audio:
-            abs_t_audio = get_safe_abs_path(t_audio)
-            if abs_t_audio and os.path.exists(abs_t_audio):
-                term_audio_ph.audio(abs_t_audio)
+            abs_t_audio = to_abs_path(t_audio)
+            if abs_t_audio and get_audio_cache().exists(abs_t_audio):
+                term_audio_ph.audio(abs_t_audio, format=audio_mimetype(abs_t_audio))
             else:
                 term_audio_ph.info("🔇 Audio file missing")
         else:
@@ -99,13 +131,16 @@ def render_detail_body(term_data, db, tts, llm):
 
         if st.button("✨ Gen Pronunciation", key=f"t_online_{t_id}", use_container_width=True):
             with st.spinner("Generating..."):
-                path = tts.get_audio_path(word)
+                try:
+                    path = stream_pronunciation(tts, word, term_audio_ph)
+                except Exception as e:
+                    print(f"TTS Error: {e}")
+                    path = None
                 if path:
-                    rel_path = get_rel_path(path)
+                    rel_path = to_rel_path(path)
                     st.session_state[f"new_audio_{t_id}"] = rel_path
                     # Record the original DB path to prevent accidentally deleting it later
                     st.session_state[f"old_audio_{t_id}"] = term_dict.get('audio_hash')
-                    term_audio_ph.audio(path)
 
     with col_t2:
         st.markdown("**Definition**")
@@ -125,12 +160,13 @@ def render_detail_body(term_data, db, tts, llm):
         # 2. 自动获取逻辑 (安全平滑模式，带独立加载动画)
         # ==========================================
         if def_key not in st.session_state:
-            if not term_dict['definition']:
+            if not term_dict['definition'] and prefetched.get('definition'):
+                st.session_state[def_key] = prefetched['definition']
+            elif not term_dict['definition']:
                 # 如果没释义，直接在这里触发自动获取，绝不卡死下半截UI
                 with st.spinner("🤖 Auto-fetching definition..."):
                     try:
-                        prompt = f"Provide a clear, concise English definition and its Chinese translation for the term '{word}'."
-                        new_def = llm.get_completion(prompt, system_prompt="You are a helpful dictionary assistant. Output only the definition.")
+                        new_def = llm.get_definition(word, domain_id=domain_id)
                         st.session_state[def_key] = new_def or ""
                     except Exception as e:
                         st.session_state[def_key] = f"Error: {str(e)}"
@@ -154,8 +190,7 @@ def render_detail_body(term_data, db, tts, llm):
         if st.button("✨ Gen Definition", key=f"btn_gen_def_{t_id}", use_container_width=True):
             with st.spinner("Generating definition via AI..."):
                 try:
-                    prompt = f"Provide a clear, concise English definition and its Chinese translation for the term '{word}'."
-                    new_def = llm.get_completion(prompt, system_prompt="You are a helpful dictionary assistant. Output only the definition.")
+                    new_def = llm.get_definition(word, bypass_cache=True, domain_id=domain_id)
                     if new_def:
                         st.session_state[temp_def_key] = new_def
                         st.rerun()
@@ -167,26 +202,10 @@ def render_detail_body(term_data, db, tts, llm):
 
     st.divider()
 
-    linked_sents = db.get_matches_for_term(t_id)
-
-    if linked_sents:
-        unique_sents = {}
-        for s in linked_sents:
-            if s['id'] not in unique_sents:
-                unique_sents[s['id']] = s
-        final_sents = list(unique_sents.values())
-    else:
-        searched_sents = db.search_sentences_hybrid(domain_id, word)
-
-        if searched_sents:
-            def _sent_len(row):
-                return len(str(dict(row).get("content_en", "")).strip())
-
-            final_sents = [max(searched_sents, key=_sent_len)]
-        else:
-            final_sents = []
-
-    context_str = dict(final_sents[0]).get('content_en', '') if final_sents else ""
+    # Linked sentences, else the best hybrid search hit (vector hits already bridged to SQLite)
+    linked_sents = view['linked']
+    final_sents = view['sentences']
+    context_str = view['context']
     def_str = st.session_state.get(def_key, term_dict.get('definition', ''))
 
     visual_context_container = st.container()
@@ -199,31 +218,8 @@ def render_detail_body(term_data, db, tts, llm):
     for i, sent in enumerate(final_sents):
         s_dict = dict(sent)
         s_id = s_dict['id']
-        content_en = s_dict.get('content_en', '')
 
-        # ==========================================
-        # 🌟 LOGIC ENHANCEMENT: Bridge VectorDB and SQLite
-        # If the matched sentence is solely from VectorDB,
-        # check if it already exists in the local SQLite DB.
-        # ==========================================
-        if str(s_id).startswith("vdb_"):
-            # Query SQLite using the exact English content
-            existing_row = db.conn.execute(
-                "SELECT * FROM sentences WHERE content_en = ?",
-                (content_en,)
-            ).fetchone()
-
-            if existing_row:
-                # If found, inherit all existing data (audio, translation, AI explanation)
-                sql_dict = dict(existing_row)
-                s_dict.update(sql_dict)
-                s_id = sql_dict['id']  # Replace virtual 'vdb_' ID with the actual SQLite ID
-
-                # Field mapping: ensure audio_path populates the expected UI variable
-                if 'audio_path' in sql_dict and sql_dict['audio_path']:
-                    s_dict['audio_hash'] = sql_dict['audio_path']
-
-        # Recalculate match status flags based on the potentially updated ID
+        # Vector hits that exist in SQLite were given their SQLite row by the view model
         is_vdb_only = str(s_id).startswith("vdb_")
 
         # Safely evaluate linked status (handle potential NoneType for linked_sents)
@@ -249,9 +245,9 @@ def render_detail_body(term_data, db, tts, llm):
                 s_audio = st.session_state.get(f"new_sent_audio_{s_id}", s_dict.get('audio_hash'))
 
                 if s_audio:
-                    abs_s_audio = get_safe_abs_path(s_audio)
-                    if abs_s_audio and os.path.exists(abs_s_audio):
-                        sent_audio_ph.audio(abs_s_audio)
+                    abs_s_audio = to_abs_path(s_audio)
+                    if abs_s_audio and get_audio_cache().exists(abs_s_audio):
+                        sent_audio_ph.audio(abs_s_audio, format=audio_mimetype(abs_s_audio))
                     else:
                         sent_audio_ph.info("🔇 Audio file missing")
                 else:
@@ -259,13 +255,16 @@ def render_detail_body(term_data, db, tts, llm):
 
                 if st.button("✨ Gen Pronunciation", key=f"s_gen_{s_id}", use_container_width=True):
                     with st.spinner("Generating..."):
-                        path = tts.get_audio_path(s_dict['content_en'])
+                        try:
+                            path = stream_pronunciation(tts, s_dict['content_en'], sent_audio_ph)
+                        except Exception as e:
+                            print(f"TTS Error: {e}")
+                            path = None
                         if path:
-                            rel_path = get_rel_path(path)
+                            rel_path = to_rel_path(path)
                             st.session_state[f"new_sent_audio_{s_id}"] = rel_path
                             # Record the original DB path for the sentence
                             st.session_state[f"old_sent_audio_{s_id}"] = s_dict.get('audio_hash')
-                            sent_audio_ph.audio(path)
 
                 st.write("")
                 render_mic_widget()
@@ -275,6 +274,9 @@ def render_detail_body(term_data, db, tts, llm):
                 draft_key = f"draft_{s_id}"
                 show_draft_key = f"show_draft_{s_id}"
                 apply_draft_key = f"apply_draft_{s_id}"
+                # Set when the draft is an AI Explain answer, which can be regenerated past the LLM cache
+                explained_key = f"explained_{s_id}"
+                regen_explain_key = f"regen_explain_{s_id}"
 
                 # --- 1. State Sync (Must happen before widgets are instantiated to prevent StreamlitAPIException) ---
                 # Check if user clicked "Copy to Edit" in the draft box
@@ -325,8 +327,10 @@ def render_detail_body(term_data, db, tts, llm):
                 analyze_clicked = btn_c2.button("📜 Syntax Analysis", key=f"s_syntax_{s_id}",
                                                 use_container_width=True)
 
+                regen_explain = st.session_state.pop(regen_explain_key, False)
+
                 # --- 4. AI Draft Box (Temporary Suggestion Area) ---
-                if explain_clicked or analyze_clicked or st.session_state.get(show_draft_key, False):
+                if explain_clicked or regen_explain or analyze_clicked or st.session_state.get(show_draft_key, False):
                     st.session_state[show_draft_key] = True
 
                     with st.container(border=True):
@@ -334,18 +338,21 @@ def render_detail_body(term_data, db, tts, llm):
                         draft_ph = st.empty()
 
                         # Generate content if a button was just clicked
-                        if explain_clicked:
+                        if explain_clicked or regen_explain:
                             with st.spinner("Analyzing context..."):
-                                enhanced_context = f"{s_dict['content_en']}\n\n(Instruction: You MUST provide the explanation of the term in BOTH English and Chinese.)"
+                                enhanced_context = llm.bilingual_context(s_dict['content_en'])
                                 try:
-                                    res = llm.explain_term_in_context(word, enhanced_context)
+                                    res = llm.explain_term_in_context(word, enhanced_context, domain_id=domain_id,
+                                                                      bypass_cache=regen_explain)
                                     if isinstance(res, dict) and 'translation' in res:
                                         st.session_state[draft_key] = res['translation']
                                         st.session_state[msg_key] = res['explanation']
+                                        st.session_state[explained_key] = True
                                 except Exception as e:
                                     st.error(f"AI Explain failed: {e}")
 
                         elif analyze_clicked:
+                            st.session_state[explained_key] = False
                             prompt = f"""
                                     Please perform a professional syntactic and semantic analysis for the following sentence, specifically tailored for an industry/technical context.
                                     Sentence: "{s_dict['content_en']}"
@@ -363,25 +370,19 @@ def render_detail_body(term_data, db, tts, llm):
                                     * **[Key Term 1]**: (Explain its specific meaning and role in this technical context)
                                     * **[Key Term 2]**: (Explain its specific meaning and role in this technical context)
                                                         """
+                            response = llm.get_completion(prompt,
+                                                          system_prompt="You are an expert English linguist and tech-domain specialist.",
+                                                          stream=True, feature="syntax", domain_id=domain_id)
                             try:
-                                response = llm.get_completion(prompt,
-                                                              system_prompt="You are an expert English linguist and tech-domain specialist.",
-                                                              stream=True)
-
-                                if isinstance(response, str):
-                                    st.session_state[draft_key] = response
-                                else:
-                                    draft_ph.empty()
-                                    with draft_ph.container():
-                                        full_text = st.write_stream(response)
-                                    st.session_state[draft_key] = full_text
-
-                            except TypeError:
-                                response = llm.get_completion(prompt,
-                                                              system_prompt="You are an expert English linguist and tech-domain specialist.")
-                                st.session_state[draft_key] = response
+                                draft_ph.empty()
+                                with draft_ph.container():
+                                    full_text = st.write_stream(response)
+                                st.session_state[draft_key] = full_text
                             except Exception as e:
                                 st.error(f"Syntax analysis failed: {e}")
+                            finally:
+                                # Navigating away stops the script mid-stream: cancel the request too
+                                response.close()
 
                         # Display the generated draft content
                         draft_content = st.session_state.get(draft_key, "")
@@ -389,14 +390,20 @@ def render_detail_body(term_data, db, tts, llm):
                             draft_ph.markdown(draft_content)
 
                         # Draft Box Action Buttons
-                        draft_b1, draft_b2 = st.columns(2)
+                        draft_b1, draft_b2, draft_b3 = st.columns(3)
 
                         if draft_b1.button("📝 Copy to Edit", key=f"d_copy_{s_id}", use_container_width=True):
                             # Trigger the append logic at the top of the script on rerun
                             st.session_state[apply_draft_key] = True
                             st.rerun()
 
-                        if draft_b2.button("✖ Close", key=f"d_close_{s_id}", use_container_width=True):
+                        if draft_b2.button("🔄 Regenerate", key=f"d_regen_{s_id}", use_container_width=True,
+                                           disabled=not st.session_state.get(explained_key, False)):
+                            # Asks the API again; the new answer replaces the cached one
+                            st.session_state[regen_explain_key] = True
+                            st.rerun()
+
+                        if draft_b3.button("✖ Close", key=f"d_close_{s_id}", use_container_width=True):
                             st.session_state[show_draft_key] = False
                             st.session_state[draft_key] = ""
                             st.rerun()
@@ -413,7 +420,7 @@ def render_detail_body(term_data, db, tts, llm):
     with col_btn1:
         if st.button("💾 Save", type="primary", use_container_width=True, key=f"modal_save_{t_id}"):
             new_def = st.session_state.get(f"term_def_input_{t_id}")
-            new_term_audio = get_rel_path(st.session_state.get(f"new_audio_{t_id}"))
+            new_term_audio = to_rel_path(st.session_state.get(f"new_audio_{t_id}"))
             saved_level = st.session_state.get(f"star_radio_{t_id}")
 
             saved_images = st.session_state.get(f"img_paths_{t_id}", "")
@@ -434,7 +441,7 @@ def render_detail_body(term_data, db, tts, llm):
 
                 input_key = f"s_cn_input_{temp_s_id}"
                 user_cn = st.session_state.get(input_key)
-                user_audio = get_rel_path(st.session_state.get(f"new_sent_audio_{temp_s_id}"))
+                user_audio = to_rel_path(st.session_state.get(f"new_sent_audio_{temp_s_id}"))
                 user_expl = st.session_state.get(f"msg_{input_key}")
 
                 real_s_id = temp_s_id
@@ -474,12 +481,16 @@ def render_detail_body(term_data, db, tts, llm):
                 if old_k in st.session_state:
                     del st.session_state[old_k]
 
+            # Prefetched sentences/images of this term are outdated now
+            _get_prefetcher(tts, llm).invalidate(t_id)
+
             st.toast("Saved successfully! Data is now linked.", icon="✅")
             # Force UI to refresh instantly to show the new "✓ Linked Match" status
             st.rerun()
 
     with col_btn2:
         if st.button("✖ Close", use_container_width=True, key=f"modal_close_{t_id}"):
+            _stop_prefetch()
             if 'active_study_index' in st.session_state:
                 del st.session_state.active_study_index
 
@@ -492,12 +503,7 @@ def render_detail_body(term_data, db, tts, llm):
                 old_path = st.session_state.get(old_k)
 
                 if new_path and new_path != old_path:
-                    abs_path = get_safe_abs_path(new_path)
-                    if abs_path and os.path.exists(abs_path):
-                        try:
-                            os.remove(abs_path)
-                        except Exception:
-                            pass
+                    get_audio_cache().discard(to_abs_path(new_path))
 
                 del st.session_state[k]
                 if old_k in st.session_state:
@@ -521,10 +527,17 @@ def render_detail_body(term_data, db, tts, llm):
             if db_paths:
                 for p in db_paths.split(","):
                     if p.strip():
-                        abs_p = get_safe_abs_path(p.strip())
+                        abs_p = to_abs_path(p.strip())
                         if abs_p and os.path.exists(abs_p):
                             valid_paths.append(p.strip())
 
+            if not valid_paths and prefetched.get('images'):
+                valid_paths = [p for p in prefetched['images'].split(",")
+                               if os.path.exists(to_abs_path(p))]
+                if valid_paths:
+                    # Prefetched images count as shown only now that the card displays them
+                    mark_images_shown(prefetched.get('image_urls'))
+
             if valid_paths:
                 st.session_state[img_state_key] = ",".join(valid_paths)
             else:
@@ -587,7 +600,7 @@ def render_detail_body(term_data, db, tts, llm):
                     img_cols = st.columns(3)
                     for i, p in enumerate(paths):
                         if i < 3:
-                            abs_p = get_safe_abs_path(p)
+                            abs_p = to_abs_path(p)
                             if abs_p and os.path.exists(abs_p):
                                 with img_cols[i]:
                                     try:
@@ -616,12 +629,11 @@ def render_detail_body(term_data, db, tts, llm):
             if needs_def:
                 with def_placeholder.container():
                     st.info("🤖 Auto-fetching definition in background...")
-                prompt = f"Provide a clear, concise English definition and its Chinese translation for the term '{word}'."
                 future_def = executor.submit(
                     run_with_ctx,
-                    llm.get_completion,
-                    prompt,
-                    system_prompt="You are a helpful dictionary assistant. Output only the definition."
+                    llm.get_definition,
+                    word,
+                    domain_id=domain_id
                 )
 
             if needs_img:
@@ -634,7 +646,6 @@ def render_detail_body(term_data, db, tts, llm):
                     word,
                     def_str,
                     context_str,
-                    t_id,
                     is_regenerate=is_regen
                 )
 
@@ -704,12 +715,7 @@ def trigger_study_dialog(term_list, db, tts, llm):
                     old_path = st.session_state.get(old_k)
 
                     if new_path and new_path != old_path:
-                        abs_path = get_safe_abs_path(new_path)
-                        if abs_path and os.path.exists(abs_path):
-                            try:
-                                os.remove(abs_path)
-                            except Exception:
-                                pass
+                        get_audio_cache().discard(to_abs_path(new_path))
 
                     del st.session_state[k]
                     if old_k in st.session_state:
@@ -739,7 +745,18 @@ def trigger_study_dialog(term_list, db, tts, llm):
             f"<div style='color:gray; font-size:0.8em; margin-bottom:10px;'>Word {curr_idx + 1} of {total_count}</div>",
             unsafe_allow_html=True)
 
-        term_data_fresh = db.get_term_by_id(term_id)
-        render_detail_body(term_data_fresh, db, tts, llm)
+        # Use what the background prefetch prepared for this card (waits if it is nearly done),
+        # then let it prepare the neighbours; terms that left the window are cancelled
+        prefetcher = _get_prefetcher(tts, llm)
+        with st.spinner("Loading..."):
+            prefetched = prefetcher.take(term_id, timeout=config.IMAGE_FETCH_DEADLINE)
+        prefetcher.warm(prefetcher.window([t['id'] for t in term_list], curr_idx), keep=[term_id])
+
+        # Reruns (typing, buttons) reuse the cached view until something is saved
+        view = get_term_view_cache().get(db, term_id)
+        if view is None:
+            st.error("Term not found")
+            return
+        render_detail_body(view, db, tts, llm, prefetched)
 
     _dialog()
\ No newline at end of file
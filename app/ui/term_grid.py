@@ -0,0 +1,161 @@
+"""
+Grid mode of Manage Vocabulary, for vocabularies with tens of thousands of terms.
+
+One st.data_editor replaces the four widgets per term of the list mode. Rows are read one
+page at a time with a filtered, sorted LIMIT/OFFSET query (the grid only draws the rows in
+view, so pages of thousands of terms scroll smoothly). The editor sits in a form, so editing
+cells does not rerun the page, and Save writes only the cells that were changed. The rows
+shown are kept in session_state, so the editor's row positions are mapped to term ids (and
+compared with the values) the user saw, even if the table changed in the meantime.
+"""
+import math
+
+import pandas as pd
+import streamlit as st
+
+GRID_PAGE_SIZES = [500, 1000, 2000, 5000]
+GRID_COLUMNS = ["id", "is_active", "word", "frequency", "star_level", "definition"]
+SORT_LABELS = {'level': "Level", 'freq': "Frequency", 'word': "Word"}
+
+
+def _init_state():
+    if 'grid_page' not in st.session_state:
+        st.session_state.grid_page = 1
+    if 'grid_page_size' not in st.session_state:
+        st.session_state.grid_page_size = GRID_PAGE_SIZES[0]
+    if 'grid_sort_col' not in st.session_state:
+        st.session_state.grid_sort_col = 'level'
+    if 'grid_sort_asc' not in st.session_state:
+        st.session_state.grid_sort_asc = False
+    # Bumped after every save so the editor starts over from the saved rows
+    if 'grid_version' not in st.session_state:
+        st.session_state.grid_version = 0
+
+
+def reset_grid_page():
+    st.session_state.grid_page = 1
+
+
+def _grid_prev_page():
+    if st.session_state.grid_page > 1:
+        st.session_state.grid_page -= 1
+
+
+def _grid_next_page(total_pages):
+    if st.session_state.grid_page < total_pages:
+        st.session_state.grid_page += 1
+
+
+def _cell_value(column, value):
+    """A grid value as it is stored in the terms table."""
+    if column == "is_active":
+        return 1 if value else 0
+    if column == "star_level":
+        return int(value) if value else 1
+    return "" if value is None or (isinstance(value, float) and math.isnan(value)) else str(value).strip()
+
+
+def edited_cells(df, edited_rows):
+    """
+    {term_id: {column: value}} of the cells whose value really changed.
+    edited_rows: the data editor's {row position: {column: new value}}.
+    """
+    updates = {}
+    for pos, changes in edited_rows.items():
+        original = df.iloc[int(pos)]
+        cells = {}
+        for column, value in changes.items():
+            new_value = _cell_value(column, value)
+            if column == "word" and not new_value:
+                continue  # an emptied word is not saved
+            if new_value != _cell_value(column, original[column]):
+                cells[column] = new_value
+        if cells:
+            updates[int(original['id'])] = cells
+    return updates
+
+
+def render_term_grid(db, domain_id, star_level=None, search_term=""):
+    _init_state()
+
+    sc1, sc2, _ = st.columns([1.5, 1, 4])
+    with sc1:
+        st.selectbox("Sort by", list(SORT_LABELS), format_func=lambda c: f"Sort by {SORT_LABELS[c]}",
+                     key="grid_sort_col", on_change=reset_grid_page, label_visibility="collapsed")
+    with sc2:
+        st.toggle("Ascending", key="grid_sort_asc", on_change=reset_grid_page)
+
+    total_items = db.count_terms(domain_id, star_level, search_term)
+    if not total_items:
+        st.info("No vocabulary matches your search.")
+        return
+
+    page_size = st.session_state.grid_page_size
+    total_pages = math.ceil(total_items / page_size)
+    if st.session_state.grid_page > total_pages:
+        st.session_state.grid_page = total_pages
+    page = st.session_state.grid_page
+
+    rows = db.get_terms_page(domain_id, star_level, search_term, sort=st.session_state.grid_sort_col,
+                             ascending=st.session_state.grid_sort_asc,
+                             limit=page_size, offset=(page - 1) * page_size)
+    df = pd.DataFrame([dict(r) for r in rows], columns=GRID_COLUMNS)
+    df["is_active"] = df["is_active"].astype(bool)
+    df["definition"] = df["definition"].fillna("")
+
+    # Any change of the query or page gets a fresh editor
+    editor_key = (f"term_grid_{domain_id}_{star_level}_{search_term}_{st.session_state.grid_sort_col}_"
+                  f"{st.session_state.grid_sort_asc}_{page}_{page_size}_{st.session_state.grid_version}")
+    # The rows the editor was drawn with on the previous run: the positions in edited_rows refer to
+    # them, not to the rows queried now (another tab or an import may have added or reordered terms)
+    shown = st.session_state.get('grid_shown')
+    shown_df = shown[1] if shown is not None and shown[0] == editor_key else None
+    st.session_state.grid_shown = (editor_key, df)
+
+    with st.form("term_grid_form", border=False):
+        st.data_editor(
+            df,
+            key=editor_key,
+            hide_index=True,
+            num_rows="fixed",
+            use_container_width=True,
+            height=600,
+            column_order=["is_active", "word", "frequency", "star_level", "definition"],
+            disabled=["id", "frequency"],
+            column_config={
+                "is_active": st.column_config.CheckboxColumn("Enable", width="small"),
+                "word": st.column_config.TextColumn("Word", required=True),
+                "frequency": st.column_config.NumberColumn("Freq", width="small"),
+                "star_level": st.column_config.SelectboxColumn("Level", options=[1, 2, 3, 4, 5], required=True,
+                                                               width="small"),
+                "definition": st.column_config.TextColumn("Definition", width="large"),
+            },
+        )
+        submitted = st.form_submit_button("💾 Save Edited Cells", type="primary")
+
+    if submitted and shown_df is None:
+        st.warning("The grid was reloaded before saving. Please make your edits again.")
+    elif submitted:
+        updates = edited_cells(shown_df, st.session_state[editor_key]["edited_rows"])
+        if updates:
+            saved = db.update_term_cells(updates)
+            st.session_state.grid_version += 1
+            st.toast(f"✅ Saved {saved} cell(s) in {len(updates)} term(s)!", icon="✅")
+            st.rerun()
+        else:
+            st.toast("No changes to save.", icon="ℹ️")
+
+    pc1, pc2, pc3, pc4 = st.columns([1, 2, 1, 1])
+    with pc1:
+        st.button("⬅️ Prev", key="grid_prev", on_click=_grid_prev_page, disabled=(page == 1),
+                  use_container_width=True)
+    with pc2:
+        st.markdown(
+            f"<div style='text-align: center; color: #4b5563; margin-top: 8px;'>Page <b>{page}</b> of <b>{total_pages}</b> &nbsp;|&nbsp; Total: {total_items} terms</div>",
+            unsafe_allow_html=True)
+    with pc3:
+        st.button("Next ➡️", key="grid_next", on_click=_grid_next_page, args=(total_pages,),
+                  disabled=(page == total_pages), use_container_width=True)
+    with pc4:
+        st.selectbox("Rows per page", GRID_PAGE_SIZES, key="grid_page_size", on_change=reset_grid_page,
+                     format_func=lambda n: f"{n} / page", label_visibility="collapsed")
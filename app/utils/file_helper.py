@@ -1,4 +1,7 @@
 import io
+import os
+
+from config import PROJECT_ROOT
 
 
 def read_text_file(uploaded_file):
@@ -26,4 +29,26 @@ def read_text_file(uploaded_file):
         # return text
         return "[暂不支持 PDF 解析，请上传 TXT]"
 
-    return ""
\ No newline at end of file
+    return ""
+
+def to_rel_path(path_str):
+    """
+    Converts an absolute path to a project-relative path for database storage.
+    """
+    if not path_str:
+        return path_str
+    try:
+        return os.path.relpath(path_str, PROJECT_ROOT).replace('\\', '/')
+    except ValueError:
+        return str(path_str).replace('\\', '/')
+
+
+def to_abs_path(path_str):
+    """
+    Converts a project-relative path (as stored in the database) back to an absolute path.
+    """
+    if not path_str:
+        return None
+    if os.path.isabs(path_str):
+        return path_str
+    return str(PROJECT_ROOT / path_str)
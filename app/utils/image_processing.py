@@ -0,0 +1,68 @@
+"""
+Post-processing of downloaded term images.
+
+Each image is fully decoded (so truncated or fake files are rejected), rotated according
+to its EXIF orientation and re-encoded as WebP without any metadata:
+    <hash>.thumb.webp   longest side images.thumbnail_size, shown in the study dialog
+    <hash>.medium.webp  longest side images.medium_size (optional, 0 disables it)
+The files are kept by app/services/image_store.py; `terms.image_paths` references the thumbnails.
+"""
+import io
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+import config
+
+THUMB_SUFFIX = ".thumb.webp"
+MEDIUM_SUFFIX = ".medium.webp"
+
+
+def is_rendition(path):
+    name = Path(path).name
+    return name.endswith(THUMB_SUFFIX) or name.endswith(MEDIUM_SUFFIX)
+
+
+def medium_path_for(thumb_path):
+    """Medium rendition belonging to a thumbnail path (it may not exist)."""
+    thumb_path = str(thumb_path)
+    if not thumb_path.endswith(THUMB_SUFFIX):
+        return None
+    return thumb_path[:-len(THUMB_SUFFIX)] + MEDIUM_SUFFIX
+
+
+def _encode(img, max_side, quality):
+    rendition = img.copy()
+    rendition.thumbnail((max_side, max_side), Image.LANCZOS)
+    out = io.BytesIO()
+    # exif/icc are passed empty explicitly so nothing of the source is carried over
+    rendition.save(out, "WEBP", quality=quality, method=4, exif=b"", icc_profile=None)
+    return out.getvalue()
+
+
+def make_renditions(data, thumb_size=None, medium_size=None, quality=None):
+    """
+    Validates image bytes and encodes them as WebP.
+    Returns {"thumb": bytes, "medium": bytes or None}, or None if the data is not a usable image.
+    """
+    thumb_size = thumb_size or config.IMAGE_THUMB_SIZE
+    medium_size = config.IMAGE_MEDIUM_SIZE if medium_size is None else medium_size
+    quality = quality or config.IMAGE_WEBP_QUALITY
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            # Let the JPEG decoder downscale while decoding, far cheaper than decoding full size
+            img.draft("RGB", (max(thumb_size, medium_size),) * 2)
+            img.load()
+            img = ImageOps.exif_transpose(img)
+            has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+            img = img.convert("RGBA" if has_alpha else "RGB")
+    except Exception:
+        return None
+
+    thumb = _encode(img, thumb_size, quality)
+    medium = None
+    if medium_size and max(img.size) > thumb_size:
+        medium = _encode(img, medium_size, quality)
+    return {"thumb": thumb, "medium": medium}
+
@@ -1,71 +1,167 @@
-import os
+import concurrent.futures
 import re
-import urllib.request
 import urllib.parse
 import time
 import random
-from config import PROJECT_ROOT, IMAGE_CACHE_DIR
+import threading
 
+import requests
+from requests.adapters import HTTPAdapter
 
-def get_image_urls(query, count=8, exclude_urls=None):
-    if exclude_urls is None:
-        exclude_urls = set()
+import config
+from app.services.image_search_cache import get_image_search_cache
+from app.services.image_store import get_image_store
+from app.utils.file_helper import to_rel_path
+from app.utils.image_processing import make_renditions
+
+_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5'
+}
+
+# (engine, regex extracting full-size image URLs from its result page), in fallback order
+_ENGINE_PATTERNS = [
+    ("google", re.compile(r'\["(http[^"]+?\.(?:jpg|jpeg|png))"')),
+    ("bing", re.compile(r'murl&quot;:&quot;(http[^&]+?)&quot;')),
+]
+
+# Leading bytes of the formats we accept -> file extension
+_IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+]
+
+_MAX_IMAGE_BYTES = 10 * 1024 * 1024
 
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Process-wide session: keep-alive connections to search and image hosts are reused across calls."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(_HEADERS)
+            _session = session
+    return _session
+
+
+def _scrape_image_urls(query, count, timeout=None):
+    timeout = timeout or config.IMAGE_REQUEST_TIMEOUT
     encoded_query = urllib.parse.quote(query)
     urls = []
+    session = get_http_session()
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5'
-    }
-
-    # 1. Try Google Images
-    try:
-        url = f"https://www.google.com/search?tbm=isch&q={encoded_query}"
-        req = urllib.request.Request(url, headers=headers)
-        html = urllib.request.urlopen(req, timeout=5).read().decode('utf-8', errors='ignore')
-        matches = re.findall(r'\["(http[^"]+?\.(?:jpg|jpeg|png))"', html)
-        for m in matches:
-            if m not in exclude_urls and m not in urls:
-                urls.append(m)
-                if len(urls) >= count:
-                    return urls
-    except Exception as e:
-        print(f"Google search failed for {query}: {e}")
-
-    # 2. Fallback to Bing Images
-    if len(urls) < count:
+    # Google Images first, Bing as fallback
+    for engine, pattern in _ENGINE_PATTERNS:
         try:
-            url = f"https://www.bing.com/images/search?q={encoded_query}"
-            req = urllib.request.Request(url, headers=headers)
-            html = urllib.request.urlopen(req, timeout=5).read().decode('utf-8', errors='ignore')
-            matches = re.findall(r'murl&quot;:&quot;(http[^&]+?)&quot;', html)
-            for m in matches:
-                if m not in exclude_urls and m not in urls:
+            url = config.IMAGE_SEARCH_URLS[engine].format(query=encoded_query)
+            html = session.get(url, timeout=timeout).text
+            for m in pattern.findall(html):
+                if m not in urls:
                     urls.append(m)
                     if len(urls) >= count:
                         return urls
         except Exception as e:
-            print(f"Bing search failed for {query}: {e}")
+            print(f"{engine.capitalize()} search failed for {query}: {e}")
+
+    return urls
+
+
+def get_image_urls(query, count=8, exclude_urls=None, timeout=None, refresh=False):
+    """
+    Image URLs for a query, served from the search cache when possible.
+    refresh=True scrapes again even if a cached pool exists.
+    """
+    if exclude_urls is None:
+        exclude_urls = set()
+    cache = get_image_search_cache()
+
+    pool = None if refresh else cache.get(query)
+    if pool is None:
+        pool = _scrape_image_urls(query, max(count, config.IMAGE_SEARCH_POOL_SIZE), timeout)
+        # A failed scrape is not cached, so the next call tries again
+        if pool:
+            cache.put(query, pool)
+
+    return [u for u in pool if u not in exclude_urls][:count]
+
+
+def _search_candidates(query, count, is_regenerate):
+    """Candidate URLs for one query variant. Regenerate skips the URLs already shown for it."""
+    if not is_regenerate:
+        return get_image_urls(query, count)
 
+    cache = get_image_search_cache()
+    shown = cache.used(query)
+    urls = get_image_urls(query, count, exclude_urls=shown)
+    if not urls:
+        # Pool used up: scrape again; if that finds nothing new, start over with the whole pool
+        urls = get_image_urls(query, count, exclude_urls=shown, refresh=True)
+        if not urls:
+            cache.reset_used(query)
+            urls = get_image_urls(query, count)
     return urls
 
 
-def download_image(url, save_path):
+def _image_ext(data):
+    for signature, ext in _IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return ext
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def fetch_image(url, timeout=None):
+    """Downloads an image into memory. Returns (bytes, ext) or None if it is not a usable image."""
+    timeout = timeout or config.IMAGE_REQUEST_TIMEOUT
     try:
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        with urllib.request.urlopen(req, timeout=5) as response, open(save_path, 'wb') as out_file:
-            out_file.write(response.read())
-        return True
+        with get_http_session().get(url, timeout=timeout, stream=True) as response:
+            if response.status_code != 200:
+                return None
+            chunks, size = [], 0
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > _MAX_IMAGE_BYTES:
+                    return None
+                chunks.append(chunk)
+        data = b"".join(chunks)
     except Exception:
-        return False
+        return None
+
+    ext = _image_ext(data)
+    return (data, ext) if ext else None
 
 
-def fetch_term_images(word, definition, context, term_id, is_regenerate=False):
-    fetched_urls = set()
-    selected_urls = []
+def fetch_renditions(url):
+    """Downloads an image and encodes its WebP renditions. Returns the renditions dict or None."""
+    result = fetch_image(url)
+    if result is None:
+        return None
+    return make_renditions(result[0])
+
+
+def download_image(url):
+    """Downloads an image into the image store. Returns the absolute thumbnail path or None."""
+    renditions = fetch_renditions(url)
+    if renditions is None:
+        return None
+    try:
+        return get_image_store().put(renditions)
+    except OSError:
+        return None
 
+
+def _build_queries(word, definition, context):
     queries = [word]
 
     if definition:
@@ -80,42 +176,110 @@ def fetch_term_images(word, definition, context, term_id, is_regenerate=False):
     else:
         queries.append(word + " illustration")
 
-    for q in queries:
-        urls = get_image_urls(q, count=8, exclude_urls=fetched_urls)
+    return queries
+
+
+def _save_image(renditions):
+    """Relative path of the stored thumbnail, or None if it could not be written."""
+    # Content-addressed: an image that is already stored is not written again
+    try:
+        return to_rel_path(str(get_image_store().put(renditions)))
+    except OSError as e:
+        print(f"Image Store Error: {e}")
+        return None
+
+
+def mark_images_shown(shown):
+    """Marks {query: [url, ...]} as shown, so the next Regenerate skips those URLs."""
+    cache = get_image_search_cache()
+    for query, urls in (shown or {}).items():
         if urls:
-            # If regenerate, pick randomly from pool; otherwise, always pick Top 1
-            if is_regenerate:
-                chosen_url = random.choice(urls)
-            else:
-                chosen_url = urls[0]
-
-            selected_urls.append(chosen_url)
-            fetched_urls.add(chosen_url)
-
-    if len(selected_urls) < 3:
-        more_urls = get_image_urls(word, count=10, exclude_urls=fetched_urls)
-        if more_urls:
-            if is_regenerate:
-                random.shuffle(more_urls)
-            needed = 3 - len(selected_urls)
-            selected_urls.extend(more_urls[:needed])
-
-    saved_paths = []
-    for idx, u in enumerate(selected_urls[:3]):
-        ext = "jpg"
-        if ".png" in u.lower():
-            ext = "png"
-        elif ".jpeg" in u.lower():
-            ext = "jpeg"
-
-        filename = f"term_{term_id}_{int(time.time())}_{idx}.{ext}"
-        save_path = IMAGE_CACHE_DIR / filename
-
-        if download_image(u, str(save_path)):
-            try:
-                rel_path = os.path.relpath(save_path, PROJECT_ROOT).replace('\\', '/')
-            except ValueError:
-                rel_path = str(save_path).replace('\\', '/')
-            saved_paths.append(rel_path)
-
-    return ",".join(saved_paths)
\ No newline at end of file
+            cache.mark_used(query, urls)
+
+
+def fetch_term_images(word, definition, context, is_regenerate=False, wanted=3, deadline=None, shown=None):
+    """
+    Searches the three query variants (term, term + definition, term + context) concurrently
+    and downloads candidates as soon as their search returns.
+    Images are stored as WebP thumbnails (see image_processing). Returns their comma-separated
+    relative paths as soon as `wanted` valid images have arrived, or whatever arrived when the
+    deadline (images.fetch_deadline_seconds) expires.
+    The URLs of the returned images are marked as shown, unless a `shown` dict is passed: then
+    they are collected into it, for mark_images_shown() once the images are actually displayed.
+    """
+    deadline_at = time.monotonic() + (deadline or config.IMAGE_FETCH_DEADLINE)
+    queries = _build_queries(word, definition, context)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=config.IMAGE_FETCH_WORKERS)
+    # The plain term search fetches a broader pool, used when a variant finds nothing or a download fails
+    searches = {executor.submit(_search_candidates, q, 10 if i == 0 else 8, is_regenerate): q
+                for i, q in enumerate(queries)}
+
+    primary = []        # one pick per search (top result, or random on regenerate)
+    spare = []          # every other candidate, in arrival order
+    tried = set()
+    origin = {}         # url -> query variant that found it
+    downloads = {}      # future -> (rank, url); rank is the order in which downloads were started
+    saved = []          # (rank, relative path, url)
+    failed = []
+
+    def top_up():
+        # Two downloads beyond what is still needed, so one slow host doesn't hold up the result
+        while len(saved) + len(downloads) < wanted + 2 and (primary or spare):
+            pool = primary if primary else spare
+            url = pool.pop(random.randrange(len(pool)) if is_regenerate and pool is spare else 0)
+            if url in tried:
+                continue
+            tried.add(url)
+            downloads[executor.submit(fetch_renditions, url)] = (len(tried), url)
+
+    try:
+        pending = set(searches)
+        while pending and len(saved) < wanted:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = concurrent.futures.wait(pending, timeout=remaining,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                if future in searches:
+                    urls = [u for u in future.result() if u not in tried and u not in primary and u not in spare]
+                    for u in urls:
+                        origin.setdefault(u, searches[future])
+                    if urls:
+                        # If regenerate, pick randomly from the results; otherwise always the top one
+                        chosen = random.choice(urls) if is_regenerate else urls[0]
+                        primary.append(chosen)
+                        spare.extend(u for u in urls if u != chosen)
+                else:
+                    rank, url = downloads.pop(future)
+                    renditions = future.result()
+                    if renditions is None:
+                        failed.append(url)
+                    elif len(saved) < wanted:
+                        path = _save_image(renditions)
+                        # A write error counts as a failed download (the link itself is fine, so it stays cached);
+                        # different URLs may serve the same picture
+                        if path and all(path != p for _, p, _ in saved):
+                            saved.append((rank, path, url))
+            top_up()
+            pending.update(downloads)
+    finally:
+        # Downloads still running are dropped; nothing is written to disk after returning
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # Shown images are skipped by the next Regenerate; dead links leave the cached pools
+    cache = get_image_search_cache()
+    returned = {}
+    for query in queries:
+        returned[query] = [url for _, _, url in saved if origin.get(url) == query]
+        dead = [url for url in failed if origin.get(url) == query]
+        if dead:
+            cache.drop(query, dead)
+    if shown is None:
+        mark_images_shown(returned)
+    else:
+        shown.update(returned)
+
+    return ",".join(path for _, path, _ in sorted(saved))
@@ -0,0 +1,71 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+
+    def wait(self, timeout=None):
+        """True once the leader delivered a result (or raises its exception); False if it timed out or gave up."""
+        if not self.done.wait(timeout) or self.abandoned:
+            return False
+        if self.error is not None:
+            raise self.error
+        return True
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into a single execution.
+    The first caller (the leader) runs the work; callers arriving while it is
+    in flight wait and receive the leader's result (or exception).
+    Followers wait at most wait_timeout seconds. If the leader takes longer or is
+    abandoned (e.g. its Streamlit run was stopped), they run the work themselves.
+    """
+
+    def __init__(self, wait_timeout=None):
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def claim(self, key):
+        """Returns (call, is_leader). The leader must call finish() when done, in a finally block."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            return call, True
+
+    def finish(self, key, call, result=None, error=None, abandoned=False):
+        call.result = result
+        call.error = error
+        call.abandoned = abandoned
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.done.set()
+
+    def do(self, key, fn, *args, **kwargs):
+        call, is_leader = self.claim(key)
+        if not is_leader:
+            if call.wait(self.wait_timeout):
+                return call.result
+            return fn(*args, **kwargs)
+
+        result, error, finished = None, None, False
+        try:
+            result = fn(*args, **kwargs)
+            finished = True
+            return result
+        except Exception as e:
+            error = e
+            finished = True
+            raise
+        finally:
+            # Without a result (e.g. Streamlit's StopException) the followers do the work themselves
+            self.finish(key, call, result=result, error=error, abandoned=not finished)
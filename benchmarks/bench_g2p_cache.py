@@ -0,0 +1,107 @@
+"""
+Measures which share of Kokoro synthesis latency is spent in G2P (misaki phonemization),
+without and with the persistent phoneme cache.
+
+Usage:
+    python -m benchmarks.bench_g2p_cache                 # built-in sample corpus
+    python -m benchmarks.bench_g2p_cache --domain 1      # sentences of a domain from the DB
+    python -m benchmarks.bench_g2p_cache --limit 200 --warmup 0.5
+
+The cache is filled with the first `--warmup` fraction of the corpus (as if those
+sentences had been heard before); timings are then taken over the whole corpus.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import config
+from app.services.phoneme_cache import PhonemeCache
+
+SAMPLE_CORPUS = [
+    "Grouped query attention shares key and value heads across several query heads.",
+    "The transformer applies multi-head attention followed by a feed-forward network.",
+    "Rotary position embeddings rotate the query and key vectors by a position-dependent angle.",
+    "Mixed precision training keeps a master copy of the weights in higher precision.",
+    "The attention scores are scaled before the softmax to keep gradients stable.",
+    "A key-value cache stores the keys and values of previous tokens during decoding.",
+    "Grouped query attention reduces the size of the key-value cache during inference.",
+    "The feed-forward network expands the hidden dimension before projecting it back.",
+    "Layer normalization is applied before each attention block in the pre-norm transformer.",
+    "Speculative decoding drafts several tokens with a small model and verifies them in parallel.",
+]
+
+
+def _load_corpus(args):
+    if args.domain is None:
+        return SAMPLE_CORPUS
+    from app.database.db_manager import DBManager
+    rows = DBManager().get_sentences_by_domain(args.domain)
+    texts = [r["content_en"] for r in rows if r["content_en"]]
+    return texts[:args.limit] if args.limit else texts
+
+
+def _time(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def _run(pipeline, texts, voice, g2p):
+    g2p_times, synth_times = [], []
+    for text in texts:
+        tokens, t_g2p = _time(lambda: g2p(text))
+        _, t_synth = _time(lambda: list(pipeline.generate_from_tokens(tokens, voice=voice)))
+        g2p_times.append(t_g2p)
+        synth_times.append(t_synth)
+    return g2p_times, synth_times
+
+
+def _report(label, g2p_times, synth_times):
+    g2p_total, synth_total = sum(g2p_times), sum(synth_times)
+    share = g2p_total / (g2p_total + synth_total) if (g2p_total + synth_total) else 0.0
+    print(f"{label:<14} G2P median {statistics.median(g2p_times) * 1000:8.2f} ms | "
+          f"acoustic median {statistics.median(synth_times) * 1000:8.2f} ms | "
+          f"G2P share of latency {share * 100:5.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark G2P share of Kokoro latency with/without phoneme cache.")
+    parser.add_argument("--domain", type=int, default=None, help="Domain id to take sentences from")
+    parser.add_argument("--limit", type=int, default=200, help="Max sentences from the domain")
+    parser.add_argument("--warmup", type=float, default=0.5, help="Fraction of the corpus used to fill the cache")
+    args = parser.parse_args()
+
+    from kokoro import KPipeline
+
+    texts = _load_corpus(args)
+    voice = config.TTS_VOICE
+    pipeline = KPipeline(lang_code="a")
+
+    # Load voice, spaCy and the model before timing anything
+    list(pipeline("Warm up.", voice=voice))
+
+    print(f"Corpus: {len(texts)} sentences, voice {voice}")
+
+    def raw_g2p(text):
+        return pipeline.g2p(text)[1]
+
+    _report("without cache", *_run(pipeline, texts, voice, raw_g2p))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PhonemeCache(db_path=Path(tmp) / "phonemes.db")
+        for text in texts[:int(len(texts) * args.warmup)]:
+            cache.tokens_for(pipeline, text, voice)
+        cache.hits = cache.misses = 0
+
+        def cached_g2p(text):
+            return cache.tokens_for(pipeline, text, voice)
+
+        _report("with cache", *_run(pipeline, texts, voice, cached_g2p))
+        s = cache.stats()
+        print(f"Cache: {s['words']} words, segment hit rate {s['hit_rate'] * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
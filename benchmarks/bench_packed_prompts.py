@@ -0,0 +1,164 @@
+"""
+Compares throughput and token cost per item of unpacked `explain_term_in_context` calls
+with packed requests (`LLMClient.explain_terms_packed`) at different pack sizes.
+
+Runs against a local mock of the chat completions endpoint, so no API key is needed and
+results are reproducible. The mock charges a fixed overhead per request plus a time per
+generated token, counts tokens (~4 characters each) and can drop a share of the packed
+items to exercise re-requests.
+
+Usage:
+    python -m benchmarks.bench_packed_prompts
+    python -m benchmarks.bench_packed_prompts --items 64 --pack-sizes 1,4,8,16 --drop-rate 0.05
+"""
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import config
+
+SAMPLE_PAIRS = [
+    ("attention", "The attention scores are scaled before the softmax to keep gradients stable."),
+    ("KV cache", "A key-value cache stores the keys and values of previous tokens during decoding."),
+    ("GQA", "Grouped query attention shares key and value heads across several query heads."),
+    ("RoPE", "Rotary position embeddings rotate the query and key vectors by a position-dependent angle."),
+    ("mixed precision", "Mixed precision training keeps a master copy of the weights in higher precision."),
+    ("pre-norm", "Layer normalization is applied before each attention block in the pre-norm transformer."),
+    ("speculative decoding", "Speculative decoding drafts several tokens with a small model and verifies them."),
+    ("feed-forward", "The feed-forward network expands the hidden dimension before projecting it back."),
+]
+
+
+def _tokens(text):
+    return max(1, len(text) // 4)
+
+
+class MockState:
+    def __init__(self, overhead_ms, ms_per_token, drop_rate, seed):
+        self.overhead = overhead_ms / 1000.0
+        self.per_token = ms_per_token / 1000.0
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+
+def _answer(term, sentence):
+    return {"translation": f"[zh] {sentence}", "explanation": f"'{term}' as used in: {sentence[:60]}"}
+
+
+def _make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            system, user = body["messages"][0]["content"], body["messages"][1]["content"]
+
+            if user.startswith("Items:"):
+                items = json.loads(user[user.index("["):])
+                with state.lock:
+                    kept = [it for it in items if state.rng.random() >= state.drop_rate]
+                content = {"items": [dict(id=it["id"], **_answer(it["term"], it["sentence"])) for it in kept]}
+            else:
+                term = user.split("\n", 1)[0].replace("Target Term: ", "")
+                sentence = user.split("Context Sentence: ", 1)[-1]
+                content = _answer(term, sentence)
+
+            text = json.dumps(content, ensure_ascii=False)
+            prompt_tokens, completion_tokens = _tokens(system + user), _tokens(text)
+            with state.lock:
+                state.requests += 1
+                state.prompt_tokens += prompt_tokens
+                state.completion_tokens += completion_tokens
+            time.sleep(state.overhead + completion_tokens * state.per_token)
+
+            payload = json.dumps({
+                "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
+
+
+def _report(label, state, items, elapsed, failed, args):
+    cost = (state.prompt_tokens * args.input_price + state.completion_tokens * args.output_price) / 1e6
+    print(f"{label:<10} {state.requests:5d} req | {items / elapsed:7.2f} items/s | "
+          f"{(state.prompt_tokens + state.completion_tokens) / items:7.1f} tokens/item | "
+          f"${cost / items * 1000:.4f} per 1k items | {failed} failed")
+
+
+def _run(llm, state, args):
+    pairs = [(term, f"{sentence} (#{i})") for i, (term, sentence) in
+             ((i, SAMPLE_PAIRS[i % len(SAMPLE_PAIRS)]) for i in range(args.items))]
+    print(f"{args.items} items, mock overhead {args.overhead_ms:.0f} ms/request, drop rate {args.drop_rate:.0%}")
+
+    state.reset()
+    start = time.perf_counter()
+    failed = sum(1 for term, sentence in pairs
+                 if "Error" in llm.explain_term_in_context(term, sentence).get("translation", ""))
+    _report("unpacked", state, args.items, time.perf_counter() - start, failed, args)
+
+    for size in (int(s) for s in args.pack_sizes.split(",")):
+        state.reset()
+        start = time.perf_counter()
+        results = llm.explain_terms_packed(pairs, pack_size=size)
+        _report(f"pack={size}", state, args.items, time.perf_counter() - start,
+                sum(1 for r in results if r is None), args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark packed vs. single LLM explanation requests.")
+    parser.add_argument("--items", type=int, default=48, help="Number of (term, sentence) pairs")
+    parser.add_argument("--pack-sizes", default="1,2,4,8,16", help="Comma-separated pack sizes")
+    parser.add_argument("--overhead-ms", type=float, default=150.0, help="Mock latency per request")
+    parser.add_argument("--ms-per-token", type=float, default=0.5, help="Mock latency per generated token")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Share of packed items the mock omits")
+    parser.add_argument("--input-price", type=float, default=0.15, help="USD per 1M prompt tokens")
+    parser.add_argument("--output-price", type=float, default=0.60, help="USD per 1M completion tokens")
+    args = parser.parse_args()
+
+    state = MockState(args.overhead_ms, args.ms_per_token, args.drop_rate, seed=0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Point the client at the mock and keep the response cache out of the measurement
+    config.LLM_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    config.LLM_API_KEY = "mock"
+    config.LLM_CACHE_ENABLED = False
+    from app.services.llm_client import LLMClient
+    from app.services.llm_metrics import LLMMetrics
+    llm = LLMClient()
+    # Mock calls go to a throwaway metrics DB, not into the LLM Metrics dashboard
+    metrics_dir = tempfile.mkdtemp(prefix="deepgloss_bench_")
+    llm.metrics = LLMMetrics(db_path=Path(metrics_dir) / "llm_metrics.db")
+    try:
+        _run(llm, state, args)
+    finally:
+        llm.metrics.close()
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
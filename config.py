@@ -44,6 +44,15 @@ except Exception as e:
     AUDIO_CACHE_DIR = PROJECT_ROOT / "data" / "audio_cache"
     AUDIO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+# --- 1.0.1 Audio Codec ---
+AUDIO_FORMAT = str(storage_conf.get("audio_format", "wav")).lower()
+if AUDIO_FORMAT not in ("wav", "flac", "ogg", "opus"):
+    print(f"Warning: Unsupported audio_format '{AUDIO_FORMAT}', falling back to wav.")
+    AUDIO_FORMAT = "wav"
+
+# Byte budget for the audio cache (0 = unlimited), enforced by app/services/audio_cache.py
+AUDIO_CACHE_MAX_BYTES = max(0, int(storage_conf.get("audio_cache_max_mb", 0))) * 1024 * 1024
+
 # --- 1.1 Image Cache Directory Setup ---
 raw_image_path = storage_conf.get("image_cache_path", DEFAULT_IMAGE_PATH)
 
@@ -59,6 +68,9 @@ except Exception as e:
     IMAGE_CACHE_DIR = PROJECT_ROOT / "data" / "image_cache"
     IMAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+# Unreferenced cache files younger than this are kept by app/services/cache_gc.py
+CACHE_GC_GRACE_SECONDS = max(0.0, float(storage_conf.get("gc_grace_hours", 24))) * 3600
+
 
 # --- 2. General Data Directory ---
 DATA_DIR = PROJECT_ROOT / "data"
@@ -90,4 +102,82 @@ LLM_BASE_URL = (
 # --- TTS API Configuration ---
 # 独立配置 TTS 的接口和密钥。如果未设置，则默认使用 LLM 的配置
 TTS_API_KEY = os.getenv("TTS_API_KEY") or LLM_API_KEY
-TTS_BASE_URL = os.getenv("TTS_BASE_URL") or LLM_BASE_URL
\ No newline at end of file
+TTS_BASE_URL = os.getenv("TTS_BASE_URL") or LLM_BASE_URL
+
+# --- TTS Engine Pool (local Kokoro) ---
+tts_conf = config_data.get("tts", {})
+
+# Number of KPipeline instances shared by all sessions of this process
+TTS_POOL_SIZE = max(1, int(tts_conf.get("pool_size", 1)))
+# Warm up the pool in a background thread at server start
+TTS_WARMUP = bool(tts_conf.get("warmup", True))
+# Max seconds to wait for a free pipeline before a synthesis gives up
+TTS_ACQUIRE_TIMEOUT = max(1.0, float(tts_conf.get("acquire_timeout_seconds", 180)))
+# Worker processes for batch pre-synthesis (app/services/audio_batch.py)
+TTS_BATCH_WORKERS = max(1, int(tts_conf.get("batch_workers", 2)))
+# Persistent word -> phoneme cache in front of Kokoro's G2P
+TTS_PHONEME_CACHE = bool(tts_conf.get("phoneme_cache", True))
+# Character threshold for parallel long-text synthesis (0 = disabled)
+TTS_LONG_TEXT_CHARS = max(0, int(tts_conf.get("long_text_chars", 300)))
+
+# --- LLM Response Cache ---
+llm_conf = config_data.get("llm", {})
+
+# Cache identical LLM requests in data/llm_cache.db
+LLM_CACHE_ENABLED = bool(llm_conf.get("cache_enabled", True))
+# Entries older than this are re-requested (0 = never expire)
+LLM_CACHE_TTL_SECONDS = max(0.0, float(llm_conf.get("cache_ttl_hours", 720))) * 3600
+# Maximum number of cached responses (0 = unlimited)
+LLM_CACHE_MAX_ENTRIES = max(0, int(llm_conf.get("cache_max_entries", 20000)))
+# Concurrent requests of the batch definition job
+LLM_BATCH_CONCURRENCY = max(1, int(llm_conf.get("batch_concurrency", 8)))
+# Request budget of batch jobs (token bucket, requests per minute)
+LLM_REQUESTS_PER_MINUTE = max(1, int(llm_conf.get("requests_per_minute", 60)))
+# (term, sentence) pairs per request in packed mode (LLMClient.explain_terms_packed)
+LLM_PACK_SIZE = max(1, int(llm_conf.get("pack_size", 8)))
+# Timeout of a single HTTP attempt, and overall deadline of a call including retries (seconds)
+LLM_REQUEST_TIMEOUT = max(1.0, float(llm_conf.get("request_timeout_seconds", 30)))
+LLM_REQUEST_DEADLINE = max(LLM_REQUEST_TIMEOUT, float(llm_conf.get("request_deadline_seconds", 60)))
+# Retries on 429 / 5xx / connection errors (exponential backoff with jitter)
+LLM_MAX_RETRIES = max(0, int(llm_conf.get("max_retries", 3)))
+# Idle keep-alive connections are reused for this long
+LLM_KEEPALIVE_SECONDS = max(1.0, float(llm_conf.get("keepalive_seconds", 120)))
+# Circuit breaker: open after this many consecutive failed calls, for this long
+LLM_BREAKER_FAILURES = max(1, int(llm_conf.get("breaker_failures", 5)))
+LLM_BREAKER_COOLDOWN_SECONDS = max(1.0, float(llm_conf.get("breaker_cooldown_seconds", 30)))
+# Prices for the cost estimate on the LLM Metrics page (USD per 1M tokens, 0 = show tokens only)
+LLM_PRICE_INPUT_PER_MTOK = max(0.0, float(llm_conf.get("price_input_per_mtok", 0)))
+LLM_PRICE_OUTPUT_PER_MTOK = max(0.0, float(llm_conf.get("price_output_per_mtok", 0)))
+
+
+# ================= Image Search =================
+images_conf = config_data.get("images", {})
+
+# Search result pages; {query} is replaced by the URL-encoded query
+IMAGE_SEARCH_URLS = {
+    "google": images_conf.get("google_search_url", "https://www.google.com/search?tbm=isch&q={query}"),
+    "bing": images_conf.get("bing_search_url", "https://www.bing.com/images/search?q={query}"),
+}
+# Timeout of a single search or download request (seconds)
+IMAGE_REQUEST_TIMEOUT = max(1.0, float(images_conf.get("request_timeout_seconds", 5)))
+# fetch_term_images returns whatever it has after this many seconds
+IMAGE_FETCH_DEADLINE = max(IMAGE_REQUEST_TIMEOUT, float(images_conf.get("fetch_deadline_seconds", 12)))
+# Concurrent searches + downloads per fetch
+IMAGE_FETCH_WORKERS = max(1, int(images_conf.get("fetch_workers", 8)))
+# Scraped result URLs per query are cached this long (0 = no expiry) for re-opens and Regenerate
+IMAGE_SEARCH_CACHE_TTL_SECONDS = max(0.0, float(images_conf.get("search_cache_ttl_hours", 168))) * 3600
+# URLs kept per query; a larger pool allows more Regenerate rounds before scraping again
+IMAGE_SEARCH_POOL_SIZE = max(3, int(images_conf.get("search_pool_size", 20)))
+
+# Stored renditions (WebP): longest side of the thumbnail and of the optional medium image (0 = none)
+IMAGE_THUMB_SIZE = max(64, int(images_conf.get("thumbnail_size", 480)))
+IMAGE_MEDIUM_SIZE = max(0, int(images_conf.get("medium_size", 1280)))
+IMAGE_WEBP_QUALITY = min(100, max(1, int(images_conf.get("webp_quality", 80))))
+
+
+# ================= Study Dialog =================
+study_conf = config_data.get("study", {})
+
+# Terms after the current card (plus the previous one) prepared in the background; 0 = off
+STUDY_PREFETCH_AHEAD = max(0, int(study_conf.get("prefetch_ahead", 2)))
+STUDY_PREFETCH_WORKERS = max(1, int(study_conf.get("prefetch_workers", 2)))
@@ -2,6 +2,7 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 from app.ui.sidebar import render_sidebar
+from app.services.tts_engine import get_engine_pool
 
 # Load Environment Variables
 load_dotenv()
@@ -15,6 +16,9 @@ st.set_page_config(
 # Render the custom beautiful sidebar
 render_sidebar()
 
+# Start loading the shared Kokoro TTS pool in the background (no-op after the first run)
+get_engine_pool()
+
 st.title("🧠 DeepGloss Learning Assistant")
 
 st.markdown("""
@@ -25,6 +29,7 @@ A domain-specific English learning tool tailored for your specific needs.
 - 📥 **Import Data**: Import your vocabulary, sentences, and build VectorDB index.
 - 📖 **Study Mode**: Start your immersive and interactive learning session with AI explanations and TTS.
 - 🛠️ **Manage Vocabulary**: Edit definitions, levels, and enable/disable specific words.
+- 📊 **LLM Metrics**: Latency, cache hits and token spend of AI features per domain.
 """)
 
 # Check API Key
@@ -34,4 +39,14 @@ if not api_key:
     st.warning("⚠️ LLM_API_KEY not found in the .env file.")
     st.info("Please create a .env file in the project root and configure LLM_API_KEY, LLM_BASE_URL, and LLM_MODEL.")
 else:
-    st.success("✅ API Environment is properly configured and ready.")
\ No newline at end of file
+    st.success("✅ API Environment is properly configured and ready.")
+
+    # Latency of LLM calls made by this server process (shared client, see app/services/llm_transport.py)
+    from app.services.llm_transport import get_llm_transport
+    llm_stats = get_llm_transport().stats()
+    if llm_stats["calls"]:
+        st.caption(
+            f"LLM API: {llm_stats['calls']} calls, {llm_stats['errors']} failed, {llm_stats['retries']} retries · "
+            f"p50 {llm_stats['p50_ms']:.0f} ms · p95 {llm_stats['p95_ms']:.0f} ms · p99 {llm_stats['p99_ms']:.0f} ms · "
+            f"circuit {llm_stats['breaker']}"
+        )
\ No newline at end of file
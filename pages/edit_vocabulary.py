@@ -3,6 +3,7 @@ import streamlit.components.v1 as components
 import math
 from app.database.db_manager import DBManager
 from app.ui.sidebar import render_sidebar
+from app.ui.term_grid import render_term_grid, reset_grid_page
 
 # --- Initialization ---
 st.set_page_config(page_title="Manage Vocabulary", layout="wide")
@@ -45,10 +46,15 @@ if 'edit_sort_asc' not in st.session_state:
     st.session_state.edit_sort_asc = False
 if 'edit_page' not in st.session_state:
     st.session_state.edit_page = 1
+if 'edit_page_size' not in st.session_state:
+    st.session_state.edit_page_size = 10
+
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100, 200, 500]
 
 
 def reset_edit_page():
     st.session_state.edit_page = 1
+    reset_grid_page()
 
 
 def handle_edit_sort(col_name):
@@ -70,6 +76,19 @@ def next_page(total_pages):
         st.session_state.edit_page += 1
 
 
+EDIT_COLUMNS = ("is_active", "word", "star_level", "definition")
+
+
+def _editable_values(t):
+    """The editable fields of a term (EDIT_COLUMNS), normalized the way the form submits them."""
+    return (
+        1 if t['is_active'] else 0,
+        (t['word'] or "").strip(),
+        t.get('star_level') or 1,
+        (t['definition'] or "").strip(),
+    )
+
+
 # ==========================================
 # 1. Filters Section
 # ==========================================
@@ -91,10 +110,19 @@ with col_filt2:
         label_visibility="collapsed", on_change=reset_edit_page
     )
 
+sel_star = int(star_filter.split(" ")[1]) if star_filter != "All Levels" else None
+
 st.write("")
 search_term = st.text_input("Search terms", placeholder="🔍 Search for a term to edit...", label_visibility="collapsed",
                             on_change=reset_edit_page)
 
+# List: one row of widgets per term. Grid: a single paginated table for very large vocabularies.
+edit_mode = st.radio("Editing Mode", ["📋 List", "🧮 Grid"], horizontal=True, label_visibility="collapsed",
+                     key="edit_mode")
+if edit_mode == "🧮 Grid":
+    render_term_grid(db, sel_d_id, sel_star, search_term)
+    st.stop()
+
 # ==========================================
 # 2. Data Fetching & Global Sorting
 # ==========================================
@@ -105,9 +133,8 @@ if not terms_raw:
 
 terms = [dict(t) for t in terms_raw]
 
-if star_filter != "All Levels":
-    target_stars = int(star_filter.split(" ")[1])
-    terms = [t for t in terms if t.get('star_level', 1) == target_stars]
+if sel_star is not None:
+    terms = [t for t in terms if t.get('star_level', 1) == sel_star]
 
 if search_term:
     terms = [t for t in terms if search_term.lower() in t['word'].lower()]
@@ -128,7 +155,7 @@ elif st.session_state.edit_sort_col == 'level':
 # ==========================================
 # 3. Pagination Logic
 # ==========================================
-ITEMS_PER_PAGE = 10
+ITEMS_PER_PAGE = st.session_state.edit_page_size
 total_items = len(terms)
 total_pages = math.ceil(total_items / ITEMS_PER_PAGE) if total_items > 0 else 1
 if st.session_state.edit_page > total_pages: st.session_state.edit_page = max(1, total_pages)
@@ -164,6 +191,14 @@ st.markdown("<hr style='margin: 0.5em 0; border: none; border-top: 1px solid #e5
 # ==========================================
 # 5. Form & Data Rows
 # ==========================================
+# Values each row's widgets were created with. A widget keeps its value across reruns, so Save
+# compares against these, not against the rows queried again (a batch job may have filled a
+# definition meanwhile; the untouched text area must not count as an edit that reverts it)
+loaded_values = st.session_state.setdefault('edit_loaded_values', {})
+for t in paginated_terms:
+    if f"edit_word_{t['id']}" not in st.session_state:
+        loaded_values[t['id']] = _editable_values(t)
+
 with st.form("edit_list_form", clear_on_submit=False):
     for i, t_dict in enumerate(paginated_terms):
         tid = t_dict['id']
@@ -192,25 +227,33 @@ with st.form("edit_list_form", clear_on_submit=False):
     submit_btn = st.form_submit_button("💾 Save Current Page", type="primary")
 
     if submit_btn:
-        updates = []
+        # Only the fields whose submitted value differs from what the form was loaded with are written
+        updates = {}
         for t in paginated_terms:
             tid = t['id']
-            updates.append({
-                'id': tid,
-                'is_active': 1 if st.session_state[f"edit_active_{tid}"] else 0,
-                'word': st.session_state[f"edit_word_{tid}"].strip(),
-                'star_level': st.session_state[f"edit_level_{tid}"],
-                'definition': st.session_state[f"edit_def_{tid}"].strip()
-            })
-        db.bulk_update_terms(updates)
-        st.toast("✅ Changes saved successfully!", icon="✅")
+            submitted = (
+                1 if st.session_state[f"edit_active_{tid}"] else 0,
+                st.session_state[f"edit_word_{tid}"].strip(),
+                st.session_state[f"edit_level_{tid}"],
+                st.session_state[f"edit_def_{tid}"].strip(),
+            )
+            loaded = loaded_values.get(tid, _editable_values(t))
+            cells = {col: new for col, new, old in zip(EDIT_COLUMNS, submitted, loaded) if new != old}
+            if cells:
+                updates[tid] = cells
+            loaded_values[tid] = submitted
+        if updates:
+            db.update_term_cells(updates)
+            st.toast(f"✅ Saved {len(updates)} changed term(s)!", icon="✅")
+        else:
+            st.toast("No changes to save.", icon="ℹ️")
         st.rerun()
 
 # ==========================================
 # 6. Pagination UI Controls
 # ==========================================
 st.write("")
-pc1, pc2, pc3 = st.columns([1, 2, 1])
+pc1, pc2, pc3, pc4 = st.columns([1, 2, 1, 1])
 with pc1:
     st.button("⬅️ Prev", on_click=prev_page, disabled=(st.session_state.edit_page == 1), use_container_width=True)
 with pc2:
@@ -220,6 +263,9 @@ with pc2:
 with pc3:
     st.button("Next ➡️", on_click=next_page, args=(total_pages,), disabled=(st.session_state.edit_page == total_pages),
               use_container_width=True)
+with pc4:
+    st.selectbox("Terms per page", PAGE_SIZE_OPTIONS, key="edit_page_size", on_change=reset_edit_page,
+                 format_func=lambda n: f"{n} / page", label_visibility="collapsed")
 
 # ==========================================
 # 7. JS Injection for Double-Click Edit Logic
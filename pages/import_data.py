@@ -2,6 +2,11 @@ import streamlit as st
 import pandas as pd
 from app.database.db_manager import DBManager
 from app.services.vector_manager import VectorManager
+from app.services.audio_batch import AudioBatchJob, format_stats
+from app.services.definition_batch import DefinitionBatchJob, format_stats as format_definition_stats
+from app.services.explanation_pipeline import start_background, current_background, format_stats as format_explanation_stats
+from app.services.audio_migration import migrate_audio_cache, format_stats as format_migration_stats
+import config
 from app.ui.sidebar import render_sidebar
 import re
 
@@ -60,16 +65,18 @@ with st.container():
     2.  **Import Vocabulary**: Bulk upload terms. Supports Excel/CSV (Columns: Word, Frequency).
     3.  **Import Sentences (SQL)**: Add sentences to SQLite for keyword matching. Supports TXT/Excel/CSV.
     4.  **Import VectorDB (Independent)**: Add sentences to VectorDB for semantic search. Supports TXT/Excel/CSV.
+    5.  **Batch Jobs**: Pre-generate assets (pronunciation audio, definitions, translations) for a whole domain.
     """)
 
 st.divider()
 
-# --- 4 Tabs Layout ---
-tab1, tab2, tab3, tab4 = st.tabs([
+# --- 5 Tabs Layout ---
+tab1, tab2, tab3, tab4, tab5 = st.tabs([
     "1. Domain Management",
     "2. Import Vocabulary",
     "3. Import Sentences (SQL)",
-    "4. Import VectorDB (Independent)"
+    "4. Import VectorDB (Independent)",
+    "5. Batch Jobs"
 ])
 
 # ================= Tab 1: Domain =================
@@ -328,4 +335,107 @@ with tab4:
                 else:
                     st.warning("No similar sentences found in this domain.")
             else:
-                st.error("Please enter a query text.")
\ No newline at end of file
+                st.error("Please enter a query text.")
+
+# ================= Tab 5: Batch Jobs =================
+with tab5:
+    st.subheader("Pre-generate Domain Assets")
+
+    if not domains:
+        st.info("Create a domain first to pre-generate its assets.")
+    else:
+        d_opts = {d['name']: d['id'] for d in domains}
+        sel_d_name_b = st.selectbox("Target Domain:", list(d_opts.keys()), key="dom_b")
+        sel_d_id_b = d_opts[sel_d_name_b]
+
+        st.divider()
+
+        st.markdown("#### 🔊 Pronunciation Audio")
+        st.caption("Synthesizes audio for every active term and matched sentence that has none yet. "
+                   "Progress is saved continuously, so an interrupted run simply resumes next time.")
+
+        pending_audio = len(db.get_items_missing_audio(sel_d_id_b))
+        st.write(f"Items without audio: **{pending_audio}**")
+
+        audio_workers = st.number_input("Worker processes", min_value=1, max_value=16,
+                                        value=config.TTS_BATCH_WORKERS, key="batch_audio_workers")
+
+        if st.button("🔊 Generate Missing Audio", type="primary", disabled=(pending_audio == 0), key="btn_batch_audio"):
+            progress_bar = st.progress(0.0, text="Loading TTS workers...")
+
+            def _on_audio_progress(done, total):
+                progress_bar.progress(done / total, text=f"Synthesizing... {done}/{total}")
+
+            job = AudioBatchJob(db, sel_d_id_b, workers=audio_workers)
+            stats = job.run(on_progress=_on_audio_progress)
+            st.success(f"✅ {format_stats(stats)}")
+
+        st.divider()
+
+        st.markdown("#### 📖 Definitions")
+        st.caption("Asks the LLM for a definition of every term that has none yet, with several requests in flight "
+                   "and a requests-per-minute budget. Progress is saved continuously.")
+
+        pending_defs = len(db.get_terms_missing_definition(sel_d_id_b))
+        st.write(f"Terms without definition: **{pending_defs}**")
+
+        def_c1, def_c2 = st.columns(2)
+        def_concurrency = def_c1.number_input("Parallel requests", min_value=1, max_value=64,
+                                              value=config.LLM_BATCH_CONCURRENCY, key="batch_def_concurrency")
+        def_rpm = def_c2.number_input("Requests per minute", min_value=1, max_value=10000,
+                                      value=config.LLM_REQUESTS_PER_MINUTE, key="batch_def_rpm")
+
+        if st.button("📖 Generate Missing Definitions", type="primary", disabled=(pending_defs == 0),
+                     key="btn_batch_defs"):
+            progress_bar = st.progress(0.0, text="Requesting definitions...")
+
+            def _on_def_progress(done, total):
+                progress_bar.progress(done / total, text=f"Generating definitions... {done}/{total}")
+
+            job = DefinitionBatchJob(db, sel_d_id_b, concurrency=def_concurrency, requests_per_minute=def_rpm)
+            stats = job.run(on_progress=_on_def_progress)
+            st.success(f"✅ {format_definition_stats(stats)}")
+
+        st.divider()
+
+        st.markdown("#### 🈶 Translations & Explanations")
+        st.caption("Translates matched sentences and explains each term in its sentence in the background, "
+                   "most important terms (stars, frequency) first. Only empty fields are filled.")
+
+        pending_expl = len(db.get_matches_missing_explanations(sel_d_id_b))
+        st.write(f"Term/sentence pairs missing a translation or explanation: **{pending_expl}**")
+
+        pipeline = current_background()
+        if pipeline is not None and pipeline.running:
+            p_stats = pipeline.stats
+            processed = p_stats["done"] + p_stats["failed"]
+            st.progress(processed / p_stats["total"] if p_stats["total"] else 0.0,
+                        text=f"Running in background... {processed}/{p_stats['total']}")
+            exp_c1, exp_c2 = st.columns(2)
+            exp_c1.button("🔄 Refresh", key="btn_expl_refresh", use_container_width=True)
+            if exp_c2.button("⏹️ Stop", key="btn_expl_stop", use_container_width=True):
+                pipeline.stop()
+                st.rerun()
+        else:
+            if pipeline is not None and pipeline.stats["total"]:
+                st.info(f"Last run: {format_explanation_stats(pipeline.stats)}")
+            if st.button("🈶 Generate in Background", type="primary", disabled=(pending_expl == 0),
+                         key="btn_batch_expl"):
+                start_background(sel_d_id_b, concurrency=def_concurrency, requests_per_minute=def_rpm)
+                st.rerun()
+
+    st.divider()
+
+    st.markdown("#### 🗜️ Compress Audio Cache")
+    st.caption(f"Converts existing WAV files (all domains) to the configured codec "
+               f"(`{config.AUDIO_FORMAT}`) and updates the database references.")
+
+    if st.button("🗜️ Convert Existing Audio", disabled=(config.AUDIO_FORMAT == "wav"), key="btn_migrate_audio"):
+        progress_bar = st.progress(0.0, text="Transcoding...")
+
+        def _on_migrate_progress(done, total):
+            progress_bar.progress(done / total, text=f"Transcoding... {done}/{total}")
+
+        stats = migrate_audio_cache(db, workers=st.session_state.get("batch_audio_workers", config.TTS_BATCH_WORKERS),
+                                    on_progress=_on_migrate_progress)
+        st.success(f"✅ {format_migration_stats(stats)}")
@@ -0,0 +1,91 @@
+import time
+
+import pandas as pd
+import streamlit as st
+
+import config
+from app.database.db_manager import DBManager
+from app.services.llm_metrics import get_llm_metrics
+from app.ui.sidebar import render_sidebar
+
+# --- Initialization ---
+st.set_page_config(page_title="LLM Metrics", layout="wide")
+render_sidebar()
+
+st.title("📊 LLM Metrics")
+st.caption("Latency and token spend of every LLM call, per dialog feature and per domain.")
+
+db = DBManager()
+metrics = get_llm_metrics()
+
+RANGES = {"Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30, "All time": None}
+sel_range = st.selectbox("Time range:", list(RANGES.keys()), index=1)
+days = RANGES[sel_range]
+since = time.time() - days * 86400 if days else None
+
+rows = metrics.rows(since=since)
+if not rows:
+    st.info("No LLM calls recorded in this time range yet.")
+    st.stop()
+
+df = pd.DataFrame([dict(r) for r in rows])
+domain_names = {d['id']: d['name'] for d in db.get_all_domains()}
+df["domain"] = df["domain_id"].map(lambda d: domain_names.get(d, "—") if pd.notna(d) else "—")
+
+has_prices = config.LLM_PRICE_INPUT_PER_MTOK or config.LLM_PRICE_OUTPUT_PER_MTOK
+df["cost"] = (df["prompt_tokens"] * config.LLM_PRICE_INPUT_PER_MTOK
+              + df["completion_tokens"] * config.LLM_PRICE_OUTPUT_PER_MTOK) / 1e6
+
+
+def summarize(group_col):
+    """Per-group calls, cache hit rate, latency percentiles of API calls and token spend."""
+    api = df[df["cache_hit"] == 0]
+    out = df.groupby(group_col).agg(
+        calls=("id", "count"),
+        cache_hit_rate=("cache_hit", "mean"),
+        prompt_tokens=("prompt_tokens", "sum"),
+        completion_tokens=("completion_tokens", "sum"),
+        cost_usd=("cost", "sum"),
+    )
+    lat = api.groupby(group_col)["latency_ms"]
+    out["p50_ms"] = lat.quantile(0.50)
+    out["p95_ms"] = lat.quantile(0.95)
+    out["ttft_p50_ms"] = api.groupby(group_col)["ttft_ms"].quantile(0.50)
+    out["errors"] = api.groupby(group_col)["ok"].apply(lambda s: int((s == 0).sum()))
+    out["cache_hit_rate"] = (out["cache_hit_rate"] * 100).round(1)
+    out = out.fillna(0).round({"p50_ms": 0, "p95_ms": 0, "ttft_p50_ms": 0, "cost_usd": 4})
+    if not has_prices:
+        out = out.drop(columns=["cost_usd"])
+    return out.sort_values("calls", ascending=False)
+
+
+# --- Headline numbers ---
+api_calls = df[df["cache_hit"] == 0]
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("Calls", len(df))
+m2.metric("Cache hit rate", f"{df['cache_hit'].mean() * 100:.1f}%")
+m3.metric("API latency p50 / p95",
+          f"{api_calls['latency_ms'].quantile(0.5):.0f} / {api_calls['latency_ms'].quantile(0.95):.0f} ms"
+          if len(api_calls) else "—")
+total_tokens = int(df["prompt_tokens"].sum() + df["completion_tokens"].sum())
+m4.metric("Tokens" + (" / cost" if has_prices else ""),
+          f"{total_tokens:,}" + (f" / ${df['cost'].sum():.4f}" if has_prices else ""))
+
+st.divider()
+
+st.markdown("#### Per Feature")
+st.dataframe(summarize("feature"), use_container_width=True)
+
+st.markdown("#### Per Domain")
+st.dataframe(summarize("domain"), use_container_width=True)
+
+st.markdown("#### Tokens per Day")
+df["day"] = pd.to_datetime(df["ts"], unit="s").dt.date
+daily = df.pivot_table(index="day", columns="feature", values="completion_tokens", aggfunc="sum", fill_value=0)
+daily = daily + df.pivot_table(index="day", columns="feature", values="prompt_tokens", aggfunc="sum", fill_value=0)
+st.bar_chart(daily)
+
+with st.expander("⚙️ Maintenance"):
+    if st.button("🗑️ Clear recorded metrics", key="btn_clear_llm_metrics"):
+        metrics.clear()
+        st.rerun()
@@ -0,0 +1,68 @@
+"""
+find_orphans on a temporary cache directory.
+
+    python -m pytest tests
+"""
+import os
+
+import pytest
+
+from app.services import cache_gc
+from app.services.audio_cache import MANIFEST_NAME
+
+NOW = 1_700_000_000.0
+HOUR = 3600
+
+
+def _file(root, rel, age_seconds):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * 10)
+    os.utime(path, (NOW - age_seconds, NOW - age_seconds))
+    return path
+
+
+def _orphans(root, refs=(), grace=HOUR, last_used=None):
+    refs = {cache_gc._norm(p) for p in refs}
+    return {os.path.relpath(path, root) for path, _size in
+            cache_gc.find_orphans(root, refs, grace, last_used, now=NOW)}
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return tmp_path / "cache"
+
+
+def test_unreferenced_files_past_grace_are_orphans(cache_dir):
+    old = _file(cache_dir, "ab/old.wav", 2 * HOUR)
+    _file(cache_dir, "cd/young.wav", 10)
+
+    assert _orphans(cache_dir) == {os.path.join("ab", "old.wav")}
+    sizes = [size for _path, size in cache_gc.find_orphans(cache_dir, set(), HOUR, now=NOW)]
+    assert sizes == [old.stat().st_size]
+
+
+def test_referenced_files_are_kept(cache_dir):
+    kept = _file(cache_dir, "ab/kept.wav", 2 * HOUR)
+    _file(cache_dir, "ab/gone.wav", 2 * HOUR)
+
+    assert _orphans(cache_dir, refs=[kept]) == {os.path.join("ab", "gone.wav")}
+
+
+def test_manifest_files_are_skipped(cache_dir):
+    _file(cache_dir, MANIFEST_NAME, 2 * HOUR)
+    _file(cache_dir, MANIFEST_NAME + "-wal", 2 * HOUR)
+
+    assert _orphans(cache_dir) == set()
+
+
+def test_recent_use_extends_grace(cache_dir):
+    played = _file(cache_dir, "ab/played.wav", 2 * HOUR)
+    _file(cache_dir, "ab/idle.wav", 2 * HOUR)
+    last_used = {cache_gc._norm(played): NOW - 60}
+
+    assert _orphans(cache_dir, last_used=last_used) == {os.path.join("ab", "idle.wav")}
+
+
+def test_missing_directory_yields_nothing(tmp_path):
+    assert _orphans(tmp_path / "missing") == set()
@@ -0,0 +1,159 @@
+"""
+fetch_term_images and fetch_image against a local http.server standing in for the search
+engine and the image hosts. They exercise the current fetch path, including the
+content-addressed image store and the cached search pools added after the concurrent fetch.
+
+    python -m pytest tests
+"""
+import io
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+import config
+from app.services.image_search_cache import ImageSearchCache
+from app.services.image_store import ImageStore
+from app.utils import image_scraper
+
+SLOW_SECONDS = 3.0
+
+
+def _png(seed):
+    color = zlib.crc32(seed.encode())
+    buf = io.BytesIO()
+    Image.new("RGB", (320, 240), (color & 255, (color >> 8) & 255, (color >> 16) & 255)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so connection reuse can be observed
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type="image/png", status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urllib.parse.urlparse(self.path)
+        with server.lock:
+            server.requests.append((self.client_address, url.path))
+
+        if url.path == "/google":
+            # The result page format the google pattern extracts from
+            body = "".join(f'["{server.base}/{name}.png"' for name in server.results)
+            return self._send(body.encode(), "text/html")
+        if url.path == "/bing":
+            return self._send(b"", "text/html")
+
+        name = url.path.strip("/").rsplit(".", 1)[0]
+        if name.startswith("slow"):
+            time.sleep(SLOW_SECONDS)
+        if name.startswith("same"):
+            return self._send(_png("same"))
+        if name.startswith("text"):
+            return self._send(b"<html>not an image</html>", "text/html")
+        if name.startswith("big"):
+            return self._send(b"\x89PNG\r\n\x1a\n" + b"\0" * 200_000)
+        if name.startswith("missing"):
+            return self._send(b"", "text/html", status=404)
+        return self._send(_png(name))
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    httpd.results = []
+    httpd.base = f"http://127.0.0.1:{httpd.server_address[1]}"
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    monkeypatch.setattr(config, "IMAGE_SEARCH_URLS",
+                        {"google": httpd.base + "/google?q={query}", "bing": httpd.base + "/bing?q={query}"})
+    search_cache = ImageSearchCache(db_path=tmp_path / "image_search_cache.db")
+    store = ImageStore(tmp_path / "images")
+    monkeypatch.setattr(image_scraper, "get_image_search_cache", lambda: search_cache)
+    monkeypatch.setattr(image_scraper, "get_image_store", lambda: store)
+
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _paths(result):
+    return [p for p in result.split(",") if p]
+
+
+def test_returns_once_wanted_images_arrived(server):
+    # Downloads run two ahead of what is needed: img0-2 arrive first, slow3/slow4 are not waited for
+    server.results = ["img0", "img1", "img2", "slow3", "slow4", "img5"]
+    start = time.monotonic()
+    paths = _paths(image_scraper.fetch_term_images("gqa", "grouped query", "", wanted=3, deadline=10))
+    elapsed = time.monotonic() - start
+
+    assert len(paths) == 3
+    assert elapsed < SLOW_SECONDS
+
+
+def test_deadline_cuts_off_slow_host(server):
+    server.results = ["img0", "slow1", "slow2", "slow3", "slow4"]
+    start = time.monotonic()
+    paths = _paths(image_scraper.fetch_term_images("gqa", "", "", wanted=3, deadline=1.0))
+    elapsed = time.monotonic() - start
+
+    assert len(paths) == 1
+    assert elapsed < SLOW_SECONDS
+
+
+def test_identical_content_is_stored_once(server):
+    server.results = [f"same{i}" for i in range(6)]
+    paths = _paths(image_scraper.fetch_term_images("gqa", "", "", wanted=3, deadline=10))
+
+    assert len(paths) == 1
+
+
+def test_fetch_image_rejects_non_images_and_oversized(server, monkeypatch):
+    monkeypatch.setattr(image_scraper, "_MAX_IMAGE_BYTES", 100_000)
+
+    assert image_scraper.fetch_image(server.base + "/text.png") is None
+    assert image_scraper.fetch_image(server.base + "/big.png") is None
+    assert image_scraper.fetch_image(server.base + "/missing.png") is None
+    data, ext = image_scraper.fetch_image(server.base + "/img0.png")
+    assert ext == "png" and data.startswith(b"\x89PNG")
+
+
+def test_pooled_session_reuses_connection(server):
+    assert image_scraper.get_http_session() is image_scraper.get_http_session()
+
+    for i in range(5):
+        assert image_scraper.fetch_image(f"{server.base}/img{i}.png") is not None
+
+    clients = {client for client, _path in server.requests}
+    assert len(server.requests) == 5
+    assert len(clients) == 1
+
+
+def test_collected_urls_are_marked_only_on_request(server):
+    server.results = ["img0", "img1", "img2"]
+    cache = image_scraper.get_image_search_cache()
+    shown = {}
+    paths = _paths(image_scraper.fetch_term_images("gqa", "", "", wanted=3, deadline=10, shown=shown))
+
+    # Each URL belongs to whichever query variant found it first
+    assert len(paths) == 3
+    assert sum(len(urls) for urls in shown.values()) == 3
+    assert not any(cache.used(query) for query in shown)
+    image_scraper.mark_images_shown(shown)
+    assert sum(len(cache.used(query)) for query in shown) == 3
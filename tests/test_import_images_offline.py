@@ -0,0 +1,69 @@
+"""
+Name matching and the resume ledger of the offline image import.
+
+    python -m pytest tests
+"""
+import os
+
+import pytest
+
+from app.database.import_images_offline_pipeline import Ledger, OfflineImageImport, normalize_name
+
+
+@pytest.mark.parametrize("name, strip_index, expected", [
+    ("Gradient_Descent", False, "gradient descent"),
+    ("  KV-cache  ", False, "kv cache"),
+    ("Gradient_Descent-2", True, "gradient descent"),
+    ("word_03", True, "word"),
+    ("word (1)", True, "word"),
+    ("word(12)", True, "word"),
+    ("GPT-4", False, "gpt 4"),
+    ("GPT-4", True, "gpt"),
+    ("layer norm", True, "layer norm"),
+])
+def test_normalize_name(name, strip_index, expected):
+    assert normalize_name(name, strip_index=strip_index) == expected
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = Ledger(tmp_path / "image_import.db")
+    yield ledger
+    ledger.close()
+
+
+def test_ledger_pending_skips_recorded_files(ledger):
+    ledger.record([("/img/a.png", 100, 1.0, "images/a.webp"),
+                   ("/img/b.png", 200, 2.0, None),
+                   ("/img/c.png", 300, 3.0, "images/c.webp")])
+    matched = {
+        "/img/a.png": (100, 1.0, [1]),      # unchanged
+        "/img/b.png": (200, 2.0, [2]),      # unchanged, was not a usable image
+        "/img/c.png": (301, 3.0, [3]),      # size changed
+        "/img/d.png": (400, 4.0, [4]),      # new
+    }
+
+    assert set(ledger.pending(matched)) == {"/img/c.png", "/img/d.png"}
+
+
+def test_ledger_pending_sees_modified_files(ledger):
+    ledger.record([("/img/a.png", 100, 1.0, "images/a.webp")])
+
+    assert set(ledger.pending({"/img/a.png": (100, 5.0, [1])})) == {"/img/a.png"}
+
+
+def test_match_by_name_folder_and_manifest(tmp_path):
+    root = tmp_path / "images"
+    for rel in ("Gradient_Descent-2.jpg", "kv cache/001.png", "unrelated.png", "notes.txt", "x.png"):
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    manifest = tmp_path / "images.csv"
+    manifest.write_text("file,term\nx.png,Attention\n", encoding="utf-8")
+
+    job = OfflineImageImport(db=None, root=root, manifest=manifest)
+    matched = job.match({"gradient descent": [1], "kv cache": [2], "attention": [3]})
+
+    by_name = {os.path.relpath(path, root): info[2] for path, info in matched.items()}
+    assert by_name == {"Gradient_Descent-2.jpg": [1], os.path.join("kv cache", "001.png"): [2], "x.png": [3]}
+    assert job.stats["scanned"] == 4
@@ -0,0 +1,41 @@
+"""
+edited_cells of the Manage Vocabulary grid.
+
+    python -m pytest tests
+"""
+import pandas as pd
+
+from app.ui.term_grid import GRID_COLUMNS, edited_cells
+
+
+def _grid():
+    return pd.DataFrame([
+        {"id": 10, "is_active": True, "word": "attention", "frequency": 5, "star_level": 3, "definition": "focus"},
+        {"id": 20, "is_active": False, "word": "kv cache", "frequency": 2, "star_level": 1, "definition": None},
+        {"id": 30, "is_active": True, "word": "rope", "frequency": 1, "star_level": 2, "definition": "rotary"},
+    ], columns=GRID_COLUMNS)
+
+
+def test_positions_map_to_term_ids():
+    updates = edited_cells(_grid(), {1: {"definition": "key/value cache"}, "2": {"star_level": 4}})
+
+    assert updates == {20: {"definition": "key/value cache"}, 30: {"star_level": 4}}
+
+
+def test_unchanged_values_are_dropped():
+    # Re-typed values, whitespace and an empty definition that was empty already
+    edits = {0: {"word": " attention ", "star_level": 3.0, "is_active": 1}, 1: {"definition": ""}}
+
+    assert edited_cells(_grid(), edits) == {}
+
+
+def test_values_are_stored_as_in_the_table():
+    updates = edited_cells(_grid(), {0: {"is_active": False, "star_level": None}, 1: {"is_active": True}})
+
+    assert updates == {10: {"is_active": 0, "star_level": 1}, 20: {"is_active": 1}}
+
+
+def test_emptied_word_is_not_saved():
+    updates = edited_cells(_grid(), {2: {"word": "  ", "definition": "rotary embedding"}})
+
+    assert updates == {30: {"definition": "rotary embedding"}}